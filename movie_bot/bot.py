@@ -5,14 +5,32 @@
 чтобы избежать побочных эффектов и Allow подмену для тестов.
 """
 from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from movie_bot.config import TELEGRAM_API_URL, TRACE_ENABLED
+from movie_bot.middlewares.metrics import TelegramApiMetricsMiddleware
+from movie_bot.middlewares.rate_limit import outbound_scheduler
+from movie_bot.middlewares.tracing import TelegramApiTracingMiddleware
 
 _bot: Bot | None = None
 
 
 def create_bot(token: str) -> Bot:
-    """Создаёт и кэширует экземпляр бота."""
+    """
+    Создаёт и кэширует экземпляр бота.
+    Если задан TELEGRAM_API_URL, запросы идут на этот сервер вместо api.telegram.org.
+    Все запросы проходят через планировщик с лимитами Telegram (middlewares/rate_limit.py).
+    """
     global _bot
-    _bot = Bot(token=token)
+    session = None
+    if TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    _bot = Bot(token=token, session=session)
+    _bot.session.middleware(TelegramApiMetricsMiddleware())
+    if TRACE_ENABLED:
+        _bot.session.middleware(TelegramApiTracingMiddleware())
+    _bot.session.middleware(outbound_scheduler)
     return _bot
 
 
@@ -15,6 +15,8 @@ BOT_COMMANDS = [
     ("add", "➕ Добавить"),
     ("recommend", "🎬 Рекомендации"),
     ("my_movies", "📂 Мой контент"),
+    ("import", "📥 Импорт из файла"),
+    ("export", "📤 Выгрузить в файл"),
     ("help", "ℹ️ Помощь"),
 ]
 
@@ -12,18 +12,116 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 ENV = os.getenv("ENV", "dev")
 
+# Режим получения обновлений: polling | webhook (можно переопределить --mode)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Метрики Prometheus (/metrics). В режиме polling включают HTTP-сервер health-check
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+
+# Свой адрес Bot API (локальный сервер или фейковый клиент для тестов)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Обработка обновлений: обновления одного пользователя идут по очереди,
+# разных пользователей — параллельно в UPDATE_WORKERS воркерах
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 8))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 100))  # обновлений в очереди воркера; дальше — ожидание приёма
+UPDATE_DRAIN_TIMEOUT = float(os.getenv("UPDATE_DRAIN_TIMEOUT", 25))  # дообработка очередей при остановке, сек
+
+# Склейка повторных нажатий навигации и «Просмотрено» (0 — выключено)
+CALLBACK_COALESCE_WINDOW_MS = float(os.getenv("CALLBACK_COALESCE_WINDOW_MS", 300))  # пауза после нажатия, в которую следующие склеиваются
+CALLBACK_COALESCE_MAX_DELAY_MS = float(os.getenv("CALLBACK_COALESCE_MAX_DELAY_MS", 1000))  # максимум ожидания серии
+
+# Исходящие запросы к Bot API: лимиты Telegram (~30 сообщений/с на бота, ~1/с на чат)
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", 30))  # запросов в секунду на бота
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", 1))  # запросов в секунду на чат
+TG_CHAT_BURST = float(os.getenv("TG_CHAT_BURST", 3))  # запросов в чат подряд без ожидания
+TG_RETRY_ATTEMPTS = int(os.getenv("TG_RETRY_ATTEMPTS", 3))  # повторов после RetryAfter
+
+# Webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # публичный адрес (https://...), без пути; пусто — webhook уже настроен
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", 8000))
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", 32))  # обновлений в обработке одновременно
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))  # max_connections для setWebhook
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 25))  # ожидание обработки при остановке, сек
+
+# Смена экранов: edit — редактировать сообщение бота на месте, resend — удалить и отправить заново
+RENDER_MODE = os.getenv("RENDER_MODE", "edit")
+
 # Пагинация
 ITEMS_PER_PAGE = int(os.getenv("ITEMS_PER_PAGE", 5))
 
+# Кэш библиотек пользователей в памяти процесса
+LIBRARY_CACHE_MAX_USERS = int(os.getenv("LIBRARY_CACHE_MAX_USERS", 500))
+
+# Поиск
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 100))
+
+# Рекомендации: не повторять фильм, пока не показаны все непросмотренные жанра
+RECOMMEND_NO_REPEATS = os.getenv("RECOMMEND_NO_REPEATS", "False").lower() == "true"
+
+# Импорт библиотеки из файла (/import)
+IMPORT_MAX_FILE_MB = int(os.getenv("IMPORT_MAX_FILE_MB", 20))  # Bot API отдаёт ботам файлы до 20 МБ
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", 20000))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 500))  # строк в одной транзакции
+IMPORT_PROGRESS_INTERVAL = float(os.getenv("IMPORT_PROGRESS_INTERVAL", 3))  # секунд между обновлениями прогресса
+
+# Выгрузка библиотеки (/export): строк за одно чтение и сколько держать в памяти до записи на диск
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+EXPORT_SPOOL_MAX_KB = int(os.getenv("EXPORT_SPOOL_MAX_KB", 1024))
+
 # Пути
 BASE_DIR = Path(__file__).parent.parent
 LOGS_DIR = BASE_DIR / "logs"
 
+# Логи пишет фоновый поток; очередь ограничена, лишние записи отбрасываются
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text | json (JSON Lines)
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+# Трассировка обновлений: дерево спанов пишется в slow-лог (JSON Lines),
+# если обработка дольше порога или обновление попало в выборку
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "True").lower() == "true"
+TRACE_SLOW_THRESHOLD_MS = float(os.getenv("TRACE_SLOW_THRESHOLD_MS", 1000))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0))  # доля обновлений, пишущихся всегда (0..1)
+SLOW_LOG_FILE = Path(os.getenv("TRACE_SLOW_LOG", LOGS_DIR / "slow_updates.log"))
+
+# Мониторинг event loop: гистограмма задержек и стек при блокировке дольше порога
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "True").lower() == "true"
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", 100))
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", 250))
+
+# CPU-тяжёлая работа (нечёткий поиск): process | thread | inline.
+# Пачки меньше CPU_OFFLOAD_MIN_BATCH считаются на месте — передача дороже работы
+CPU_POOL_MODE = os.getenv("CPU_POOL_MODE", "process")
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", 2))
+CPU_OFFLOAD_MIN_BATCH = int(os.getenv("CPU_OFFLOAD_MIN_BATCH", 2000))
+
 # На Fly.io данные хранятся на persistent volume /data
 # Локально — в ./data/
 _IS_FLY = bool(os.getenv("FLY_APP_NAME"))
 DB_PATH = Path("/data/movies.db") if _IS_FLY else BASE_DIR / "data" / "movies.db"
 
+# Пул подключений к БД
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 3))  # подключений для чтения
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", 10))  # busy timeout SQLite, сек
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", 10))  # ожидание свободного подключения, сек
+DB_HEALTHCHECK_INTERVAL = float(os.getenv("DB_HEALTHCHECK_INTERVAL", 30))  # простой до проверки, сек
+
+# Групповой коммит записей
+DB_WRITE_BATCH_WINDOW_MS = float(os.getenv("DB_WRITE_BATCH_WINDOW_MS", 5))  # окно сбора пачки, мс
+DB_WRITE_MAX_BATCH = int(os.getenv("DB_WRITE_MAX_BATCH", 100))  # операций в одной транзакции
+
+# Хранилище FSM в SQLite: состояния переживают рестарт, брошенные сценарии удаляются по TTL
+FSM_TTL = float(os.getenv("FSM_TTL", 24 * 3600))  # сек без изменений до удаления
+FSM_CACHE_MAX_KEYS = int(os.getenv("FSM_CACHE_MAX_KEYS", 2000))  # ключей в памяти процесса
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", 1))  # отложенная запись изменений, сек
+FSM_SWEEP_INTERVAL = float(os.getenv("FSM_SWEEP_INTERVAL", 600))  # очистка просроченных, сек
+
+# Миграции схемы
+DB_MIGRATION_CHUNK_SIZE = int(os.getenv("DB_MIGRATION_CHUNK_SIZE", 5000))  # строк на транзакцию при заполнении
+
 
 def ensure_directories():
     """Создаёт необходимые директории. Вызывать явно, не при импорте."""
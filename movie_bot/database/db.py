@@ -3,15 +3,30 @@
 
 Функции:
 - Инициализация БД при старте
-- Контекстный менеджер `get_db()` для безопасного доступа
-- Автоматическое обновление схемы
+- Контекстный менеджер `get_db()` для безопасного доступа (пул читателей)
+- Контекстный менеджер `get_write_db()` — выделенное подключение для записи
+- `run_write()` — запись через конвейер с групповым коммитом
+- Обновление схемы через версионные миграции (migrations.py)
 """
 
-import aiosqlite
+import asyncio
 import logging
 from contextlib import asynccontextmanager
-
-from movie_bot.config import DB_PATH
+from typing import Any, Dict, Optional
+
+from movie_bot.config import (
+    DB_PATH,
+    DB_POOL_SIZE,
+    DB_TIMEOUT,
+    DB_ACQUIRE_TIMEOUT,
+    DB_HEALTHCHECK_INTERVAL,
+    DB_WRITE_BATCH_WINDOW_MS,
+    DB_WRITE_MAX_BATCH,
+)
+from movie_bot.database.pool import ConnectionPool
+from movie_bot.database.migrations import run_migrations, has_table
+from movie_bot.database.writer import WriteQueue, WriteOp
+from movie_bot.utils.metrics import REGISTRY
 
 logger = logging.getLogger(__name__)
 DB_FILE = DB_PATH
@@ -19,103 +34,150 @@ DB_FILE = DB_PATH
 # Список разрешённых полей для сортировки (защита от инъекций)
 ALLOWED_ORDER_FIELDS = {"id", "title", "genre", "added_at", "watched", "watched_at"}
 
+_pool: Optional[ConnectionPool] = None
+_pool_lock = asyncio.Lock()
+_writer: Optional[WriteQueue] = None
+
+# Доступен ли полнотекстовый индекс (сборка SQLite может быть без FTS5)
+_fts_enabled = False
+
+
+async def get_pool() -> ConnectionPool:
+    """
+    Возвращает открытый пул подключений.
+    Создаёт его при первом обращении (нужен запущенный event loop).
+    """
+    global _pool
+    if _pool is not None and not _pool.closed:
+        return _pool
+
+    async with _pool_lock:
+        if _pool is None or _pool.closed:
+            pool = ConnectionPool(
+                DB_FILE,
+                readers=DB_POOL_SIZE,
+                timeout=DB_TIMEOUT,
+                acquire_timeout=DB_ACQUIRE_TIMEOUT,
+                health_check_interval=DB_HEALTHCHECK_INTERVAL,
+            )
+            await pool.open()
+            _pool = pool
+    return _pool
+
+
+async def close_db():
+    """
+    Дописывает очередь записи и закрывает пул подключений.
+    Вызывать при остановке бота.
+    """
+    global _pool, _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool_stats() -> Dict[str, float]:
+    """Метрики пула подключений (пустой словарь, если пул не открыт)."""
+    if _pool is None:
+        return {}
+    return _pool.stats()
+
+
+def is_fts_enabled() -> bool:
+    """Создан ли полнотекстовый индекс movies_fts."""
+    return _fts_enabled
+
+
+def get_writer_stats() -> Dict[str, float]:
+    """Метрики конвейера записи (пустой словарь, если он не запускался)."""
+    if _writer is None:
+        return {}
+    return _writer.stats()
+
+
+REGISTRY.register_stats(
+    "db_pool",
+    get_pool_stats,
+    counters=(
+        "acquisitions", "waits", "wait_time_total", "writer_acquisitions",
+        "writer_wait_time_total", "reconnects", "health_checks",
+    ),
+)
+REGISTRY.register_stats(
+    "db_writer",
+    get_writer_stats,
+    counters=("batches", "ops", "failed_ops", "commit_time_total"),
+)
+
+
+async def run_write(op: WriteOp) -> Any:
+    """
+    Выполняет изменяющую операцию через конвейер записи.
+
+    Операции, пришедшие почти одновременно, фиксируются одной транзакцией.
+    `op` получает подключение и не должна вызывать commit().
+
+    :param op: async-функция `op(db) -> результат`
+    :return: Результат `op` после фиксации транзакции
+    """
+    global _writer
+    if _writer is None:
+        _writer = WriteQueue(
+            get_write_db,
+            batch_window=DB_WRITE_BATCH_WINDOW_MS / 1000,
+            max_batch=DB_WRITE_MAX_BATCH,
+        )
+    return await _writer.submit(op)
+
 
 @asynccontextmanager
 async def get_db():
     """
     Контекстный менеджер для подключения к SQLite.
-    Устанавливает:
+    Выдаёт «тёплое» подключение из пула, на котором уже настроены:
     - Row factory (доступ по имени)
     - WAL-режим (лучшая параллельность)
     - Таймауты
     """
-    conn = None
+    pool = await get_pool()
     try:
-        conn = await aiosqlite.connect(DB_FILE, timeout=10)
-        conn.row_factory = aiosqlite.Row
-        await conn.execute("PRAGMA journal_mode=WAL")
-        await conn.execute("PRAGMA foreign_keys = ON")
-        await conn.commit()
-        yield conn
+        async with pool.reader() as conn:
+            yield conn
     except Exception as e:
         logger.error(f"Ошибка подключения к БД: {e}")
         raise
-    finally:
-        if conn:
-            await conn.close()
 
 
-async def init_db():
+@asynccontextmanager
+async def get_write_db():
     """
-    Инициализирует базу данных:
-    - Создаёт таблицу `movies`
-    - Добавляет недостающие колонки
-    - Удаляет устаревшую колонку `watch_later`
-    - Создаёт необходимые индексы
+    Контекстный менеджер для выделенного подключения на запись.
+    Одновременно его держит только одна корутина.
     """
-    async with get_db() as db:
-        try:
-            # Создаём таблицу
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS movies (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    title TEXT NOT NULL,
-                    genre TEXT NOT NULL,
-                    description TEXT,
-                    poster_id TEXT,
-                    added_at TEXT DEFAULT (datetime('now')),
-                    watched_at TEXT,
-                    watched INTEGER DEFAULT 0,
-                    UNIQUE(user_id, title) ON CONFLICT IGNORE
-                )
-                """
-            )
+    pool = await get_pool()
+    try:
+        async with pool.writer() as conn:
+            yield conn
+    except Exception as e:
+        logger.error(f"Ошибка записи в БД: {e}")
+        raise
 
-            # Получаем текущие колонки
-            async with db.execute("PRAGMA table_info(movies)") as cursor:
-                columns = {row[1] for row in await cursor.fetchall()}
-
-            # Удаляем устаревшую колонку
-            if "watch_later" in columns:
-                try:
-                    await db.execute("ALTER TABLE movies DROP COLUMN watch_later")
-                    logger.info("Удалена устаревшая колонка: watch_later")
-                except Exception as e:
-                    logger.warning(f"Не удалось удалить watch_later: {e}")
-
-            # Добавляем отсутствующие колонки
-            column_definitions = {
-                "watched": "ALTER TABLE movies ADD COLUMN watched INTEGER DEFAULT 0",
-                "watched_at": "ALTER TABLE movies ADD COLUMN watched_at TEXT",
-                "added_at": "ALTER TABLE movies ADD COLUMN added_at TEXT DEFAULT (datetime('now'))"
-            }
-
-            for col_name, sql in column_definitions.items():
-                if col_name not in columns:
-                    await db.execute(sql)
-                    logger.info(f"Добавлена колонка: {col_name}")
-
-            # Проверяем индексы
-            async with db.execute("PRAGMA index_list(movies)") as cursor:
-                index_names = {row[1] for row in await cursor.fetchall()}
-
-            required_indexes = {
-                "idx_user_watched": "CREATE INDEX idx_user_watched ON movies(user_id, watched)",
-                "idx_user_genre": "CREATE INDEX idx_user_genre ON movies(user_id, genre)",
-                "idx_user_title_lower": "CREATE INDEX idx_user_title_lower ON movies(user_id, LOWER(title))"
-            }
-
-            for idx_name, sql in required_indexes.items():
-                if idx_name not in index_names:
-                    await db.execute(sql)
-                    logger.info(f"Создан индекс: {idx_name}")
-
-            # Фиксируем все изменения
-            await db.commit()
-            logger.info("✅ База данных инициализирована, обновлена и проиндексирована")
 
+async def init_db():
+    """
+    Инициализирует базу данных: применяет недостающие миграции схемы
+    (см. migrations.py). Если схема актуальна — только чтение PRAGMA user_version.
+    """
+    global _fts_enabled
+    async with get_write_db() as db:
+        try:
+            await run_migrations(db)
+            # Сборка SQLite может быть без FTS5 — тогда миграция не создаёт индекс
+            _fts_enabled = await has_table(db, "movies_fts")
+            logger.info("✅ База данных инициализирована")
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации БД: {e}")
-            raise
\ No newline at end of file
+            raise
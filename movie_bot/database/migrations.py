@@ -0,0 +1,453 @@
+"""
+Версионные миграции схемы SQLite.
+
+Номер последней применённой миграции хранится в PRAGMA user_version.
+Если схема актуальна, запуск стоит одного чтения PRAGMA — без
+PRAGMA table_info/index_list и проверок колонок на каждом старте.
+
+Каждая миграция выполняется в транзакции и фиксируется вместе с новым
+user_version. Заполнение больших таблиц идёт порциями по id
+(DB_MIGRATION_CHUNK_SIZE строк на транзакцию), чтобы не держать
+блокировку записи долго. Миграции идемпотентны: база, созданная
+прежним init_db (user_version = 0), просто доводится до актуальной версии.
+"""
+
+import logging
+import sqlite3
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+import aiosqlite
+
+from movie_bot.config import DB_MIGRATION_CHUNK_SIZE
+from movie_bot.utils.text_utils import duplicate_title_norm, normalize_title
+
+logger = logging.getLogger(__name__)
+
+# Полнотекстовый индекс по нормализованному названию и жанру. Триграммы дают
+# поиск подстроки (в т.ч. кириллической) без учёта регистра. Столбец owner —
+# метка владельца «u<user_id>u»: запрос сужается до библиотеки пользователя
+# внутри индекса (MATCH ... AND owner : "u123u"), а не фильтром после JOIN
+# по совпадениям всех пользователей. Буквы по краям не дают «u12u» совпасть
+# с «u123u». Содержимое берётся из представления над movies.
+FTS_CONTENT_VIEW = """
+    CREATE VIEW IF NOT EXISTS movies_fts_content AS
+    SELECT id, title_norm, genre, 'u' || user_id || 'u' AS owner FROM movies
+"""
+
+FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE movies_fts USING fts5(
+        title_norm, genre, owner,
+        content='movies_fts_content', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_ai AFTER INSERT ON movies BEGIN
+        INSERT INTO movies_fts(rowid, title_norm, genre, owner)
+        VALUES (new.id, new.title_norm, new.genre, 'u' || new.user_id || 'u');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_ad AFTER DELETE ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title_norm, genre, owner)
+        VALUES ('delete', old.id, old.title_norm, old.genre, 'u' || old.user_id || 'u');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_au AFTER UPDATE OF user_id, title_norm, genre ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title_norm, genre, owner)
+        VALUES ('delete', old.id, old.title_norm, old.genre, 'u' || old.user_id || 'u');
+        INSERT INTO movies_fts(rowid, title_norm, genre, owner)
+        VALUES (new.id, new.title_norm, new.genre, 'u' || new.user_id || 'u');
+    END
+    """,
+)
+
+# Агрегаты по пользователю и жанру. Поддерживаются триггерами точно,
+# поэтому меню и статистика читают одну строку по первичному ключу.
+STATS_SCHEMA = (
+    """
+    CREATE TABLE user_stats (
+        user_id INTEGER PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        watched INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE user_genre_stats (
+        user_id INTEGER NOT NULL,
+        genre TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        unwatched INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, genre)
+    ) WITHOUT ROWID
+    """,
+)
+
+STATS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS user_stats_ai AFTER INSERT ON movies BEGIN
+        INSERT INTO user_stats(user_id, total, watched)
+        VALUES (new.user_id, 1, COALESCE(new.watched, 0) <> 0)
+        ON CONFLICT(user_id) DO UPDATE SET
+            total = total + 1,
+            watched = watched + excluded.watched;
+        INSERT INTO user_genre_stats(user_id, genre, total, unwatched)
+        VALUES (new.user_id, new.genre, 1, COALESCE(new.watched, 0) = 0)
+        ON CONFLICT(user_id, genre) DO UPDATE SET
+            total = total + 1,
+            unwatched = unwatched + excluded.unwatched;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS user_stats_ad AFTER DELETE ON movies BEGIN
+        UPDATE user_stats SET
+            total = total - 1,
+            watched = watched - (COALESCE(old.watched, 0) <> 0)
+        WHERE user_id = old.user_id;
+        UPDATE user_genre_stats SET
+            total = total - 1,
+            unwatched = unwatched - (COALESCE(old.watched, 0) = 0)
+        WHERE user_id = old.user_id AND genre = old.genre;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS user_stats_au AFTER UPDATE OF user_id, genre, watched ON movies BEGIN
+        UPDATE user_stats SET
+            total = total - 1,
+            watched = watched - (COALESCE(old.watched, 0) <> 0)
+        WHERE user_id = old.user_id;
+        UPDATE user_genre_stats SET
+            total = total - 1,
+            unwatched = unwatched - (COALESCE(old.watched, 0) = 0)
+        WHERE user_id = old.user_id AND genre = old.genre;
+        INSERT INTO user_stats(user_id, total, watched)
+        VALUES (new.user_id, 1, COALESCE(new.watched, 0) <> 0)
+        ON CONFLICT(user_id) DO UPDATE SET
+            total = total + 1,
+            watched = watched + excluded.watched;
+        INSERT INTO user_genre_stats(user_id, genre, total, unwatched)
+        VALUES (new.user_id, new.genre, 1, COALESCE(new.watched, 0) = 0)
+        ON CONFLICT(user_id, genre) DO UPDATE SET
+            total = total + 1,
+            unwatched = unwatched + excluded.unwatched;
+    END
+    """,
+)
+
+# Перемешанная колода непросмотренных фильмов на (пользователь, жанр)
+# для рекомендаций без повторов, пока колода не закончится.
+DECK_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS recommend_deck (
+        user_id INTEGER NOT NULL,
+        genre TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        movie_id INTEGER NOT NULL REFERENCES movies(id) ON DELETE CASCADE,
+        PRIMARY KEY (user_id, genre, position)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_deck_movie ON recommend_deck(movie_id)",
+)
+
+# Состояния FSM (fsm/storage.py): компактный JSON на ключ, updated_at — для TTL
+FSM_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS fsm_storage (
+        bot_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        destiny TEXT NOT NULL DEFAULT 'default',
+        state TEXT,
+        data TEXT,
+        updated_at INTEGER NOT NULL,
+        PRIMARY KEY (bot_id, chat_id, user_id, destiny)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_fsm_updated ON fsm_storage(updated_at)",
+)
+
+
+# === Вспомогательные функции ===
+
+async def has_table(db: aiosqlite.Connection, name: str) -> bool:
+    """Есть ли в базе таблица (в т.ч. виртуальная) с таким именем."""
+    async with db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ) as cursor:
+        return bool(await cursor.fetchone())
+
+
+async def _commit_chunk(db: aiosqlite.Connection):
+    """Фиксирует порцию и открывает следующую транзакцию (блокировка записи отпускается между порциями)."""
+    await db.commit()
+    await db.execute("BEGIN IMMEDIATE")
+
+
+async def _id_ranges(db: aiosqlite.Connection, chunk_size: int) -> AsyncIterator[Tuple[int, int]]:
+    """Диапазоны id таблицы movies по chunk_size (включительно)."""
+    async with db.execute("SELECT MIN(id), MAX(id) FROM movies") as cursor:
+        low, high = await cursor.fetchone()
+    if low is None:
+        return
+    for start in range(low, high + 1, chunk_size):
+        yield start, start + chunk_size - 1
+
+
+# === Миграции ===
+
+async def _create_movies(db: aiosqlite.Connection):
+    """Таблица movies и недостающие колонки для баз старых версий."""
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            title_norm TEXT,
+            genre TEXT NOT NULL,
+            description TEXT,
+            poster_id TEXT,
+            added_at TEXT DEFAULT (datetime('now')),
+            watched_at TEXT,
+            watched INTEGER DEFAULT 0,
+            UNIQUE(user_id, title) ON CONFLICT IGNORE
+        )
+        """
+    )
+
+    async with db.execute("PRAGMA table_info(movies)") as cursor:
+        columns = {row[1] for row in await cursor.fetchall()}
+
+    if "watch_later" in columns:
+        try:
+            await db.execute("ALTER TABLE movies DROP COLUMN watch_later")
+            logger.info("Удалена устаревшая колонка: watch_later")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Не удалось удалить watch_later: {e}")
+
+    # ADD COLUMN не принимает неконстантный DEFAULT — added_at заполняется следующей миграцией
+    column_definitions = {
+        "watched": "ALTER TABLE movies ADD COLUMN watched INTEGER DEFAULT 0",
+        "watched_at": "ALTER TABLE movies ADD COLUMN watched_at TEXT",
+        "added_at": "ALTER TABLE movies ADD COLUMN added_at TEXT",
+        "title_norm": "ALTER TABLE movies ADD COLUMN title_norm TEXT",
+    }
+    for col_name, sql in column_definitions.items():
+        if col_name not in columns:
+            await db.execute(sql)
+            logger.info(f"Добавлена колонка: {col_name}")
+
+
+async def _backfill_added_at(db: aiosqlite.Connection):
+    """Keyset-пагинация требует непустого ключа сортировки."""
+    updated = 0
+    async for start, end in _id_ranges(db, DB_MIGRATION_CHUNK_SIZE):
+        cursor = await db.execute(
+            "UPDATE movies SET added_at = datetime('now') WHERE id BETWEEN ? AND ? AND added_at IS NULL",
+            (start, end)
+        )
+        updated += cursor.rowcount
+        await cursor.close()
+        await _commit_chunk(db)
+    if updated:
+        logger.info(f"Заполнен added_at: {updated} строк")
+
+
+async def _create_indexes(db: aiosqlite.Connection):
+    """Индексы под фильтры, keyset-пагинацию и рекомендации."""
+    for sql in (
+        "CREATE INDEX IF NOT EXISTS idx_user_watched ON movies(user_id, watched)",
+        "CREATE INDEX IF NOT EXISTS idx_user_genre ON movies(user_id, genre)",
+        # Под keyset-пагинацию (сортировка по added_at, id)
+        "CREATE INDEX IF NOT EXISTS idx_user_added ON movies(user_id, added_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_user_watched_added ON movies(user_id, watched, added_at, id)",
+        # Под случайную рекомендацию (покрывающий, id в конце ключа)
+        "CREATE INDEX IF NOT EXISTS idx_user_genre_watched ON movies(user_id, genre, watched)",
+    ):
+        await db.execute(sql)
+
+
+async def _backfill_title_norm(db: aiosqlite.Connection):
+    """
+    Заполняет title_norm и создаёт уникальный индекс (user_id, title_norm).
+    Нормализация — в Python (casefold, ё → е), SQLite так не умеет.
+
+    Если у пользователя уже есть фильм с тем же нормализованным названием
+    (например, «Матрица» и «матрица»), более поздняя строка получает
+    title_norm с меткой id («матрица #ID12», см. duplicate_title_norm):
+    уникальный индекс создаётся, а фильм остаётся в поиске. id таких строк
+    пишутся в лог — их стоит объединить вручную.
+    """
+    seen = set()
+    async with db.execute(
+        "SELECT user_id, title_norm FROM movies WHERE title_norm IS NOT NULL"
+    ) as cursor:
+        async for user_id, title_norm in cursor:
+            seen.add((user_id, title_norm))
+
+    filled = 0
+    duplicates: Dict[int, List[int]] = defaultdict(list)
+    async for start, end in _id_ranges(db, DB_MIGRATION_CHUNK_SIZE):
+        async with db.execute(
+            """
+            SELECT id, user_id, title FROM movies
+            WHERE id BETWEEN ? AND ? AND title_norm IS NULL
+            ORDER BY id
+            """,
+            (start, end)
+        ) as cursor:
+            pending = await cursor.fetchall()
+
+        updates = []
+        for movie_id, user_id, title in pending:
+            key = (user_id, normalize_title(title))
+            if key in seen:
+                duplicates[user_id].append(movie_id)
+                updates.append((duplicate_title_norm(key[1], movie_id), movie_id))
+                continue
+            seen.add(key)
+            updates.append((key[1], movie_id))
+
+        if updates:
+            await db.executemany("UPDATE movies SET title_norm = ? WHERE id = ?", updates)
+            filled += len(updates)
+        await _commit_chunk(db)
+
+    if filled:
+        logger.info(f"Заполнен title_norm: {filled} строк")
+    for user_id, movie_ids in duplicates.items():
+        logger.warning(
+            f"Дубликаты после нормализации названий: user_id={user_id}, id={movie_ids} "
+            f"(title_norm с меткой id, объедините вручную)"
+        )
+
+    # Проверка дубликатов: SQLite LOWER не знает кириллицу, поэтому ключ считается в Python
+    await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_user_title_norm ON movies(user_id, title_norm)")
+    await db.execute("DROP INDEX IF EXISTS idx_user_title_lower")
+
+
+async def _create_fts(db: aiosqlite.Connection):
+    """
+    Создаёт таблицу movies_fts с триггерами синхронизации и заполняет её.
+    Если SQLite собран без FTS5, поиск работает без индекса.
+    """
+    await db.execute("SAVEPOINT create_fts")
+    try:
+        await db.execute(FTS_CONTENT_VIEW)
+        for sql in FTS_SCHEMA:
+            await db.execute(sql)
+        await db.execute("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        await db.execute("ROLLBACK TO create_fts")
+        await db.execute("RELEASE create_fts")
+        logger.warning(f"FTS5 недоступен, поиск будет работать без индекса: {e}")
+        return
+    await db.execute("RELEASE create_fts")
+    logger.info("Создан и заполнен полнотекстовый индекс: movies_fts")
+
+
+async def _create_stats(db: aiosqlite.Connection):
+    """
+    Создаёт таблицы агрегатов с триггерами и заполняет их из существующих строк —
+    в той же транзакции, что и триггеры, поэтому счётчики сразу точные.
+    """
+    if not await has_table(db, "user_stats"):
+        for sql in STATS_SCHEMA:
+            await db.execute(sql)
+        await db.execute(
+            """
+            INSERT INTO user_stats(user_id, total, watched)
+            SELECT user_id, COUNT(*), SUM(COALESCE(watched, 0) <> 0)
+            FROM movies GROUP BY user_id
+            """
+        )
+        await db.execute(
+            """
+            INSERT INTO user_genre_stats(user_id, genre, total, unwatched)
+            SELECT user_id, genre, COUNT(*), SUM(COALESCE(watched, 0) = 0)
+            FROM movies GROUP BY user_id, genre
+            """
+        )
+        logger.info("Созданы и заполнены агрегаты: user_stats, user_genre_stats")
+
+    for sql in STATS_TRIGGERS:
+        await db.execute(sql)
+
+
+async def _create_deck(db: aiosqlite.Connection):
+    """Колода рекомендаций «без повторов»."""
+    for sql in DECK_SCHEMA:
+        await db.execute(sql)
+
+
+async def _create_fsm_storage(db: aiosqlite.Connection):
+    """Таблица состояний FSM."""
+    for sql in FSM_SCHEMA:
+        await db.execute(sql)
+
+
+# Номер, имя, функция. Номера только растут; применённые миграции не меняются —
+# изменение схемы оформляется новой миграцией в конце списка.
+MIGRATIONS: List[Tuple[int, str, Callable[[aiosqlite.Connection], Awaitable[None]]]] = [
+    (1, "create_movies", _create_movies),
+    (2, "backfill_added_at", _backfill_added_at),
+    (3, "create_indexes", _create_indexes),
+    (4, "title_norm", _backfill_title_norm),
+    (5, "movies_fts", _create_fts),
+    (6, "user_stats", _create_stats),
+    (7, "recommend_deck", _create_deck),
+    (8, "fsm_storage", _create_fsm_storage),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def get_schema_version(db: aiosqlite.Connection) -> int:
+    """Текущая версия схемы (PRAGMA user_version)."""
+    async with db.execute("PRAGMA user_version") as cursor:
+        row = await cursor.fetchone()
+    return row[0]
+
+
+async def run_migrations(db: aiosqlite.Connection) -> List[Tuple[int, str, float]]:
+    """
+    Применяет миграции новее текущей версии схемы.
+
+    :param db: Подключение на запись
+    :return: Применённые миграции: (номер, имя, длительность в секундах)
+    """
+    current = await get_schema_version(db)
+    if current >= LATEST_VERSION:
+        if current > LATEST_VERSION:
+            logger.warning(f"Версия схемы {current} новее известной коду ({LATEST_VERSION})")
+        logger.info(f"Схема БД актуальна (версия {current})")
+        return []
+
+    applied: List[Tuple[int, str, float]] = []
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+
+        started = time.perf_counter()
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            await migrate(db)
+            # user_version транзакционен: фиксируется вместе с изменениями миграции
+            await db.execute(f"PRAGMA user_version = {version:d}")
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            logger.error(f"Миграция {version:03d} {name} не применена, версия схемы осталась {version - 1}")
+            raise
+
+        elapsed = time.perf_counter() - started
+        applied.append((version, name, elapsed))
+        logger.info(f"Миграция {version:03d} {name}: {elapsed * 1000:.1f} мс")
+
+    total = sum(elapsed for _, _, elapsed in applied)
+    logger.info(f"Схема БД обновлена: {current} → {LATEST_VERSION}, {len(applied)} миграций за {total * 1000:.1f} мс")
+    return applied
@@ -0,0 +1,257 @@
+"""
+Пул долгоживущих подключений к SQLite.
+
+Содержит:
+- Набор «тёплых» подключений для чтения
+- Выделенное подключение для записи (одно на процесс — SQLite всё равно
+  допускает только одного писателя)
+- Однократную настройку PRAGMA при открытии подключения
+- Проверку живости простаивающих подключений
+- Метрики: размер пула, ожидания, время ожидания
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA, которые применяются к каждому подключению один раз при открытии
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+)
+
+
+class PoolTimeoutError(TimeoutError):
+    """Не удалось получить подключение из пула за отведённое время."""
+
+
+class ConnectionPool:
+    """
+    Пул подключений aiosqlite: N читателей + один писатель.
+
+    Подключения открываются при `open()` и живут до `close()`,
+    поэтому обработчик не платит за создание потока и PRAGMA на каждый запрос.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        readers: int = 3,
+        timeout: float = 10.0,
+        acquire_timeout: float = 10.0,
+        health_check_interval: float = 30.0,
+    ):
+        if readers < 1:
+            raise ValueError("В пуле должно быть хотя бы одно подключение для чтения")
+
+        self.path = path
+        self.readers = readers
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._all_readers: List[aiosqlite.Connection] = []
+        self._last_used: Dict[int, float] = {}
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_lock = asyncio.Lock()
+        self._closed = True
+
+        # Метрики
+        self._acquisitions = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._writer_acquisitions = 0
+        self._writer_wait_time_total = 0.0
+        self._reconnects = 0
+        self._health_checks = 0
+
+    # === Жизненный цикл ===
+
+    async def open(self):
+        """Открывает писателя и все подключения для чтения."""
+        if not self._closed:
+            return
+
+        self._writer = await self._connect()
+        for _ in range(self.readers):
+            conn = await self._connect()
+            self._all_readers.append(conn)
+            self._idle.put_nowait(conn)
+        self._closed = False
+        logger.info(f"Пул БД открыт: читателей={self.readers}, файл={self.path}")
+
+    async def close(self):
+        """Закрывает все подключения пула."""
+        if self._closed:
+            return
+        self._closed = True
+
+        for conn in self._all_readers:
+            await self._safe_close(conn)
+        self._all_readers.clear()
+        self._last_used.clear()
+        self._idle = asyncio.Queue()
+
+        if self._writer is not None:
+            await self._safe_close(self._writer)
+            self._writer = None
+        logger.info("Пул БД закрыт")
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    # === Выдача подключений ===
+
+    @asynccontextmanager
+    async def reader(self):
+        """
+        Выдаёт подключение из пула читателей.
+        Если все заняты — ждёт не дольше `acquire_timeout`.
+        """
+        if self._closed:
+            raise RuntimeError("Пул БД закрыт")
+
+        conn = await self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            await self._release_reader(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        """
+        Выдаёт выделенное подключение для записи.
+        Доступ сериализуется через asyncio.Lock — писатель всегда один.
+        """
+        if self._closed:
+            raise RuntimeError("Пул БД закрыт")
+
+        started = time.perf_counter()
+        async with self._writer_lock:
+            self._writer_acquisitions += 1
+            self._writer_wait_time_total += time.perf_counter() - started
+
+            self._writer = await self._ensure_alive(self._writer)
+            try:
+                yield self._writer
+            finally:
+                await self._reset(self._writer)
+
+    async def _acquire_reader(self) -> aiosqlite.Connection:
+        self._acquisitions += 1
+        if not self._idle.empty():
+            conn = self._idle.get_nowait()
+        else:
+            # Все подключения заняты — ждём освобождения
+            self._waits += 1
+            started = time.perf_counter()
+            try:
+                conn = await asyncio.wait_for(self._idle.get(), timeout=self.acquire_timeout)
+            except asyncio.TimeoutError:
+                raise PoolTimeoutError(
+                    f"Нет свободных подключений к БД за {self.acquire_timeout} с"
+                ) from None
+            finally:
+                waited = time.perf_counter() - started
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+
+        try:
+            return await self._ensure_alive(conn)
+        except Exception:
+            # Не теряем слот пула, если переподключение не удалось
+            self._idle.put_nowait(conn)
+            raise
+
+    async def _release_reader(self, conn: aiosqlite.Connection):
+        if self._closed:
+            await self._safe_close(conn)
+            return
+        await self._reset(conn)
+        self._last_used[id(conn)] = time.monotonic()
+        self._idle.put_nowait(conn)
+
+    # === Обслуживание подключений ===
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path, timeout=self.timeout)
+        conn.row_factory = aiosqlite.Row
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        await conn.commit()
+        self._last_used[id(conn)] = time.monotonic()
+        return conn
+
+    async def _ensure_alive(self, conn: aiosqlite.Connection) -> aiosqlite.Connection:
+        """
+        Проверяет подключение, если оно долго простаивало.
+        Мёртвое подключение заменяется новым.
+        """
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle_for < self.health_check_interval:
+            return conn
+
+        self._health_checks += 1
+        try:
+            await conn.execute("SELECT 1")
+            self._last_used[id(conn)] = time.monotonic()
+            return conn
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Подключение к БД не отвечает, переподключаюсь: {e}")
+
+        await self._safe_close(conn)
+        new_conn = await self._connect()
+        self._reconnects += 1
+        if conn in self._all_readers:
+            self._all_readers[self._all_readers.index(conn)] = new_conn
+        return new_conn
+
+    async def _reset(self, conn: aiosqlite.Connection):
+        """Откатывает незавершённую транзакцию, чтобы не отдать «грязное» подключение."""
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+                logger.warning("Подключение возвращено в пул с открытой транзакцией — откат")
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Не удалось откатить транзакцию: {e}")
+
+    async def _safe_close(self, conn: aiosqlite.Connection):
+        self._last_used.pop(id(conn), None)
+        try:
+            await conn.close()
+        except Exception as e:
+            logger.debug("Ошибка при закрытии подключения: %s", e)
+
+    # === Метрики ===
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Возвращает снимок метрик пула.
+        """
+        idle = self._idle.qsize() if not self._closed else 0
+        return {
+            "readers_total": len(self._all_readers),
+            "readers_idle": idle,
+            "readers_in_use": len(self._all_readers) - idle,
+            "acquisitions": self._acquisitions,
+            "waits": self._waits,
+            "wait_time_total": self._wait_time_total,
+            "wait_time_max": self._wait_time_max,
+            "writer_acquisitions": self._writer_acquisitions,
+            "writer_wait_time_total": self._writer_wait_time_total,
+            "writer_locked": int(self._writer_lock.locked()),
+            "reconnects": self._reconnects,
+            "health_checks": self._health_checks,
+        }
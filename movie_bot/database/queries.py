@@ -3,20 +3,36 @@
 
 Содержит асинхронные функции для:
 - Получения фильмов
+- Постраничной выборки (keyset-пагинация)
+- Полнотекстового поиска (FTS5)
+- Случайной рекомендации по жанру
 - Добавления
 - Удаления
 - Проверки дубликатов
 - Отметки как просмотренных
+
+Каждая функция обёрнута в @timed_query: время и ошибки видны в /metrics,
+а вызовы во время обработки обновления — в трейсе (utils/tracing.py).
 """
 
+import calendar
 import logging
-from typing import List, Optional, Dict
+import random
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, List, Optional, Dict, Sequence, Tuple
 import aiosqlite
 
-from movie_bot.database.db import get_db, ALLOWED_ORDER_FIELDS
+from movie_bot.config import ITEMS_PER_PAGE
+from movie_bot.database.db import get_db, run_write, is_fts_enabled, ALLOWED_ORDER_FIELDS
+from movie_bot.utils.metrics import timed_query
+from movie_bot.utils.text_utils import DUPLICATE_MARK, normalize_title
 
 logger = logging.getLogger(__name__)
 
+# Колонки карточки фильма (для SELECT и RETURNING)
+_CARD_COLUMNS = "id, title, genre, description, poster_id, watched, added_at, watched_at"
+
+@timed_query
 async def get_all_movies(
     user_id: int,
     watched: Optional[bool] = None,
@@ -50,10 +66,362 @@ async def get_all_movies(
     async with get_db() as db:
         async with db.execute(query, params) as cursor:
             rows = await cursor.fetchall()
-            logger.debug(f"Получено {len(rows)} фильмов: user_id={user_id}, watched={watched}")
+            logger.debug("Получено %d фильмов: user_id=%s, watched=%s", len(rows), user_id, watched)
             return rows
 
 
+@timed_query
+async def get_movie_summaries(user_id: int) -> List[aiosqlite.Row]:
+    """
+    Возвращает компактные строки библиотеки пользователя
+    (id, title, genre, watched, added_at) — без описаний и постеров.
+    Используется для кэша библиотек в MovieService.
+    """
+    async with get_db() as db:
+        async with db.execute(
+            "SELECT id, title, genre, watched, added_at FROM movies WHERE user_id = ?",
+            (user_id,)
+        ) as cursor:
+            return await cursor.fetchall()
+
+
+async def iter_movies(user_id: int, batch_size: int = 500) -> AsyncIterator[aiosqlite.Row]:
+    """
+    Потоково отдаёт все фильмы пользователя (полные карточки) в порядке добавления.
+
+    Строки читаются пачками по batch_size (keyset по индексу idx_user_added)
+    через async-итератор курсора — без fetchall() по всей библиотеке.
+    Подключение берётся из пула на одну пачку и возвращается до того,
+    как пачка уйдёт потребителю: медленный потребитель не держит ни
+    подключение, ни снимок WAL. Память — одна пачка при любом размере библиотеки.
+    """
+    last: Optional[Tuple[str, int]] = None
+    while True:
+        where = "user_id = ?"
+        params: List[Any] = [user_id]
+        if last is not None:
+            where += " AND (added_at, id) > (?, ?)"
+            params.extend(last)
+        params.append(batch_size)
+
+        batch = []
+        async with get_db() as db:
+            async with db.execute(
+                f"SELECT {_CARD_COLUMNS} FROM movies WHERE {where} ORDER BY added_at, id LIMIT ?",
+                params
+            ) as cursor:
+                async for row in cursor:
+                    batch.append(row)
+
+        for row in batch:
+            yield row
+        if len(batch) < batch_size:
+            return
+        last = (batch[-1]["added_at"], batch[-1]["id"])
+
+
+# Сортировки, для которых есть индекс под keyset-пагинацию: порядок -> (поле, направление)
+KEYSET_ORDERS = {
+    "added_at DESC": ("added_at", "DESC"),
+    "added_at ASC": ("added_at", "ASC"),
+    "id DESC": ("id", "DESC"),
+    "id ASC": ("id", "ASC"),
+}
+
+_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _to_base36(value: int) -> str:
+    if value == 0:
+        return "0"
+    digits = []
+    while value:
+        value, rem = divmod(value, 36)
+        digits.append(_BASE36[rem])
+    return "".join(reversed(digits))
+
+
+def _added_at_seconds(value: Any) -> Optional[int]:
+    """
+    added_at в секундах UTC, если строка в формате CURRENT_TIMESTAMP
+    и переводится обратно без потерь. Иначе (доли секунды, «T», другая
+    зона) — None: сравнение восстановленной строки с исходной было бы неверным.
+    """
+    try:
+        parsed = datetime.strptime(value, _DATETIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    if parsed.strftime(_DATETIME_FORMAT) != value:
+        return None
+    return calendar.timegm(parsed.timetuple())
+
+
+def _encode_cursor(direction: str, field: str, row) -> str:
+    """
+    Кодирует позицию в списке в короткую строку для callback_data.
+    Формат: <a|b><ключ сортировки base36>.<id base36>,
+    где a — «после этой строки», b — «до этой строки».
+    Если added_at не переводится в секунды, ключ пустой (<a|b>.<id>) —
+    он берётся из строки с этим id при запросе.
+    """
+    if field == "added_at":
+        sort_value = _added_at_seconds(row["added_at"])
+        if sort_value is None:
+            return f"{direction}.{_to_base36(row['id'])}"
+    else:
+        sort_value = row["id"]
+    return f"{direction}{_to_base36(sort_value)}.{_to_base36(row['id'])}"
+
+
+def _decode_cursor(cursor: str, field: str) -> Tuple[str, Any, int]:
+    """
+    Разбирает курсор из `_encode_cursor`.
+    Ключ сортировки None — курсор по id (ключ берётся из строки).
+    :raises ValueError: Если курсор повреждён
+    """
+    direction, body = cursor[:1], cursor[1:]
+    if direction not in ("a", "b") or "." not in body:
+        raise ValueError(f"Некорректный курсор: {cursor!r}")
+
+    sort_part, id_part = body.split(".", 1)
+    movie_id = int(id_part, 36)
+    if not sort_part and field != "id":
+        return direction, None, movie_id
+    sort_value = int(sort_part, 36)
+    if field == "added_at":
+        sort_value = datetime.fromtimestamp(sort_value, tz=timezone.utc).strftime(_DATETIME_FORMAT)
+    return direction, sort_value, movie_id
+
+
+@timed_query
+async def get_movies_page(
+    user_id: int,
+    watched: Optional[bool] = None,
+    order: str = "added_at DESC",
+    cursor: Optional[str] = None,
+    limit: int = ITEMS_PER_PAGE,
+    skip: int = 0
+) -> Dict[str, Any]:
+    """
+    Возвращает одну страницу фильмов пользователя (keyset-пагинация).
+
+    Вместо OFFSET используется сравнение с ключом последней/первой строки
+    соседней страницы, поэтому стоимость не зависит от номера страницы.
+    Индексы idx_user_added и idx_user_watched_added совпадают с порядком сортировки.
+
+    :param user_id: Telegram ID пользователя
+    :param watched: Фильтр по статусу (None — все)
+    :param order: Сортировка из KEYSET_ORDERS
+    :param cursor: Курсор из next_cursor/prev_cursor предыдущего вызова (None — первая страница)
+    :param limit: Размер страницы
+    :param skip: Сколько строк пропустить за курсором (переход сразу на несколько страниц;
+                 OFFSET ограничен несколькими страницами, поэтому остаётся дешёвым)
+    :return: {"items", "total", "next_cursor", "prev_cursor"}
+    """
+    if order not in KEYSET_ORDERS:
+        raise ValueError(f"Сортировка не поддерживает keyset-пагинацию: {order}")
+    field, direction = KEYSET_ORDERS[order]
+
+    where = "user_id = ?"
+    params: List[Any] = [user_id]
+    if watched is not None:
+        where += " AND watched = ?"
+        params.append(1 if watched else 0)
+
+    backwards = False
+    # Курсор разобран: без него показывается первая страница
+    positioned = False
+    if cursor:
+        try:
+            cursor_dir, sort_value, cursor_id = _decode_cursor(cursor, field)
+        except ValueError as e:
+            logger.warning(f"[get_movies_page] {e} — показываю первую страницу")
+        else:
+            positioned = True
+            backwards = cursor_dir == "b"
+            # «Дальше по списку» для DESC — меньше ключа, для ASC — больше
+            after_op = "<" if direction == "DESC" else ">"
+            before_op = ">" if direction == "DESC" else "<"
+            op = before_op if backwards else after_op
+            if field == "id":
+                where += f" AND id {op} ?"
+                params.append(cursor_id)
+            elif sort_value is None:
+                where += f" AND ({field}, id) {op} ((SELECT {field} FROM movies WHERE id = ? AND user_id = ?), ?)"
+                params.extend([cursor_id, user_id, cursor_id])
+            else:
+                where += f" AND ({field}, id) {op} (?, ?)"
+                params.extend([sort_value, cursor_id])
+
+    scan_direction = direction
+    if backwards:
+        scan_direction = "ASC" if direction == "DESC" else "DESC"
+    order_clause = (
+        f"id {scan_direction}" if field == "id"
+        else f"{field} {scan_direction}, id {scan_direction}"
+    )
+
+    query = f"""
+        SELECT id, title, genre, watched, added_at
+        FROM movies
+        WHERE {where}
+        ORDER BY {order_clause}
+        LIMIT ? OFFSET ?
+    """
+    params.extend([limit + 1, skip])
+
+    async with get_db() as db:
+        async with db.execute(query, params) as db_cursor:
+            rows = list(await db_cursor.fetchall())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = positioned or skip > 0, has_more
+
+    stats = await get_user_stats(user_id)
+    if watched is None:
+        total = stats["total"]
+    elif watched:
+        total = stats["watched"]
+    else:
+        total = stats["total"] - stats["watched"]
+
+    return {
+        "items": rows,
+        "total": total,
+        "next_cursor": _encode_cursor("a", field, rows[-1]) if rows and has_next else None,
+        "prev_cursor": _encode_cursor("b", field, rows[0]) if rows and has_prev else None,
+    }
+
+
+# Триграммный токенизатор не находит запросы короче трёх символов
+_FTS_MIN_QUERY_LENGTH = 3
+
+
+def _fts_match(user_id: int, query: str) -> str:
+    """
+    Выражение MATCH: фраза по названию и жанру в библиотеке пользователя.
+    Метка владельца — как в movies_fts_content (migrations.py).
+    """
+    # Запрос как фраза: кавычки внутри экранируются удвоением
+    phrase = '"' + query.replace('"', '""') + '"'
+    return f'{{title_norm genre}} : {phrase} AND owner : "u{user_id}u"'
+
+
+@timed_query
+async def search_movies(
+    user_id: int,
+    query: str,
+    limit: int = 50,
+    offset: int = 0
+) -> List[aiosqlite.Row]:
+    """
+    Ищет фильмы пользователя по подстроке в названии или жанре.
+
+    Использует полнотекстовый индекс movies_fts (триграммы по title_norm;
+    поиск сразу в пределах пользователя по метке owner). Сначала короткие
+    названия: для запроса из одной фразы это порядок bm25 при одном вхождении,
+    а сам bm25 для IDF обходит совпадения фразы у всех пользователей.
+    Для запросов короче трёх символов и для сборок SQLite без FTS5 — поиск
+    по строкам пользователя.
+
+    :param user_id: Telegram ID пользователя
+    :param query: Поисковый запрос (регистр, «ё» и пунктуация не важны)
+    :param limit: Максимум результатов
+    :param offset: Сколько результатов пропустить
+    :return: Список строк (aiosqlite.Row)
+    """
+    query = normalize_title(query)
+    if not query:
+        return []
+
+    if is_fts_enabled() and len(query) >= _FTS_MIN_QUERY_LENGTH:
+        async with get_db() as db:
+            async with db.execute(
+                """
+                SELECT m.id, m.title, m.genre, m.description, m.poster_id,
+                       m.watched, m.added_at, m.watched_at
+                FROM movies_fts
+                JOIN movies AS m ON m.id = movies_fts.rowid
+                WHERE movies_fts MATCH ?
+                ORDER BY length(m.title_norm), m.id DESC
+                LIMIT ? OFFSET ?
+                """,
+                (_fts_match(user_id, query), limit, offset)
+            ) as cursor:
+                return await cursor.fetchall()
+
+    # Короткий запрос: SQLite LOWER не знает кириллицу, сравниваем в Python
+    rows = [
+        movie for movie in await get_all_movies(user_id=user_id, watched=None)
+        if query in normalize_title(movie["title"]) or query in movie["genre"].casefold()
+    ]
+    return rows[offset:offset + limit]
+
+
+@timed_query
+async def search_movie_ids(user_id: int, query: str, limit: int = 50) -> Optional[List[int]]:
+    """
+    Как search_movies, но возвращает только id в том же порядке —
+    компактный результат для хранения в FSM (см. get_movies_by_ids).
+
+    Только поиск по индексу: для запросов короче трёх символов и сборок
+    SQLite без FTS5 возвращает None — библиотеку фильтрует вызывающий
+    (MovieService.search_ids, по кэшированному снимку).
+
+    :param user_id: Telegram ID пользователя
+    :param query: Поисковый запрос (регистр, «ё» и пунктуация не важны)
+    :param limit: Максимум результатов
+    :return: Список id фильмов или None
+    """
+    query = normalize_title(query)
+    if not query:
+        return []
+    if not is_fts_enabled() or len(query) < _FTS_MIN_QUERY_LENGTH:
+        return None
+
+    async with get_db() as db:
+        async with db.execute(
+            """
+            SELECT m.id
+            FROM movies_fts
+            JOIN movies AS m ON m.id = movies_fts.rowid
+            WHERE movies_fts MATCH ?
+            ORDER BY length(m.title_norm), m.id DESC
+            LIMIT ?
+            """,
+            (_fts_match(user_id, query), limit)
+        ) as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
+
+@timed_query
+async def get_movies_by_ids(user_id: int, movie_ids: List[int]) -> List[aiosqlite.Row]:
+    """
+    Возвращает строки (id, title, genre, watched) для страницы id в том же порядке.
+    Удалённые с тех пор фильмы пропускаются.
+
+    :param user_id: Telegram ID пользователя
+    :param movie_ids: id фильмов (одна страница)
+    """
+    if not movie_ids:
+        return []
+    placeholders = ",".join("?" * len(movie_ids))
+    async with get_db() as db:
+        async with db.execute(
+            f"SELECT id, title, genre, watched FROM movies WHERE user_id = ? AND id IN ({placeholders})",
+            (user_id, *movie_ids)
+        ) as cursor:
+            rows = {row["id"]: row for row in await cursor.fetchall()}
+    return [rows[movie_id] for movie_id in movie_ids if movie_id in rows]
+
+
+@timed_query
 async def get_movies_by_genre(
     genre: str,
     user_id: int
@@ -80,6 +448,114 @@ async def get_movies_by_genre(
             return await cursor.fetchall()
 
 
+@timed_query
+async def pick_random_movie(
+    user_id: int,
+    genre: str,
+    no_repeat: bool = False
+) -> Optional[Dict]:
+    """
+    Выбирает случайный непросмотренный фильм жанра прямо в SQL.
+
+    Обычный режим: число непросмотренных фильмов жанра берётся из счётчика
+    user_genre_stats.unwatched (его держат триггеры), смещение — равномерно
+    случайное в этих пределах. Строка находится по покрывающему индексу
+    idx_user_genre_watched (id в нём идёт последним столбцом) — в память
+    попадает только один фильм, сколько бы их ни было в жанре.
+
+    Режим no_repeat: фильмы выдаются из перемешанной колоды recommend_deck
+    и не повторяются, пока колода не закончится. Добавленные за это время
+    фильмы попадут в следующую колоду.
+
+    :param user_id: Telegram ID пользователя
+    :param genre: Точный жанр
+    :param no_repeat: Не повторять рекомендации до исчерпания колоды
+    :return: Словарь с id, title, genre, description, poster_id или None
+    """
+    if no_repeat:
+        return await run_write(lambda db: _draw_from_deck(db, user_id, genre))
+
+    async with get_db() as db:
+        async with db.execute(
+            "SELECT unwatched FROM user_genre_stats WHERE user_id = ? AND genre = ?",
+            (user_id, genre)
+        ) as cursor:
+            row = await cursor.fetchone()
+        unwatched = row[0] if row else 0
+        if unwatched <= 0:
+            return None
+
+        # Между запросами фильм могли удалить или отметить — тогда берём первый
+        for offset in (random.randrange(unwatched), 0):
+            async with db.execute(
+                """
+                SELECT id, title, genre, description, poster_id
+                FROM movies
+                WHERE id = (
+                    SELECT id FROM movies
+                    WHERE user_id = ? AND genre = ? AND watched = 0
+                    ORDER BY id
+                    LIMIT 1 OFFSET ?
+                )
+                """,
+                (user_id, genre, offset)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row:
+                return dict(row)
+        return None
+
+
+async def _draw_from_deck(db: aiosqlite.Connection, user_id: int, genre: str) -> Optional[Dict]:
+    """
+    Берёт верхнюю карту колоды. Карты фильмов, которые с тех пор
+    посмотрели или перенесли в другой жанр, пропускаются и удаляются.
+    Пустая колода пересобирается один раз.
+    """
+    for _ in range(2):
+        async with db.execute(
+            """
+            SELECT d.position, m.id, m.title, m.genre, m.description, m.poster_id
+            FROM recommend_deck AS d
+            JOIN movies AS m ON m.id = d.movie_id
+            WHERE d.user_id = ? AND d.genre = ? AND m.watched = 0 AND m.genre = d.genre
+            ORDER BY d.position
+            LIMIT 1
+            """,
+            (user_id, genre)
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        if row:
+            await db.execute(
+                "DELETE FROM recommend_deck WHERE user_id = ? AND genre = ? AND position <= ?",
+                (user_id, genre, row["position"])
+            )
+            movie = dict(row)
+            movie.pop("position")
+            return movie
+
+        # Колода пуста — собираем новую
+        await db.execute(
+            "DELETE FROM recommend_deck WHERE user_id = ? AND genre = ?",
+            (user_id, genre)
+        )
+        cursor = await db.execute(
+            """
+            INSERT INTO recommend_deck (user_id, genre, position, movie_id)
+            SELECT user_id, genre, ROW_NUMBER() OVER (ORDER BY random()), id
+            FROM movies
+            WHERE user_id = ? AND genre = ? AND watched = 0
+            """,
+            (user_id, genre)
+        )
+        if cursor.rowcount <= 0:
+            return None
+        logger.debug("Колода рекомендаций пересобрана: user_id=%s, genre=%s, карт=%s", user_id, genre, cursor.rowcount)
+    return None
+
+
+@timed_query
 async def get_movie_by_id(user_id: int, movie_id: int) -> Optional[Dict]:
     """
     Возвращает данные фильма по ID и пользователю.
@@ -97,62 +573,154 @@ async def get_movie_by_id(user_id: int, movie_id: int) -> Optional[Dict]:
             return dict(row) if row else None
 
 
+@timed_query
 async def add_movie(
     user_id: int,
     title: str,
     genre: str,
     description: str,
     poster_id: Optional[str] = None
-):
+) -> Optional[Dict]:
     """
     Добавляет фильм. Использует CURRENT_TIMESTAMP.
+    Запись идёт через конвейер с групповым коммитом.
+    Возвращает добавленную карточку (INSERT ... RETURNING) или None,
+    если у пользователя уже есть фильм с тем же нормализованным названием.
     """
-    async with get_db() as db:
-        await db.execute(
-            """
-            INSERT INTO movies (user_id, title, genre, description, poster_id, added_at)
-            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    async def _op(db: aiosqlite.Connection) -> Optional[Dict]:
+        async with db.execute(
+            f"""
+            INSERT OR IGNORE INTO movies (user_id, title, title_norm, genre, description, poster_id, added_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            RETURNING {_CARD_COLUMNS}
             """,
-            (user_id, title, genre, description, poster_id)
-        )
-        await db.commit()
+            (user_id, title, normalize_title(title), genre, description, poster_id)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return dict(row) if row else None
+
+    movie = await run_write(_op)
+    if movie:
         logger.info(f"Фильм добавлен: {title} | user_id={user_id}")
+    else:
+        logger.info(f"Фильм уже есть: {title} | user_id={user_id}")
+    return movie
+
+
+@timed_query
+async def add_movies_bulk(user_id: int, movies: Sequence[Tuple[str, str, Optional[str], int]]) -> int:
+    """
+    Добавляет пачку фильмов одной операцией executemany (импорт из файла).
+    Дубликаты — уже в библиотеке или повторы внутри пачки — пропускаются
+    уникальными индексами (INSERT OR IGNORE).
+
+    :param movies: Кортежи (title, genre, description, watched)
+    :return: Сколько фильмов добавлено
+    """
+    rows = [
+        (user_id, title, normalize_title(title), genre, description, watched, watched)
+        for title, genre, description, watched in movies
+    ]
 
+    async def _op(db: aiosqlite.Connection) -> int:
+        async with db.executemany(
+            """
+            INSERT OR IGNORE INTO movies
+                (user_id, title, title_norm, genre, description, watched, watched_at, added_at)
+            VALUES (?, ?, ?, ?, ?, ?, CASE WHEN ? THEN CURRENT_TIMESTAMP END, CURRENT_TIMESTAMP)
+            """,
+            rows
+        ) as cursor:
+            return cursor.rowcount
 
+    added = await run_write(_op)
+    logger.info("Импорт пачки: добавлено %d из %d | user_id=%s", added, len(rows), user_id)
+    return added
+
+
+@timed_query
 async def delete_movie(movie_id: int, user_id: int) -> Optional[str]:
     """
     Удаляет фильм. Возвращает название или None.
     """
-    async with get_db() as db:
+    deleted = await delete_movie_returning(movie_id, user_id)
+    return deleted["title"] if deleted else None
+
+
+@timed_query
+async def delete_movie_returning(movie_id: int, user_id: int) -> Optional[Dict]:
+    """
+    Удаляет фильм одним запросом DELETE ... RETURNING.
+    Возвращает удалённую строку целиком или None, если фильма нет.
+    """
+    async def _op(db: aiosqlite.Connection) -> Optional[Dict]:
         async with db.execute(
-            "SELECT title FROM movies WHERE id = ? AND user_id = ?",
+            f"""
+            DELETE FROM movies
+            WHERE id = ? AND user_id = ?
+            RETURNING {_CARD_COLUMNS}
+            """,
             (movie_id, user_id)
         ) as cursor:
             row = await cursor.fetchone()
-            if not row:
-                return None
-            await db.execute("DELETE FROM movies WHERE id = ?", (movie_id,))
-            await db.commit()
-            return row["title"]
+        return dict(row) if row else None
+
+    return await run_write(_op)
 
 
+@timed_query
+async def toggle_watched_returning(movie_id: int, user_id: int) -> Optional[Dict]:
+    """
+    Атомарно переключает статус «просмотрено» одним запросом UPDATE ... RETURNING.
+    Возвращает обновлённую карточку фильма или None, если фильма нет.
+    """
+    async def _op(db: aiosqlite.Connection) -> Optional[Dict]:
+        async with db.execute(
+            f"""
+            UPDATE movies SET
+                watched = CASE WHEN COALESCE(watched, 0) = 0 THEN 1 ELSE 0 END,
+                watched_at = CASE WHEN COALESCE(watched, 0) = 0 THEN CURRENT_TIMESTAMP ELSE NULL END
+            WHERE id = ? AND user_id = ?
+            RETURNING {_CARD_COLUMNS}
+            """,
+            (movie_id, user_id)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return dict(row) if row else None
+
+    return await run_write(_op)
+
+
+@timed_query
 async def is_movie_exists(user_id: int, title: str) -> bool:
     """
     Проверяет, есть ли фильм с таким названием у пользователя.
+    Сравнение по title_norm — поиск по уникальному индексу: точное совпадение
+    или старый дубликат с меткой id («матрица #ID12», см. duplicate_title_norm) —
+    диапазон [«матрица #ID», «матрица #IE»).
     """
+    normalized = normalize_title(title)
+    marked = normalized + DUPLICATE_MARK
+    # Верхняя граница диапазона: последний символ метки + 1
+    marked_end = marked[:-1] + chr(ord(marked[-1]) + 1)
     async with get_db() as db:
         async with db.execute(
-            "SELECT 1 FROM movies WHERE user_id = ? AND LOWER(title) = LOWER(?)",
-            (user_id, title)
+            """
+            SELECT EXISTS(SELECT 1 FROM movies WHERE user_id = ? AND title_norm = ?)
+                OR EXISTS(SELECT 1 FROM movies WHERE user_id = ? AND title_norm >= ? AND title_norm < ?)
+            """,
+            (user_id, normalized, user_id, marked, marked_end)
         ) as cursor:
-            return bool(await cursor.fetchone())
+            row = await cursor.fetchone()
+    return bool(row[0])
 
 
+@timed_query
 async def mark_movie_watched(movie_id: int, user_id: int, watched: bool):
     """
     Отмечает фильм как просмотренный/непросмотренный.
     """
-    async with get_db() as db:
+    async def _op(db: aiosqlite.Connection):
         if watched:
             await db.execute(
                 "UPDATE movies SET watched = 1, watched_at = CURRENT_TIMESTAMP WHERE id = ? AND user_id = ?",
@@ -163,9 +731,11 @@ async def mark_movie_watched(movie_id: int, user_id: int, watched: bool):
                 "UPDATE movies SET watched = 0, watched_at = NULL WHERE id = ? AND user_id = ?",
                 (movie_id, user_id)
             )
-        await db.commit()
 
+    await run_write(_op)
 
+
+@timed_query
 async def update_movie(user_id: int, movie_id: int, **kwargs):
     """
     Обновляет поля фильма. Защита от SQL-инъекций.
@@ -180,43 +750,54 @@ async def update_movie(user_id: int, movie_id: int, **kwargs):
         logger.warning(f"Попытка обновить недопустимые поля: {set(kwargs.keys()) - allowed_fields}")
         return
 
-    set_clause = ", ".join([f"{key} = ?" for key in valid_keys])
+    values = {key: kwargs[key] for key in valid_keys}
+    if "title" in values:
+        # Переименование в уже существующее название упадёт на уникальном индексе
+        values["title_norm"] = normalize_title(values["title"])
+
+    set_clause = ", ".join([f"{key} = ?" for key in values])
     query = f"UPDATE movies SET {set_clause} WHERE id = ? AND user_id = ?"
-    params = [kwargs[key] for key in valid_keys] + [movie_id, user_id]
+    params = list(values.values()) + [movie_id, user_id]
 
-    async with get_db() as db:
+    async def _op(db: aiosqlite.Connection):
         await db.execute(query, params)
-        await db.commit()
-        logger.info(f"Фильм обновлён: {movie_id} | user_id={user_id} | Поля: {valid_keys}")
 
+    await run_write(_op)
+    logger.info(f"Фильм обновлён: {movie_id} | user_id={user_id} | Поля: {valid_keys}")
+
+@timed_query
 async def get_user_stats(user_id: int) -> Dict[str, int]:
     """
     Возвращает статистику пользователя: total и watched.
-    Использует COUNT — не загружает все строки в память.
+    Читает одну строку агрегата user_stats (поддерживается триггерами).
     """
     async with get_db() as db:
         async with db.execute(
-            """
-            SELECT
-                COUNT(*) AS total,
-                SUM(CASE WHEN watched = 1 THEN 1 ELSE 0 END) AS watched
-            FROM movies
-            WHERE user_id = ?
-            """,
+            "SELECT total, watched FROM user_stats WHERE user_id = ?",
             (user_id,)
         ) as cursor:
             row = await cursor.fetchone()
-            total = row["total"] or 0
-            watched = row["watched"] or 0
-            return {"total": total, "watched": watched}
+            if not row:
+                return {"total": 0, "watched": 0}
+            return {"total": row["total"], "watched": row["watched"]}
 
 
 __all__ = [
     "get_all_movies",
+    "get_movie_summaries",
+    "iter_movies",
+    "get_movies_page",
+    "search_movies",
+    "search_movie_ids",
+    "get_movies_by_ids",
     "get_movies_by_genre",
     "get_movie_by_id",
+    "pick_random_movie",
     "add_movie",
+    "add_movies_bulk",
     "delete_movie",
+    "delete_movie_returning",
+    "toggle_watched_returning",
     "is_movie_exists",
     "mark_movie_watched",
     "update_movie",
@@ -0,0 +1,170 @@
+"""
+Конвейер записи в SQLite с групповым коммитом.
+
+Одна фоновая задача владеет подключением на запись и получает изменения
+через asyncio.Queue. Всё, что пришло за несколько миллисекунд, выполняется
+в одной транзакции: каждая операция — в своём SAVEPOINT, чтобы ошибка
+одной не откатывала остальные. Результат возвращается вызывающему
+через future после коммита.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+WriteOp = Callable[[aiosqlite.Connection], Awaitable[Any]]
+_Job = Tuple[WriteOp, asyncio.Future]
+
+_STOP = object()
+
+
+class WriteQueue:
+    """
+    Актор записи: принимает операции и применяет их пачками.
+
+    :param connection_factory: Вызываемый объект, возвращающий async context manager
+                               с подключением на запись (например, get_write_db)
+    :param batch_window: Сколько секунд ждать новые операции после первой в пачке
+    :param max_batch: Максимум операций в одной транзакции
+    """
+
+    def __init__(
+        self,
+        connection_factory: Callable[[], AsyncContextManager[aiosqlite.Connection]],
+        batch_window: float = 0.005,
+        max_batch: int = 100,
+    ):
+        self._connection_factory = connection_factory
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+        # Метрики
+        self._batches = 0
+        self._ops = 0
+        self._failed_ops = 0
+        self._max_batch_seen = 0
+        self._commit_time_total = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запускает фоновую задачу записи (если ещё не запущена)."""
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="db-writer")
+
+    async def stop(self):
+        """Дописывает всё из очереди и останавливает задачу."""
+        if not self.running:
+            return
+        self._queue.put_nowait(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, op: WriteOp) -> Any:
+        """
+        Ставит операцию в очередь и ждёт её фиксации.
+        Операция не должна сама вызывать commit().
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, future))
+        return await future
+
+    # === Фоновая задача ===
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch: List[_Job] = [item]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                try:
+                    if self._queue.empty():
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    else:
+                        item = self._queue.get_nowait()
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                await self._commit_batch(batch)
+            except Exception as e:
+                logger.error(f"[writer] Ошибка при фиксации пачки из {len(batch)} операций: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _commit_batch(self, batch: List[_Job]):
+        started = time.perf_counter()
+        results: List[Tuple[asyncio.Future, Any]] = []
+
+        async with self._connection_factory() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                for op, future in batch:
+                    if future.cancelled():
+                        continue
+                    await db.execute("SAVEPOINT write_op")
+                    try:
+                        result = await op(db)
+                    except Exception as e:
+                        await db.execute("ROLLBACK TO write_op")
+                        await db.execute("RELEASE write_op")
+                        self._failed_ops += 1
+                        if not future.done():
+                            future.set_exception(e)
+                        continue
+                    await db.execute("RELEASE write_op")
+                    results.append((future, result))
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+
+        for future, result in results:
+            if not future.done():
+                future.set_result(result)
+
+        self._batches += 1
+        self._ops += len(batch)
+        self._max_batch_seen = max(self._max_batch_seen, len(batch))
+        self._commit_time_total += time.perf_counter() - started
+        if len(batch) > 1:
+            logger.debug("[writer] Пачка из %d операций зафиксирована", len(batch))
+
+    # === Метрики ===
+
+    def stats(self) -> Dict[str, float]:
+        """Снимок метрик конвейера записи."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": self._batches,
+            "ops": self._ops,
+            "failed_ops": self._failed_ops,
+            "max_batch": self._max_batch_seen,
+            "avg_batch": self._ops / self._batches if self._batches else 0.0,
+            "commit_time_total": self._commit_time_total,
+        }
@@ -37,6 +37,13 @@ class MyMovies(StatesGroup):
     # pagination — зарезервировано (например, waiting_page)
 
 
+class ImportMovies(StatesGroup):
+    """
+    Состояния сценария: импорт библиотеки из файла.
+    """
+    file = State()
+
+
 class User(StatesGroup):
     """
     Глобальные состояния пользователя (если понадобятся).
@@ -50,5 +57,6 @@ __all__ = [
     "AddMovie",
     "EditMovie",
     "MyMovies",
+    "ImportMovies",
     "User",
 ]
\ No newline at end of file
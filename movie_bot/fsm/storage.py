@@ -0,0 +1,357 @@
+"""
+Хранилище FSM в том же файле SQLite (таблица fsm_storage, миграция 008).
+
+- Состояние и данные ключа (bot, chat, user, destiny) хранятся одной строкой:
+  state и компактный JSON данных. Пустая запись удаляет строку.
+- Запись отложенная: изменения попадают в память и сбрасываются в базу
+  фоновой задачей раз в FSM_FLUSH_INTERVAL одной транзакцией через конвейер
+  записи. Между шагами сценария база не трогается.
+- Память ограничена: в кэше не больше FSM_CACHE_MAX_KEYS ключей, вытесняются
+  давно не использованные и уже записанные в базу.
+- Сценарии, не менявшиеся дольше FSM_TTL, удаляются фоновой очисткой.
+
+После рестарта незавершённые сценарии продолжаются с того же шага.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from movie_bot.config import FSM_CACHE_MAX_KEYS, FSM_FLUSH_INTERVAL, FSM_SWEEP_INTERVAL, FSM_TTL
+from movie_bot.database.db import get_db, run_write
+from movie_bot.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_RowKey = Tuple[int, int, int, str]
+
+
+def _row_key(key: StorageKey) -> _RowKey:
+    return key.bot_id, key.chat_id, key.user_id, key.destiny
+
+
+def _dumps(data: Dict[str, Any]) -> Optional[str]:
+    if not data:
+        return None
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class _Record:
+    """Запись в памяти: состояние, данные и отметки для отложенной записи."""
+
+    __slots__ = ("state", "data", "updated_at", "version", "flushed_version")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], updated_at: float):
+        self.state = state
+        self.data = data
+        self.updated_at = updated_at
+        self.version = 0
+        self.flushed_version = 0
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.flushed_version
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище поверх SQLite с кэшем и отложенной записью.
+
+    :param ttl: Сколько секунд хранить сценарий без изменений
+    :param max_keys: Максимум ключей в памяти (изменённые, но не записанные не вытесняются)
+    :param flush_interval: Период сброса изменений в базу, сек
+    :param sweep_interval: Период удаления просроченных сценариев, сек
+    """
+
+    def __init__(
+        self,
+        ttl: float = 24 * 3600,
+        max_keys: int = 2000,
+        flush_interval: float = 1.0,
+        sweep_interval: float = 600.0,
+    ):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.flush_interval = flush_interval
+        self.sweep_interval = sweep_interval
+
+        self._records: "OrderedDict[_RowKey, _Record]" = OrderedDict()
+        self._loading: Dict[_RowKey, asyncio.Future] = {}
+        self._flush_lock = asyncio.Lock()
+        self._tasks: list = []
+        self._closed = False
+
+        # Метрики
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._expired = 0
+        self._db_rows = 0
+        self._db_bytes = 0
+
+    # === Интерфейс BaseStorage ===
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._get(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._get(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        record = await self._get(key)
+        record.data = data.copy()
+        self._touch(record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._get(key)
+        return record.data.copy()
+
+    async def close(self) -> None:
+        """
+        Останавливает фоновые задачи и записывает все изменения.
+        aiogram вызывает close() при остановке поллинга, а воркеры ещё дорабатывают
+        очереди, поэтому повторный вызов (из main.py) дописывает оставшееся.
+        """
+        self._closed = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self.flush()
+
+    # === Кэш ===
+
+    async def _get(self, key: StorageKey) -> _Record:
+        row_key = _row_key(key)
+        record = self._records.get(row_key)
+        if record is not None:
+            if not self._expired_record(record, time.time()):
+                self._hits += 1
+                self._records.move_to_end(row_key)
+                return record
+            self._reset(record)
+            return record
+
+        # Параллельные промахи по одному ключу ждут одно чтение
+        loading = self._loading.get(row_key)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        self._misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[row_key] = future
+        try:
+            record = await self._load(row_key)
+            self._evict()
+            self._records[row_key] = record
+            future.set_result(record)
+            return record
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # ожидающих может не быть — не шумим в логах
+            raise
+        finally:
+            del self._loading[row_key]
+
+    async def _load(self, row_key: _RowKey) -> _Record:
+        async with get_db() as db:
+            async with db.execute(
+                """
+                SELECT state, data, updated_at FROM fsm_storage
+                WHERE bot_id = ? AND chat_id = ? AND user_id = ? AND destiny = ?
+                """,
+                row_key,
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        now = time.time()
+        if row is None or now - row["updated_at"] > self.ttl:
+            # Просроченную строку удалит очистка
+            return _Record(None, {}, now)
+        try:
+            data = json.loads(row["data"]) if row["data"] else {}
+        except ValueError:
+            logger.warning(f"[fsm] Повреждённые данные для {row_key}, сбрасываю")
+            data = {}
+        return _Record(row["state"], data, row["updated_at"])
+
+    def _touch(self, record: _Record):
+        record.updated_at = time.time()
+        record.version += 1
+        self._start()
+
+    def _reset(self, record: _Record):
+        """Сценарий просрочен — запись начинается заново (пустая строка удалится при сбросе)."""
+        record.state = None
+        record.data = {}
+        self._touch(record)
+
+    def _expired_record(self, record: _Record, now: float) -> bool:
+        return not record.empty and now - record.updated_at > self.ttl
+
+    def _evict(self, reserve: int = 1):
+        """
+        Вытесняет самые старые записанные в базу ключи, оставляя место
+        для `reserve` новых в пределах max_keys.
+        """
+        excess = len(self._records) + reserve - self.max_keys
+        if excess <= 0:
+            return
+        for row_key in list(self._records):
+            if excess <= 0:
+                break
+            if not self._records[row_key].dirty:
+                del self._records[row_key]
+                self._evictions += 1
+                excess -= 1
+
+    # === Фоновые задачи ===
+
+    def _start(self):
+        if self._tasks or self._closed:
+            return
+        self._tasks = [
+            asyncio.create_task(self._flush_loop(), name="fsm-flush"),
+            asyncio.create_task(self._sweep_loop(), name="fsm-sweep"),
+        ]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"[fsm] Ошибка записи состояний: {e}")
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"[fsm] Ошибка очистки просроченных состояний: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def flush(self):
+        """Записывает изменённые ключи одной транзакцией."""
+        async with self._flush_lock:
+            batch = [
+                (row_key, record, record.version)
+                for row_key, record in self._records.items()
+                if record.dirty
+            ]
+            if not batch:
+                return
+
+            upserts = []
+            deletes = []
+            for row_key, record, _ in batch:
+                if record.empty:
+                    deletes.append(row_key)
+                else:
+                    upserts.append((*row_key, record.state, _dumps(record.data), int(record.updated_at)))
+
+            async def op(db):
+                if upserts:
+                    await db.executemany(
+                        """
+                        INSERT INTO fsm_storage (bot_id, chat_id, user_id, destiny, state, data, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(bot_id, chat_id, user_id, destiny) DO UPDATE SET
+                            state = excluded.state,
+                            data = excluded.data,
+                            updated_at = excluded.updated_at
+                        """,
+                        upserts,
+                    )
+                if deletes:
+                    await db.executemany(
+                        "DELETE FROM fsm_storage WHERE bot_id = ? AND chat_id = ? AND user_id = ? AND destiny = ?",
+                        deletes,
+                    )
+
+            await run_write(op)
+            for _, record, version in batch:
+                # Изменения, пришедшие во время записи, уйдут следующим сбросом
+                record.flushed_version = max(record.flushed_version, version)
+            self._flushes += 1
+            self._flushed_rows += len(batch)
+            self._evict(reserve=0)
+
+    async def sweep(self):
+        """Удаляет просроченные сценарии из базы и памяти, обновляет метрики размера."""
+        cutoff = time.time() - self.ttl
+
+        for row_key in [k for k, r in self._records.items() if not r.dirty and r.updated_at < cutoff]:
+            del self._records[row_key]
+
+        async def op(db):
+            cursor = await db.execute("DELETE FROM fsm_storage WHERE updated_at < ?", (int(cutoff),))
+            return cursor.rowcount
+
+        expired = await run_write(op)
+        if expired:
+            self._expired += expired
+            logger.info(f"[fsm] Удалено просроченных сценариев: {expired}")
+
+        async with get_db() as db:
+            async with db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM fsm_storage"
+            ) as cursor:
+                self._db_rows, self._db_bytes = await cursor.fetchone()
+
+    # === Метрики ===
+
+    def stats(self) -> Dict[str, float]:
+        """Снимок метрик хранилища."""
+        records = list(self._records.values())
+        lookups = self._hits + self._misses
+        return {
+            "cached_keys": len(records),
+            "dirty_keys": sum(1 for r in records if r.dirty),
+            "active_keys": sum(1 for r in records if not r.empty),
+            "db_rows": self._db_rows,
+            "db_bytes": self._db_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "flushes": self._flushes,
+            "flushed_rows": self._flushed_rows,
+            "expired": self._expired,
+        }
+
+
+# Глобальный экземпляр (передаётся в Dispatcher в main.py)
+fsm_storage = SQLiteStorage(
+    ttl=FSM_TTL,
+    max_keys=FSM_CACHE_MAX_KEYS,
+    flush_interval=FSM_FLUSH_INTERVAL,
+    sweep_interval=FSM_SWEEP_INTERVAL,
+)
+
+REGISTRY.register_stats(
+    "fsm_storage",
+    fsm_storage.stats,
+    counters=("hits", "misses", "evictions", "flushes", "flushed_rows", "expired"),
+)
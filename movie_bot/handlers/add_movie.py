@@ -50,7 +50,7 @@ async def add_title(message: Message, state: FSMContext):
     user_id = message.from_user.id
 
     # Поиск похожих
-    similar = await MovieService.find_similar(user_id, user_input)
+    similar = await MovieService.find_similar(user_id, user_input, limit=1)
     if similar:
         match = similar[0]
         kb = KeyboardFactory.confirmation(
@@ -180,14 +180,14 @@ async def add_poster_photo(message: Message, state: FSMContext):
     """
     data = await state.get_data()
     try:
-        await MovieService.create(
+        added = await MovieService.create(
             user_id=message.from_user.id,
             title=data["title"],
             genre=data["genre"],
             description=data["description"],
             poster_id=message.photo[-1].file_id
         )
-        await finish_addition(message, message.from_user.id)
+        await finish_addition(message, message.from_user.id, added, data["title"])
         await state.clear()
     except Exception as e:
         logger.error(f"[add_movie] Ошибка при добавлении с постером: {e}")
@@ -202,13 +202,13 @@ async def skip_poster(callback: CallbackQuery, state: FSMContext):
     """
     data = await state.get_data()
     try:
-        await MovieService.create(
+        added = await MovieService.create(
             user_id=callback.from_user.id,
             title=data["title"],
             genre=data["genre"],
             description=data["description"]
         )
-        await finish_addition(callback.message, callback.from_user.id)
+        await finish_addition(callback.message, callback.from_user.id, added, data["title"])
         await state.clear()
         await callback.answer()
     except Exception as e:
@@ -219,15 +219,17 @@ async def skip_poster(callback: CallbackQuery, state: FSMContext):
 
 
 # === Завершение ===
-async def finish_addition(event, user_id: int):
+async def finish_addition(event, user_id: int, added: bool = True, title: str = ""):
     """
-    Завершает процесс добавления: показывает успех и главное меню.
+    Завершает процесс добавления: показывает результат и главное меню.
+    Если фильм с таким названием уже был, сообщает об этом вместо успеха.
     """
+    text = TextBuilder.success_add() if added else TextBuilder.err_duplicate_title(title)
     try:
         stats_text, keyboard = await get_main_menu_with_stats(user_id)
         await clear_and_send(
             event,
-            TextBuilder.success_add(),
+            text,
             keyboard,
             parse_mode="HTML"
         )
@@ -236,7 +238,7 @@ async def finish_addition(event, user_id: int):
         # Fallback
         await clear_and_send(
             event,
-            TextBuilder.success_add(),
+            text,
             KeyboardFactory.main_menu(),
             parse_mode="HTML"
         )
\ No newline at end of file
@@ -9,7 +9,8 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.exceptions import TelegramForbiddenError
 
-from movie_bot.database import get_movie_by_id, delete_movie, get_all_movies
+from movie_bot.database import get_movie_by_id, get_movies_page
+from movie_bot.services.movie_service import MovieService
 from movie_bot.utils.pagination import send_movie_page
 from movie_bot.keyboards.factory import KeyboardFactory
 from movie_bot.keyboards.main_menu import get_main_menu_with_stats
@@ -59,14 +60,12 @@ async def delete_movie_handler(callback: CallbackQuery):
         return
 
     user_id = callback.from_user.id
-    movie = await get_movie_by_id(user_id, movie_id)
-    if not movie:
-        return await _send_movie_not_found(callback)
-
     try:
-        deleted_title = await delete_movie(movie_id, user_id)
-        if not deleted_title:
+        # Удаление и получение удалённой строки — один запрос
+        deleted = await MovieService.remove_returning(movie_id, user_id)
+        if not deleted:
             return await _send_movie_not_found(callback)
+        deleted_title = deleted["title"]
         logger.info(f"Пользователь {user_id} удалил: '{deleted_title}' (ID: {movie_id})")
     except Exception as e:
         logger.error(f"[delete] Ошибка при удалении фильма {movie_id}: {e}")
@@ -92,15 +91,15 @@ async def _send_deletion_success(callback: CallbackQuery, title: str, source: st
     try:
         view = "all"
         if "watched" in source:
-            movies = await get_all_movies(user_id=user_id, watched=True)
+            page_data = await get_movies_page(user_id=user_id, watched=True, limit=ITEMS_PER_PAGE)
             view = "watched"
         elif "unwatched" in source:
-            movies = await get_all_movies(user_id=user_id, watched=False)
+            page_data = await get_movies_page(user_id=user_id, watched=False, limit=ITEMS_PER_PAGE)
             view = "unwatched"
         else:
-            movies = await get_all_movies(user_id=user_id, watched=None)
+            page_data = await get_movies_page(user_id=user_id, watched=None, limit=ITEMS_PER_PAGE)
 
-        if not movies:
+        if not page_data["items"]:
             await clear_and_send(
                 callback.message,
                 TextBuilder.success_deleted(title),
@@ -108,7 +107,7 @@ async def _send_deletion_success(callback: CallbackQuery, title: str, source: st
                 parse_mode="HTML"
             )
         else:
-            await send_movie_page(callback, movies, 0, view, ITEMS_PER_PAGE)
+            await send_movie_page(callback, page_data, 0, view, ITEMS_PER_PAGE)
     except Exception as e:
         logger.error(f"[delete] Ошибка при показе списка после удаления: {e}")
         stats_text, kb = await get_main_menu_with_stats(user_id)
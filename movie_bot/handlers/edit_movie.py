@@ -10,10 +10,12 @@ from aiogram.fsm.context import FSMContext
 
 from movie_bot.fsm import EditMovie  
 from movie_bot.keyboards.factory import KeyboardFactory
-from movie_bot.database import get_movie_by_id, update_movie, get_all_movies
-from movie_bot.utils.helpers import get_similar_movies, clear_and_send
+from movie_bot.database import get_movie_by_id
+from movie_bot.services.movie_service import MovieService
+from movie_bot.utils.helpers import clear_and_send
 from movie_bot.keyboards.main_menu import get_main_menu_with_stats
 from movie_bot.utils.text_builder import TextBuilder
+from movie_bot.utils.text_utils import normalize_title
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -120,8 +122,7 @@ async def edit_title(message: Message, state: FSMContext):
         await message.answer("⚠️ Новое название совпадает с текущим.", reply_markup=KeyboardFactory.back_edit())
         return
 
-    user_movies = await get_all_movies(user_id=user_id, watched=None)
-    similar_list = get_similar_movies(user_movies, user_input, threshold=75)
+    similar_list = await MovieService.find_similar(user_id, user_input, threshold=75, limit=1)
     best_match = similar_list[0] if similar_list else None
 
     if best_match and user_input.lower() != best_match.lower():
@@ -233,6 +234,19 @@ async def ask_edit_confirmation(message_or_callback, state: FSMContext, field: s
         await state.clear()
         return
 
+    # Переименование в название другого фильма нарушит уникальность (user_id, title_norm)
+    if (
+        field == "title"
+        and normalize_title(new_value) != normalize_title(movie["title"])
+        and await MovieService.exists(user_id, new_value)
+    ):
+        await message.answer(
+            TextBuilder.err_duplicate_title(new_value),
+            reply_markup=KeyboardFactory.back_edit(),
+            parse_mode="HTML"
+        )
+        return
+
     def format_value(val):
         if field == "poster_id":
             return "🖼 Есть" if val else "❌ Нет"
@@ -285,7 +299,7 @@ async def confirm_edit_yes(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
 
     try:
-        await update_movie(user_id, movie_id, **{pending["field"]: pending["value"]})
+        await MovieService.update(user_id, movie_id, **{pending["field"]: pending["value"]})
         logger.info(f"Пользователь {user_id} обновил поле '{pending['field']}' фильма {movie_id}")
     except Exception as e:
         logger.error(f"[edit] Ошибка при обновлении фильма {movie_id}: {e}")
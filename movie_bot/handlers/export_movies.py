@@ -0,0 +1,56 @@
+"""
+Выгрузка библиотеки в файл (/export, /export json).
+
+Фильмы читаются потоком (MovieService.iter_all → iter_movies), пишутся
+во временный SpooledTemporaryFile и отправляются документом по кускам —
+память не зависит от размера библиотеки.
+"""
+
+import logging
+import tempfile
+from datetime import date
+
+from aiogram import Router
+from aiogram.enums import ChatAction
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from movie_bot.config import EXPORT_BATCH_SIZE, EXPORT_SPOOL_MAX_KB
+from movie_bot.keyboards.factory import KeyboardFactory
+from movie_bot.services.movie_service import MovieService
+from movie_bot.utils.exporters import EXPORT_FORMATS, SpooledInputFile, write_export
+from movie_bot.utils.text_builder import TextBuilder
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject):
+    """
+    Отправляет библиотеку пользователя файлом: CSV (по умолчанию) или JSON Lines.
+    """
+    user_id = message.from_user.id
+    fmt = (command.args or "csv").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        await message.answer(TextBuilder.err_export_format(), parse_mode="HTML")
+        return
+
+    try:
+        await message.bot.send_chat_action(message.chat.id, ChatAction.UPLOAD_DOCUMENT)
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_KB * 1024) as spool:
+            count = await write_export(MovieService.iter_all(user_id, EXPORT_BATCH_SIZE), spool, fmt)
+            if not count:
+                await message.answer(TextBuilder.no_movies_yet(), reply_markup=KeyboardFactory.back_to_main())
+                return
+
+            filename = f"movies_{date.today().isoformat()}.{EXPORT_FORMATS[fmt]}"
+            await message.answer_document(
+                SpooledInputFile(spool, filename),
+                caption=TextBuilder.export_done(count),
+                parse_mode="HTML"
+            )
+        logger.info(f"Пользователь {user_id} выгрузил библиотеку: {count} фильмов ({fmt})")
+    except Exception as e:
+        logger.error(f"[export] Ошибка выгрузки user_id={user_id}: {e}", exc_info=True)
+        await message.answer(TextBuilder.err_export_failed())
@@ -0,0 +1,166 @@
+"""
+Импорт библиотеки из файла (/import).
+
+Файл скачивается во временный каталог и читается потоком (utils/importers.py).
+Строки добавляются пачками по IMPORT_CHUNK_SIZE — одна транзакция executemany
+на пачку, дубликаты пропускает уникальный индекс. Прогресс — правкой одного
+сообщения не чаще раза в IMPORT_PROGRESS_INTERVAL секунд.
+
+Импорт идёт фоновой задачей: воркер обновлений (middlewares/update_workers.py)
+не занят на всё время импорта, и другие пользователи не ждут.
+"""
+
+import asyncio
+import contextvars
+import html
+import logging
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Dict
+
+from aiogram import Bot, F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Document, Message
+
+from movie_bot.config import IMPORT_CHUNK_SIZE, IMPORT_MAX_FILE_MB, IMPORT_MAX_ROWS, IMPORT_PROGRESS_INTERVAL
+from movie_bot.fsm import ImportMovies
+from movie_bot.keyboards.factory import KeyboardFactory
+from movie_bot.services.movie_service import MovieService
+from movie_bot.utils.helpers import clear_and_send
+from movie_bot.utils.importers import ImportFormatError, open_import
+from movie_bot.utils.text_builder import TextBuilder
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+# Идущие импорты: user_id -> задача (не больше одного на пользователя)
+_imports: Dict[int, asyncio.Task] = {}
+
+
+# === Файл с подписью /import или файл после команды ===
+@router.message(Command("import"), F.document)
+@router.message(ImportMovies.file, F.document)
+async def import_document(message: Message, state: FSMContext, bot: Bot):
+    """
+    Проверяет файл и запускает импорт в фоне.
+    """
+    await state.clear()
+    user_id = message.from_user.id
+    document = message.document
+
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_MB * 1024 * 1024:
+        await message.answer(TextBuilder.err_import_too_large(IMPORT_MAX_FILE_MB))
+        return
+    if user_id in _imports:
+        await message.answer(TextBuilder.err_import_running())
+        return
+
+    status = await message.answer(TextBuilder.import_progress(0, 0), parse_mode="HTML")
+    # Свой контекст: трейс обновления уже записан, спаны импорта к нему не относятся
+    task = asyncio.create_task(
+        _run_import(bot, user_id, document, status), name=f"import-{user_id}", context=contextvars.Context()
+    )
+    _imports[user_id] = task
+    task.add_done_callback(lambda _: _imports.pop(user_id, None))
+    logger.info(f"Пользователь {user_id} начал импорт: {document.file_name} ({document.file_size} байт)")
+
+
+# === Начало ===
+@router.message(Command("import"))
+async def cmd_import(message: Message, state: FSMContext):
+    """
+    Просит прислать файл.
+    """
+    await state.set_state(ImportMovies.file)
+    await clear_and_send(
+        message,
+        TextBuilder.import_prompt(IMPORT_MAX_FILE_MB),
+        KeyboardFactory.cancel(),
+        parse_mode="HTML"
+    )
+
+
+@router.message(ImportMovies.file)
+async def import_not_document(message: Message):
+    """
+    В сценарии импорта ожидается документ.
+    """
+    await message.answer(TextBuilder.err_import_not_document(), reply_markup=KeyboardFactory.cancel())
+
+
+# === Импорт ===
+async def _edit_status(status: Message, text: str, final: bool = False):
+    try:
+        await status.edit_text(
+            text,
+            parse_mode="HTML",
+            reply_markup=KeyboardFactory.back_to_main() if final else None
+        )
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            logger.debug("[import] Не удалось обновить прогресс: %s", e)
+    except Exception as e:
+        logger.debug("[import] Не удалось обновить прогресс: %s", e)
+
+
+async def _run_import(bot: Bot, user_id: int, document: Document, status: Message):
+    processed = added = valid = invalid = 0
+    truncated_at = None
+    started = time.monotonic()
+    last_progress = started
+    try:
+        with tempfile.TemporaryDirectory(prefix="movie_bot_import_") as tmp:
+            path = Path(tmp) / "import"
+            await bot.download(document, destination=path)
+
+            with open_import(path, document.file_name or "") as rows:
+                while True:
+                    limit = min(IMPORT_CHUNK_SIZE, IMPORT_MAX_ROWS - processed)
+                    chunk = list(islice(rows, limit)) if limit > 0 else []
+                    if not chunk:
+                        if limit <= 0 and next(rows, _END) is not _END:
+                            truncated_at = IMPORT_MAX_ROWS
+                        break
+
+                    movies = [row for row in chunk if row is not None]
+                    processed += len(chunk)
+                    valid += len(movies)
+                    invalid += len(chunk) - len(movies)
+                    if movies:
+                        added += await MovieService.create_many(user_id, movies)
+
+                    now = time.monotonic()
+                    if now - last_progress >= IMPORT_PROGRESS_INTERVAL:
+                        last_progress = now
+                        await _edit_status(status, TextBuilder.import_progress(processed, added))
+    except ImportFormatError as e:
+        logger.info(f"[import] user_id={user_id}: формат не распознан: {e}")
+        await _edit_status(status, TextBuilder.err_import_format(html.escape(str(e))), final=True)
+        return
+    except asyncio.CancelledError:
+        await _edit_status(status, TextBuilder.err_import_failed(added), final=True)
+        raise
+    except Exception as e:
+        logger.error(f"[import] Ошибка импорта user_id={user_id}: {e}", exc_info=True)
+        await _edit_status(status, TextBuilder.err_import_failed(added), final=True)
+        return
+
+    logger.info(
+        f"[import] user_id={user_id}: строк {processed}, добавлено {added}, "
+        f"дубликатов {valid - added}, пропущено {invalid} за {time.monotonic() - started:.1f} с"
+    )
+    await _edit_status(status, TextBuilder.import_done(added, valid - added, invalid, truncated_at), final=True)
+
+
+async def cancel_imports():
+    """Прерывает идущие импорты (при остановке бота); добавленные пачки остаются."""
+    tasks = list(_imports.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
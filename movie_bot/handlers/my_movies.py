@@ -10,13 +10,18 @@ from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 
 from movie_bot.fsm import MyMovies
-from movie_bot.database import get_all_movies, get_movie_by_id, mark_movie_watched
+from movie_bot.database import (
+    get_movies_page,
+    get_movie_by_id,
+)
 from movie_bot.keyboards.factory import KeyboardFactory
 from movie_bot.keyboards.main_menu import get_main_menu_with_stats
+from movie_bot.services.movie_service import MovieService
+from movie_bot.services.user_service import UserService
 from movie_bot.utils.helpers import clear_and_send
 from movie_bot.utils.pagination import send_movie_page, send_search_page
 from movie_bot.utils.text_builder import TextBuilder
-from movie_bot.config import ITEMS_PER_PAGE
+from movie_bot.config import ITEMS_PER_PAGE, SEARCH_MAX_RESULTS
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -39,15 +44,15 @@ def _patch_watched_button(keyboard, movie_id: int, source: str, watched: bool):
 async def my_movies_menu(event, state: FSMContext):
     await state.clear()
     user_id = event.from_user.id
-    movies = await get_all_movies(user_id=user_id, watched=None)
-    total = len(movies)
+    stats = await UserService.get_stats(user_id)
+    total = stats["total"]
 
     if total == 0:
         stats_text, keyboard = await get_main_menu_with_stats(user_id)
         await clear_and_send(event, TextBuilder.no_movies_yet(), keyboard)
         return
 
-    watched_count = sum(1 for m in movies if m["watched"])
+    watched_count = stats["watched"]
     await clear_and_send(
         event,
         TextBuilder.my_movies_intro(total=total, watched=watched_count),
@@ -57,21 +62,21 @@ async def my_movies_menu(event, state: FSMContext):
 @router.callback_query(F.data == "my_movies_all")
 async def my_movies_all_submenu(callback: CallbackQuery):
     user_id = callback.from_user.id
-    movies = await get_all_movies(user_id=user_id, watched=None)
-    watched_count = sum(1 for m in movies if m["watched"])
-    unwatched_count = len(movies) - watched_count
+    stats = await UserService.get_stats(user_id)
+    watched_count = stats["watched"]
+    unwatched_count = stats["total"] - watched_count
 
     await clear_and_send(
         callback.message,
-        f"🎬 У вас {len(movies)} контента.\n\nВыберите категорию:",
+        f"🎬 У вас {stats['total']} контента.\n\nВыберите категорию:",
         KeyboardFactory.movies_filter(watched_count, unwatched_count)
     )
     await callback.answer()
 
 @router.callback_query(F.data == "my_movies_watched")
 async def show_watched_movies(callback: CallbackQuery):
-    movies = await get_all_movies(user_id=callback.from_user.id, watched=True)
-    if not movies:
+    page_data = await get_movies_page(user_id=callback.from_user.id, watched=True, limit=ITEMS_PER_PAGE)
+    if not page_data["items"]:
         await clear_and_send(
             callback.message,
             TextBuilder.no_watched_movies(),
@@ -79,13 +84,13 @@ async def show_watched_movies(callback: CallbackQuery):
         )
         await callback.answer()
         return
-    await send_movie_page(callback, movies, 0, "watched", ITEMS_PER_PAGE)
+    await send_movie_page(callback, page_data, 0, "watched", ITEMS_PER_PAGE)
 
 
 @router.callback_query(F.data == "my_movies_unwatched")
 async def show_unwatched_movies(callback: CallbackQuery):
-    movies = await get_all_movies(user_id=callback.from_user.id, watched=False)
-    if not movies:
+    page_data = await get_movies_page(user_id=callback.from_user.id, watched=False, limit=ITEMS_PER_PAGE)
+    if not page_data["items"]:
         await clear_and_send(
             callback.message,
             TextBuilder.no_unwatched_movies(),
@@ -93,24 +98,54 @@ async def show_unwatched_movies(callback: CallbackQuery):
         )
         await callback.answer()
         return
-    await send_movie_page(callback, movies, 0, "unwatched", ITEMS_PER_PAGE)
+    await send_movie_page(callback, page_data, 0, "unwatched", ITEMS_PER_PAGE)
 
 @router.callback_query(F.data.startswith("prev:") | F.data.startswith("next:"))
-async def navigate_page(callback: CallbackQuery):
+async def navigate_page(callback: CallbackQuery, page_steps: int = 1):
+    """
+    Переход по страницам. page_steps > 1 — несколько нажатий подряд,
+    склеенных middlewares/coalesce.py: страница рисуется один раз.
+    """
     try:
-        parts = callback.data.split(":")
+        # prev|next:<view>:<текущая страница>:<курсор соседней страницы>
+        parts = callback.data.split(":", 3)
         direction = "prev" if callback.data.startswith("prev") else "next"
         view = parts[1]
-        page = int(parts[2]) + (1 if direction == "next" else -1)
+        current = int(parts[2])
+        cursor = parts[3] if len(parts) > 3 else None
 
         watched = {"watched": True, "unwatched": False}.get(view)
-        movies = await get_all_movies(user_id=callback.from_user.id, watched=watched)
+        user_id = callback.from_user.id
+
+        skip = 0
+        if page_steps > 1:
+            stats = await UserService.get_stats(user_id)
+            total = {True: stats["watched"], False: stats["total"] - stats["watched"]}.get(watched, stats["total"])
+            last_page = max((total + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE - 1, 0)
+            target = min(current + page_steps, last_page) if direction == "next" else max(current - page_steps, 0)
+            # Курсор ведёт на соседнюю страницу, остальные пропускаем
+            skip = max(abs(target - current) - 1, 0) * ITEMS_PER_PAGE
+            page = target
+        else:
+            page = current + (1 if direction == "next" else -1)
 
-        if not movies:
+        page_data = await get_movies_page(
+            user_id=user_id, watched=watched, cursor=cursor, limit=ITEMS_PER_PAGE, skip=skip
+        )
+
+        if not page_data["items"] and cursor:
+            # Соседняя страница опустела (например, после удаления) — начинаем сначала
+            page_data = await get_movies_page(user_id=user_id, watched=watched, limit=ITEMS_PER_PAGE)
+            page = 0
+
+        if not page_data["items"]:
             await callback.answer("❌ Список пуст", show_alert=True)
             return
 
-        await send_movie_page(callback, movies, page, view, ITEMS_PER_PAGE)
+        if not page_data["prev_cursor"]:
+            page = 0
+
+        await send_movie_page(callback, page_data, page, view, ITEMS_PER_PAGE)
     except Exception as e:
         logger.error(f"[pagination] Ошибка при переключении: {e}")
         await callback.answer("❌ Ошибка при переключении страницы")
@@ -135,13 +170,9 @@ async def search_movies(message: Message, state: FSMContext):
         return
 
     user_id = message.from_user.id
-    all_movies = await get_all_movies(user_id=user_id, watched=None)
-    results = [
-        movie for movie in all_movies
-        if query in movie["title"].lower() or query in movie["genre"].lower()
-    ]
+    movie_ids = await MovieService.search_ids(user_id, query, limit=SEARCH_MAX_RESULTS)
 
-    if not results:
+    if not movie_ids:
         await clear_and_send(
             message,
             TextBuilder.search_no_results(query),
@@ -149,24 +180,26 @@ async def search_movies(message: Message, state: FSMContext):
         )
         return
 
-    await state.update_data(search_results=results, search_query=query)
-    await send_search_page(message, results, 0, state, ITEMS_PER_PAGE)
+    # В состоянии — только запрос и id (не больше SEARCH_MAX_RESULTS), строки читаются постранично
+    await state.update_data(search_ids=movie_ids, search_query=query)
+    await send_search_page(message, movie_ids, 0, state, ITEMS_PER_PAGE)
 
 @router.callback_query(F.data.startswith("prev_search:") | F.data.startswith("next_search:"))
-async def navigate_search_page(callback: CallbackQuery, state: FSMContext):
+async def navigate_search_page(callback: CallbackQuery, state: FSMContext, page_steps: int = 1):
     try:
         parts = callback.data.split(":")
         direction = "prev" if callback.data.startswith("prev") else "next"
-        page = int(parts[1]) + (1 if direction == "next" else -1)
+        page = int(parts[1]) + (page_steps if direction == "next" else -page_steps)
 
         data = await state.get_data()
-        results = data.get("search_results", [])
+        movie_ids = data.get("search_ids", [])
 
-        if not results:
+        if not movie_ids:
             await callback.answer("❌ Результаты утеряны", show_alert=True)
             return
 
-        await send_search_page(callback.message, results, page, state, ITEMS_PER_PAGE)
+        page = min(max(page, 0), (len(movie_ids) - 1) // ITEMS_PER_PAGE)
+        await send_search_page(callback.message, movie_ids, page, state, ITEMS_PER_PAGE)
     except Exception as e:
         logger.error(f"[search pagination] Ошибка: {e}")
         await callback.answer("❌ Ошибка при навигации")
@@ -198,16 +231,8 @@ async def send_movie_card(event, movie_id: int, source: str = "my_movies"):
     _patch_watched_button(keyboard, movie_id, source, not movie["watched"])
 
     try:
-        if movie.get("poster_id"):
-            await clear_and_send(message, TextBuilder.loading(), None)
-            await message.answer_photo(
-                photo=movie["poster_id"],
-                caption=text,
-                reply_markup=keyboard,
-                parse_mode="HTML"
-            )
-        else:
-            await clear_and_send(message, text, keyboard, parse_mode="HTML")
+        # Постер — тот же экран, но фото с подписью (без промежуточного «Загрузка...»)
+        await clear_and_send(message, text, keyboard, parse_mode="HTML", photo=movie.get("poster_id"))
     except Exception as e:
         logger.error(f"[send_movie_card] Ошибка при отправке: {e}")
         await message.answer("❌ Не удалось отправить карточку.")
@@ -220,22 +245,15 @@ async def toggle_watched_status(callback: CallbackQuery):
         source = parts[2] if len(parts) > 2 else "my_movies"
         user_id = callback.from_user.id
 
-        movie = await get_movie_by_id(user_id, movie_id)
+        # Переключение и чтение обновлённой карточки — один запрос
+        movie = await MovieService.toggle_watched(movie_id, user_id)
         if not movie:
             await callback.message.answer("❌ Контент не найден.")
             await callback.answer()
             return
 
-        new_watched = not movie["watched"]
-        await mark_movie_watched(movie_id, user_id, new_watched)
-
-        updated = await get_movie_by_id(user_id, movie_id)
-        if not updated:
-            await callback.message.answer("❌ Ошибка загрузки фильма.")
-            await callback.answer()
-            return
-
-        text = TextBuilder.movie_card(updated)
+        new_watched = bool(movie["watched"])
+        text = TextBuilder.movie_card(movie)
         keyboard = KeyboardFactory.movie_actions(source=source, watched=new_watched, movie_id=movie["id"])
         _patch_watched_button(keyboard, movie_id, source, not new_watched)
 
@@ -4,17 +4,17 @@
 """
 
 import logging
-import random
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.filters import Command
 
 from movie_bot.keyboards.genre import GENRES
 from movie_bot.keyboards.factory import KeyboardFactory
-from movie_bot.database import get_movies_by_genre
+from movie_bot.database import pick_random_movie
 from movie_bot.keyboards.main_menu import get_main_menu_with_stats
 from movie_bot.utils.helpers import clear_and_send
 from movie_bot.utils.text_builder import TextBuilder
+from movie_bot.config import RECOMMEND_NO_REPEATS
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -53,32 +53,23 @@ async def recommend_by_genre(callback: CallbackQuery):
         return
 
     user_id = callback.from_user.id
-    movies = await get_movies_by_genre(genre=genre, user_id=user_id)
 
-    if not movies:
-        return await _send_no_movies_in_genre(callback, genre, user_id)
+    # Случайный фильм выбирается в SQL — жанр целиком не загружается
+    movie = await pick_random_movie(user_id=user_id, genre=genre, no_repeat=RECOMMEND_NO_REPEATS)
 
-    # Случайный фильм
-    movie = random.choice(movies)
+    if not movie:
+        return await _send_no_movies_in_genre(callback, genre, user_id)
     caption = TextBuilder.recommend_movie_caption(movie)
     keyboard = (await get_main_menu_with_stats(user_id))[1]
 
     try:
-        if movie["poster_id"]:
-            await clear_and_send(callback.message, TextBuilder.loading(), None)
-            await callback.message.answer_photo(
-                photo=movie["poster_id"],
-                caption=caption,
-                parse_mode="HTML",
-                reply_markup=keyboard
-            )
-        else:
-            await clear_and_send(
-                callback.message,
-                caption,
-                keyboard,
-                parse_mode="HTML"
-            )
+        await clear_and_send(
+            callback.message,
+            caption,
+            keyboard,
+            parse_mode="HTML",
+            photo=movie["poster_id"]
+        )
     except Exception as e:
         logger.error(f"[recommend] Ошибка отправки рекомендации: {e}")
         await callback.message.answer("❌ Не удалось показать рекомендацию.")
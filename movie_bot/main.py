@@ -6,11 +6,12 @@
 - Инициализация базы данных
 - Регистрация обработчиков (авто-загрузка)
 - Установка команд
-- Запуск поллинга
+- Запуск поллинга или webhook-сервера (--mode polling|webhook)
 - Поддержка Render.com (health-check)
 - Graceful shutdown
 """
 
+import argparse
 import asyncio
 import os
 import signal
@@ -19,12 +20,22 @@ from pathlib import Path
 
 from aiogram import Dispatcher
 
-from movie_bot.config import BOT_TOKEN, ensure_directories
+from movie_bot.config import BOT_TOKEN, BOT_MODE, METRICS_ENABLED, UPDATE_DRAIN_TIMEOUT, ensure_directories
 from movie_bot.bot import create_bot
-from movie_bot.database.db import init_db
-from movie_bot.utils.logger import get_logger
+from movie_bot.database.db import init_db, close_db
+from movie_bot.fsm.storage import fsm_storage
+from movie_bot.handlers.import_movies import cancel_imports
+from movie_bot.utils.logger import get_logger, shutdown_logging
+from movie_bot.utils.cpu_pool import start_cpu_pool, stop_cpu_pool
 from movie_bot.utils.healthcheck import run_health_server, stop_health_server
+from movie_bot.utils.loop_monitor import start_loop_monitor, stop_loop_monitor
 from movie_bot.commands import get_commands
+from movie_bot.middlewares.coalesce import setup_callback_coalescing
+from movie_bot.middlewares.metrics import setup_metrics
+from movie_bot.middlewares.rate_limit import outbound_scheduler
+from movie_bot.middlewares.tracing import setup_tracing
+from movie_bot.middlewares.update_workers import setup_update_workers
+from movie_bot.webhook import run_webhook
 
 logger = get_logger(__name__)
 
@@ -51,92 +62,140 @@ def load_routers(dp: Dispatcher):
             logger.error(f"Ошибка при загрузке {module_name}: {e}")
 
 
-async def main():
+async def main(mode: str = BOT_MODE):
     """
     Основная асинхронная функция запуска бота.
+
+    :param mode: "polling" — long polling; "webhook" — aiohttp-сервер (см. webhook.py)
     """
-    logger.info("Запуск бота...")
+    logger.info(f"Запуск бота (режим: {mode})...")
     logger.info(f"Версия Python: {sys.version}")
     logger.info(f"Рабочая директория: {os.getcwd()}")
 
     # Создаём директории (вместо side effect при импорте config)
     ensure_directories()
 
-    # Инициализация БД
-    try:
-        await init_db()
-        logger.info("База данных инициализирована")
-    except Exception as e:
-        logger.critical(f"Не удалось инициализировать БД: {e}", exc_info=True)
-        sys.exit(1)
-
-    # Создаём бота (вместо глобального Bot() при импорте)
-    if not BOT_TOKEN:
-        logger.critical("BOT_TOKEN не задан. Завершаю работу.")
-        sys.exit(1)
-    bot = create_bot(BOT_TOKEN)
+    # Задержки event loop и стек при блокировке (см. utils/loop_monitor.py)
+    start_loop_monitor()
+    # Пул для нечёткого поиска по большим библиотекам (см. utils/cpu_pool.py)
+    start_cpu_pool()
 
-    # Создаём диспетчер
-    dp = Dispatcher()
-
-    # Подключаем роутеры
-    load_routers(dp)
-    logger.info("Все обработчики загружены")
-
-    # Устанавливаем команды
+    coalescer = update_workers = None
+    # Остановка — в finally и при ошибке старта: пул БД и пул процессов держат
+    # не-daemon потоки, без закрытия процесс не завершится после sys.exit()
     try:
-        await bot.set_my_commands(get_commands())
-        logger.info("Команды бота установлены")
-    except Exception as e:
-        logger.error(f"Не удалось установить команды: {e}")
-
-    # Health-check сервер (для Render.com)
-    if os.getenv("RENDER"):
-        run_health_server()
-        logger.info("Health-check сервер запущен")
+        # Инициализация БД
+        try:
+            await init_db()
+            logger.info("База данных инициализирована")
+        except Exception as e:
+            logger.critical(f"Не удалось инициализировать БД: {e}", exc_info=True)
+            sys.exit(1)
+
+        # Создаём бота (вместо глобального Bot() при импорте)
+        if not BOT_TOKEN:
+            logger.critical("BOT_TOKEN не задан. Завершаю работу.")
+            sys.exit(1)
+        bot = create_bot(BOT_TOKEN)
+
+        # Создаём диспетчер
+        # Состояния FSM — в SQLite: сценарии переживают рестарт
+        dp = Dispatcher(storage=fsm_storage)
+        # Склейка повторных нажатий — до воркеров, чтобы воркер не ждал окончания серии
+        coalescer = setup_callback_coalescing(dp)
+        # Затем воркеры по user_id: трейсы и метрики считаются уже внутри воркера.
+        # В webhook результат нужен для ответа Telegram, в polling — только постановка в очередь
+        update_workers = setup_update_workers(dp, wait_result=(mode == "webhook"))
+        setup_tracing(dp)
+        setup_metrics(dp)
+
+        # Подключаем роутеры
+        load_routers(dp)
+        logger.info("Все обработчики загружены")
+
+        # Устанавливаем команды
+        try:
+            await bot.set_my_commands(get_commands())
+            logger.info("Команды бота установлены")
+        except Exception as e:
+            logger.error(f"Не удалось установить команды: {e}")
 
-    # Graceful shutdown через asyncio-совместимый механизм
-    loop = asyncio.get_running_loop()
-    stop_event = asyncio.Event()
+        # Health-check сервер (для Render.com) и /metrics; в режиме webhook их отдаёт aiohttp-сервер
+        if (os.getenv("RENDER") or METRICS_ENABLED) and mode == "polling":
+            run_health_server()
+            logger.info("Health-check сервер запущен")
 
-    def request_stop():
-        logger.info("Получен сигнал остановки. Завершаю бота...")
-        stop_event.set()
+        # Graceful shutdown через asyncio-совместимый механизм
+        loop = asyncio.get_running_loop()
+        stop_event = asyncio.Event()
 
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        try:
-            loop.add_signal_handler(sig, request_stop)
-        except NotImplementedError:
-            # Windows не поддерживает add_signal_handler для SIGTERM
-            pass
+        def request_stop():
+            logger.info("Получен сигнал остановки. Завершаю бота...")
+            stop_event.set()
 
-    # Запуск поллинга
-    logger.info("Бот успешно запущен и готов к работе!")
-    try:
-        task = asyncio.create_task(dp.start_polling(bot))
-        # Ждём либо сигнал остановки, либо завершение поллинга
-        stop_task = asyncio.create_task(stop_event.wait())
-        done, pending = await asyncio.wait(
-            [task, stop_task],
-            return_when=asyncio.FIRST_COMPLETED,
-        )
-        # Отменяем оставшуюся задачу
-        for t in pending:
-            t.cancel()
+        for sig in (signal.SIGINT, signal.SIGTERM):
             try:
-                await t
-            except asyncio.CancelledError:
+                loop.add_signal_handler(sig, request_stop)
+            except NotImplementedError:
+                # Windows не поддерживает add_signal_handler для SIGTERM
                 pass
-    except Exception as e:
-        logger.critical(f"Критическая ошибка при поллинге: {e}", exc_info=True)
+
+        logger.info("Бот успешно запущен и готов к работе!")
+        try:
+            if mode == "webhook":
+                # Сервер сам дожидается stop_event и дорабатывает принятые обновления
+                await run_webhook(bot, dp, stop_event)
+                return
+
+            # Запуск поллинга: параллельность даёт update_workers, а ожидание места
+            # в очереди воркера притормаживает получение новых обновлений
+            task = asyncio.create_task(dp.start_polling(bot, handle_as_tasks=False))
+            # Ждём либо сигнал остановки, либо завершение поллинга
+            stop_task = asyncio.create_task(stop_event.wait())
+            done, pending = await asyncio.wait(
+                [task, stop_task],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            # Отменяем оставшуюся задачу
+            for t in pending:
+                t.cancel()
+                try:
+                    await t
+                except asyncio.CancelledError:
+                    pass
+        except Exception as e:
+            logger.critical(f"Критическая ошибка при получении обновлений: {e}", exc_info=True)
     finally:
         stop_health_server()
+        await stop_loop_monitor()
+        if coalescer is not None:
+            await coalescer.flush_all()
+        if update_workers is not None:
+            await update_workers.stop(UPDATE_DRAIN_TIMEOUT)
+        await cancel_imports()
+        await outbound_scheduler.stop()
+        await fsm_storage.close()
+        stop_cpu_pool()
+        await close_db()
         logger.info("Бот остановлен.")
+        shutdown_logging()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Фильмолог — Telegram-бот")
+    parser.add_argument(
+        "--mode",
+        choices=("polling", "webhook"),
+        default=BOT_MODE,
+        help="способ получения обновлений (по умолчанию BOT_MODE или polling)",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(main(mode=args.mode))
     except KeyboardInterrupt:
         logger.info("Бот остановлен вручную.")
     except Exception as e:
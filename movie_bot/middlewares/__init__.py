@@ -0,0 +1,3 @@
+"""
+Middleware диспетчера и HTTP-сессии бота.
+"""
@@ -0,0 +1,271 @@
+"""
+Склейка быстрых повторных нажатий inline-кнопок.
+
+Пользователь «долбит» «Вперёд ▶️» или «Пометить просмотренным», и каждое
+нажатие — это запрос к БД и перерисовка экрана. Outer-middleware на update
+склеивает такие серии:
+- первое нажатие серии обрабатывается сразу, без задержки;
+- нажатия, пришедшие в течение CALLBACK_COALESCE_WINDOW_MS после предыдущего,
+  придерживаются и выпускаются одним действием, когда пауза закончится
+  (но не позже CALLBACK_COALESCE_MAX_DELAY_MS после первого придержанного).
+
+Итоговое действие:
+- навигация (prev/next, prev_search/next_search) с одного сообщения —
+  переход на сумму шагов от страницы, с которой нажата последняя кнопка
+  (нажатия со старой клавиатуры считаются вместе с уже выполненным первым:
+  два «Вперёд» со страницы 1 — страница 3, а не 2); если страница уже
+  показана — ничего;
+- toggle_watched одного фильма — переключение, если число нажатий за серию
+  нечётное, а первое нажатие это ещё не учло.
+
+Каждое нажатие получает answerCallbackQuery: поглощённые — фоновой задачей
+(ничего не ждём перед выпуском серии), выпущенные — в обработчике. Любое
+другое обновление пользователя сначала выпускает придержанную серию,
+поэтому порядок действий не меняется.
+
+Регистрируется до воркеров (middlewares/update_workers.py): иначе воркер
+пользователя простаивал бы, ожидая окончания окна.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from movie_bot.config import CALLBACK_COALESCE_MAX_DELAY_MS, CALLBACK_COALESCE_WINDOW_MS
+from movie_bot.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+
+# Префикс callback_data -> (вид серии, шаг, номер части с текущей страницей)
+_NAVIGATION = {
+    "next": ("page", 1, 1),
+    "prev": ("page", -1, 1),
+    "next_search": ("search", 1, 0),
+    "prev_search": ("search", -1, 0),
+}
+
+
+def _classify(data: str, message_id: Optional[int]) -> Optional[Tuple[tuple, int, int]]:
+    """
+    Ключ серии, шаг и страница, с которой нажата кнопка (None — нажатие не склеивается).
+    Навигация склеивается только в пределах одного сообщения: у его кнопок общие курсоры.
+    """
+    prefix, _, rest = data.partition(":")
+    if prefix in _NAVIGATION:
+        kind, step, page_part = _NAVIGATION[prefix]
+        try:
+            base = int(rest.split(":")[page_part])
+        except (IndexError, ValueError):
+            return None
+        return (kind, message_id), step, base
+    if prefix == "toggle_watched":
+        movie_id = rest.split(":", 1)[0]
+        return ("toggle", movie_id), 1, 0
+    return None
+
+
+class _Series:
+    """Серия нажатий одного пользователя: первое уже обработано, остальные придержаны."""
+
+    __slots__ = ("key", "handler", "presses", "steps", "dispatched", "held", "last_base", "deadline", "timer")
+
+    def __init__(self, key: tuple, handler: Handler, base: int, step: int):
+        self.key = key
+        self.handler = handler
+        self.presses = 1
+        # Сумма шагов по странице, с которой нажаты кнопки (включая первое нажатие)
+        self.steps: Dict[int, int] = {base: step}
+        # Чем закончилось первое нажатие: страница или число переключений
+        self.dispatched = base + step if key[0] != "toggle" else 1
+        # Последнее придержанное нажатие по (странице, направлению): (update, data)
+        self.held: Dict[Tuple[int, int], Tuple[Update, Dict[str, Any]]] = {}
+        self.last_base = base
+        self.deadline: Optional[float] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class CallbackCoalescer(BaseMiddleware):
+    """
+    Склеивает серии нажатий навигации и переключения статуса.
+
+    :param window: Пауза между нажатиями, после которой серия выпускается, сек
+    :param max_delay: Максимальная задержка придержанного нажатия, сек
+    """
+
+    def __init__(self, window: float = 0.3, max_delay: float = 1.0):
+        self.window = window
+        self.max_delay = max_delay
+        self._pending: Dict[int, _Series] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Метрики
+        self._presses = 0
+        self._absorbed = 0
+        self._dispatched = 0
+        self._noops = 0
+
+    async def __call__(self, handler: Handler, event: Update, data: Dict[str, Any]) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        classified = None
+        callback = event.callback_query
+        if callback is not None and callback.data and callback.message is not None:
+            classified = _classify(callback.data, callback.message.message_id)
+
+        series = self._pending.get(user.id)
+        if classified is None:
+            # Любое другое действие пользователя — после придержанной серии
+            if series is not None:
+                await self._flush(user.id)
+            return await handler(event, data)
+
+        key, step, base = classified
+        if series is not None and series.key != key:
+            await self._flush(user.id)
+            series = None
+
+        self._presses += 1
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if series is None:
+            # Первое нажатие — сразу; серия остаётся открытой на окно
+            series = self._pending[user.id] = _Series(key, handler, base, step)
+            series.timer = loop.call_later(self.window, self._schedule_flush, user.id, series)
+            self._dispatched += 1
+            return await handler(event, data)
+
+        series.timer.cancel()
+        if series.deadline is None:
+            series.deadline = now + self.max_delay
+        series.presses += 1
+        series.steps[base] = series.steps.get(base, 0) + step
+        series.last_base = base
+        series.handler = handler
+        slot = (base, 1 if step > 0 else -1)
+        superseded = series.held.pop(slot, None)
+        series.held[slot] = (event, data)
+        series.timer = loop.call_later(
+            max(min(self.window, series.deadline - now), 0), self._schedule_flush, user.id, series
+        )
+
+        if superseded is not None:
+            # Нажатие поглощено следующим — отвечаем сразу, чтобы у кнопки не крутились часики
+            self._absorbed += 1
+            self._answer_later(superseded[0])
+        return None
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _schedule_flush(self, user_id: int, series: _Series):
+        if self._pending.get(user_id) is series:
+            self._spawn(self._flush(user_id))
+
+    def _choose(self, series: _Series) -> Tuple[Optional[Tuple[Update, Dict[str, Any]]], int]:
+        """Придержанное нажатие, которое выпускается, и число шагов (None — ничего не делать)."""
+        if series.key[0] == "toggle":
+            if series.presses % 2 == series.dispatched % 2:
+                return None, 0
+            return series.held.get((0, 1)), 1
+
+        base = series.last_base
+        target = base + series.steps[base]
+        if target == series.dispatched or target == base:
+            return None, 0
+        direction = 1 if target > base else -1
+        return series.held.get((base, direction)), abs(target - base)
+
+    async def _flush(self, user_id: int):
+        """Выпускает придержанные нажатия пользователя: одно итоговое действие или ничего."""
+        series = self._pending.pop(user_id, None)
+        if series is None:
+            return
+        if series.timer is not None:
+            series.timer.cancel()
+        if not series.held:
+            return
+
+        chosen, steps = self._choose(series)
+        # Остальные нажатия отвечаются в фоне: до выпуска серии ничего не ждём
+        for update, _ in series.held.values():
+            if chosen is None or update is not chosen[0]:
+                self._absorbed += 1
+                self._answer_later(update)
+        if chosen is None:
+            self._noops += 1
+            return
+
+        update, data = chosen
+        if series.key[0] != "toggle":
+            data["page_steps"] = steps
+        self._dispatched += 1
+        try:
+            await series.handler(update, data)
+        except Exception as e:
+            logger.error(f"[coalesce] Ошибка обработки серии {series.key} ({series.presses} нажатий): {e}", exc_info=True)
+
+    def _answer_later(self, update: Update):
+        self._spawn(self._answer(update))
+
+    @staticmethod
+    async def _answer(update: Update):
+        try:
+            await update.callback_query.answer()
+        except Exception as e:
+            logger.debug("[coalesce] Не удалось ответить на callback: %s", e)
+
+    async def flush_all(self):
+        """Выпускает все придержанные серии (при остановке бота)."""
+        for user_id in list(self._pending):
+            await self._flush(user_id)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # === Метрики ===
+
+    def stats(self) -> Dict[str, float]:
+        """Снимок метрик склейки нажатий."""
+        return {
+            "pending": len(self._pending),
+            "presses": self._presses,
+            "absorbed": self._absorbed,
+            "dispatched": self._dispatched,
+            "noops": self._noops,
+        }
+
+
+_coalescer: Optional[CallbackCoalescer] = None
+
+
+def setup_callback_coalescing(dp: Dispatcher) -> Optional[CallbackCoalescer]:
+    """Подключает склейку нажатий (первым outer-middleware на update). Окно 0 — выключено."""
+    global _coalescer
+    if CALLBACK_COALESCE_WINDOW_MS <= 0:
+        return None
+    _coalescer = CallbackCoalescer(
+        window=CALLBACK_COALESCE_WINDOW_MS / 1000,
+        max_delay=CALLBACK_COALESCE_MAX_DELAY_MS / 1000,
+    )
+    dp.update.outer_middleware(_coalescer)
+    return _coalescer
+
+
+def get_coalesce_stats() -> Dict[str, float]:
+    """Метрики склейки нажатий (пустой словарь, если она выключена)."""
+    if _coalescer is None:
+        return {}
+    return _coalescer.stats()
+
+
+REGISTRY.register_stats(
+    "bot_callback_coalesce", get_coalesce_stats, counters=("presses", "absorbed", "dispatched", "noops")
+)
@@ -0,0 +1,127 @@
+"""
+Middleware для сбора метрик (см. utils/metrics.py).
+
+- UpdateMetricsMiddleware — outer-middleware на update: полное время обработки
+  по типу события и необработанные обновления;
+- HandlerMetricsMiddleware — inner-middleware на события: время и ошибки
+  каждого обработчика (метка — «модуль.функция», набор ограничен кодом);
+- TelegramApiMetricsMiddleware — middleware сессии: время и ошибки вызовов Bot API
+  по методу (в т.ч. из clear_and_send).
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject, Update
+
+from movie_bot.utils.metrics import (
+    HANDLER_ERRORS,
+    HANDLER_LATENCY,
+    TELEGRAM_API_ERRORS,
+    TELEGRAM_API_LATENCY,
+    UPDATE_LATENCY,
+    UPDATES_UNHANDLED,
+)
+
+
+def handler_label(callback: Callable) -> str:
+    """Имя обработчика для меток и трейсов: «модуль.функция»."""
+    module = getattr(callback, "__module__", "") or ""
+    return f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', 'handler')}"
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Полное время обработки обновления по типу события."""
+
+    def __init__(self):
+        self._series: Dict[str, tuple] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+        event_type = event.event_type
+        series = self._series.get(event_type)
+        if series is None:
+            series = self._series[event_type] = (
+                UPDATE_LATENCY.labels(event_type),
+                UPDATES_UNHANDLED.labels(event_type),
+            )
+        try:
+            result = await handler(event, data)
+        finally:
+            series[0].observe(time.perf_counter() - started)
+        if result is UNHANDLED:
+            series[1].inc()
+        return result
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время и ошибки конкретного обработчика."""
+
+    def __init__(self):
+        # callback обработчика -> (гистограмма, счётчик ошибок)
+        self._series: Dict[Callable, tuple] = {}
+
+    def _resolve(self, callback: Callable) -> tuple:
+        series = self._series.get(callback)
+        if series is None:
+            name = handler_label(callback)
+            series = self._series[callback] = (HANDLER_LATENCY.labels(name), HANDLER_ERRORS.labels(name))
+        return series
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        if handler_object is None:
+            return await handler(event, data)
+
+        latency, errors = self._resolve(handler_object.callback)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - started)
+
+
+class TelegramApiMetricsMiddleware(BaseRequestMiddleware):
+    """Время и ошибки запросов к Bot API по методу."""
+
+    def __init__(self):
+        self._latency: Dict[str, Any] = {}
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot, method):
+        name = method.__api_method__
+        latency = self._latency.get(name)
+        if latency is None:
+            latency = self._latency[name] = TELEGRAM_API_LATENCY.labels(name)
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            TELEGRAM_API_ERRORS.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - started)
+
+
+def setup_metrics(dp: Dispatcher):
+    """Подключает метрики обновлений и обработчиков ко всем типам событий диспетчера."""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_metrics = HandlerMetricsMiddleware()
+    for event_name, observer in dp.observers.items():
+        if event_name not in ("update", "error"):
+            observer.middleware(handler_metrics)
@@ -0,0 +1,310 @@
+"""
+Планировщик исходящих запросов к Bot API (middleware сессии).
+
+Лимиты Telegram: около 30 сообщений в секунду на бота и около одного
+в секунду на чат. Вместо того чтобы ловить "Too Many Requests" и терять
+сообщения, каждый запрос сначала получает токен:
+- из глобального ведра (TG_GLOBAL_RATE в секунду);
+- из ведра чата (TG_CHAT_RATE в секунду, запас TG_CHAT_BURST), если у метода есть chat_id.
+
+Запросы, которым токена не хватило, ждут в очереди с приоритетом:
+answerCallbackQuery идёт первым — иначе у пользователя «крутятся часики».
+Если Telegram всё же ответил TelegramRetryAfter, пауза ставится на чат
+(или на всю очередь, если у метода нет чата), и запрос повторяется.
+Пачка нажатий превращается в небольшие задержки, а не в потерянные сообщения.
+"""
+
+import asyncio
+import logging
+from bisect import insort
+from itertools import count
+from typing import Dict, List, Optional, Tuple, Union
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+
+from movie_bot.config import TG_CHAT_BURST, TG_CHAT_RATE, TG_GLOBAL_RATE, TG_RETRY_ATTEMPTS
+from movie_bot.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ChatId = Union[int, str]
+
+# Служебные методы не ограничиваются: long polling и настройка бота
+UNLIMITED_METHODS = frozenset({
+    "getUpdates", "getMe", "setWebhook", "deleteWebhook", "getWebhookInfo",
+    "setMyCommands", "deleteMyCommands", "close", "logOut",
+})
+# Методы, которые обслуживаются вне очереди
+PRIORITY_METHODS = frozenset({"answerCallbackQuery"})
+
+# Сколько вёдер чатов держать, прежде чем выбросить простаивающие
+MAX_CHAT_BUCKETS = 10_000
+
+
+class TokenBucket:
+    """Ведро токенов с паузой (для RetryAfter)."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def ready_at(self, now: float) -> float:
+        """Момент, когда можно будет взять токен (now — если уже можно)."""
+        self._refill(now)
+        at = now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+        return max(at, self.paused_until)
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, until: float):
+        self.paused_until = max(self.paused_until, until)
+
+    def idle(self, now: float) -> bool:
+        """Ведро полное и не на паузе — его можно выбросить без потери состояния."""
+        self._refill(now)
+        return self.tokens >= self.capacity and self.paused_until <= now
+
+
+# (приоритет, порядковый номер, чат, future)
+_Waiter = Tuple[int, int, Optional[ChatId], asyncio.Future]
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Ограничитель исходящих запросов с очередью и приоритетами.
+
+    :param global_rate: Запросов в секунду на весь бот
+    :param chat_rate: Запросов в секунду на один чат
+    :param chat_burst: Сколько запросов в чат можно отправить подряд без ожидания
+    :param retry_attempts: Сколько раз повторять запрос после TelegramRetryAfter
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        retry_attempts: int = 3,
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.retry_attempts = retry_attempts
+
+        self._global: Optional[TokenBucket] = None
+        self._chats: Dict[ChatId, TokenBucket] = {}
+        self._waiting: List[_Waiter] = []
+        self._seq = count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # Метрики
+        self._requests = 0
+        self._delayed = 0
+        self._wait_time_total = 0.0
+        self._retry_after = 0
+        self._global_pauses = 0
+        self._dropped = 0
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot, method):
+        name = method.__api_method__
+        if name in UNLIMITED_METHODS:
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        priority = 0 if name in PRIORITY_METHODS else 1
+        attempt = 0
+        while True:
+            await self.acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self._retry_after += 1
+                self.pause(chat_id, e.retry_after)
+                attempt += 1
+                if attempt > self.retry_attempts:
+                    self._dropped += 1
+                    raise
+                logger.warning(
+                    f"[outbound] {name}: RetryAfter {e.retry_after} с "
+                    f"(чат {chat_id if chat_id is not None else '—'}), попытка {attempt}"
+                )
+
+    # === Токены ===
+
+    def _chat_bucket(self, chat_id: ChatId, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._prune(now)
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
+
+    def _global_bucket(self, now: float) -> TokenBucket:
+        if self._global is None:
+            self._global = TokenBucket(self.global_rate, self.global_rate, now)
+        return self._global
+
+    def _prune(self, now: float):
+        waiting_chats = {chat_id for _, _, chat_id, _ in self._waiting}
+        for chat_id in [c for c, b in self._chats.items() if c not in waiting_chats and b.idle(now)]:
+            del self._chats[chat_id]
+
+    def _try_take(self, chat_id: Optional[ChatId], now: float) -> float:
+        """
+        Берёт токены, если можно. Возвращает 0 при успехе,
+        иначе — через сколько секунд стоит попробовать снова.
+        """
+        global_bucket = self._global_bucket(now)
+        ready = global_bucket.ready_at(now)
+        chat_bucket = None
+        if chat_id is not None:
+            chat_bucket = self._chat_bucket(chat_id, now)
+            ready = max(ready, chat_bucket.ready_at(now))
+        if ready > now:
+            return ready - now
+        global_bucket.take()
+        if chat_bucket is not None:
+            chat_bucket.take()
+        return 0.0
+
+    async def acquire(self, chat_id: Optional[ChatId] = None, priority: int = 1):
+        """Ждёт разрешения на запрос (в чат chat_id, если указан)."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._requests += 1
+        # Быстрый путь: очередь пуста и токены есть
+        if not self._waiting and self._try_take(chat_id, now) == 0:
+            return
+
+        self._delayed += 1
+        future = loop.create_future()
+        insort(self._waiting, (priority, next(self._seq), chat_id, future))
+        self._start()
+        self._wakeup.set()
+        try:
+            await future
+        finally:
+            self._wait_time_total += loop.time() - now
+
+    def pause(self, chat_id: Optional[ChatId], seconds: float):
+        """Приостанавливает чат (или всю очередь, если chat_id не указан)."""
+        now = asyncio.get_running_loop().time()
+        until = now + seconds
+        if chat_id is None:
+            self._global_pauses += 1
+            self._global_bucket(now).pause(until)
+        else:
+            self._chat_bucket(chat_id, now).pause(until)
+        self._wakeup.set()
+
+    # === Фоновая задача ===
+
+    def _start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="telegram-outbound")
+
+    async def stop(self):
+        """Останавливает фоновую задачу; ждущие запросы получают CancelledError."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _, _, _, future in self._waiting:
+            future.cancel()
+        self._waiting.clear()
+
+    def _grant(self, now: float) -> Optional[float]:
+        """
+        Выдаёт токены ожидающим в порядке приоритета.
+        Возвращает, через сколько секунд проверить снова (None — очередь пуста).
+        """
+        next_check: Optional[float] = None
+        remaining: List[_Waiter] = []
+        blocked_chats = set()
+        global_blocked = False
+
+        for waiter in self._waiting:
+            _, _, chat_id, future = waiter
+            if future.done():
+                continue  # запрос отменён
+            if global_blocked or chat_id in blocked_chats:
+                remaining.append(waiter)
+                continue
+            delay = self._try_take(chat_id, now)
+            if delay == 0:
+                future.set_result(None)
+                continue
+            remaining.append(waiter)
+            # Порядок внутри чата сохраняется: следующие запросы этого чата ждут
+            global_delay = self._global_bucket(now).ready_at(now) - now
+            if chat_id is not None and global_delay <= 0:
+                blocked_chats.add(chat_id)
+            else:
+                # Глобальное ведро пусто — остальные смогут пойти, как только оно наполнится
+                global_blocked = True
+                delay = min(delay, global_delay)
+            next_check = delay if next_check is None else min(next_check, delay)
+
+        self._waiting = remaining
+        return next_check if remaining else None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            delay = self._grant(loop.time())
+            if delay is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    # === Метрики ===
+
+    def stats(self) -> Dict[str, float]:
+        """Снимок метрик планировщика."""
+        waiting = list(self._waiting)
+        return {
+            "queue_depth": len(waiting),
+            "queue_depth_priority": sum(1 for w in waiting if w[0] == 0),
+            "chats_tracked": len(self._chats),
+            "requests": self._requests,
+            "delayed": self._delayed,
+            "wait_time_total": self._wait_time_total,
+            "retry_after": self._retry_after,
+            "global_pauses": self._global_pauses,
+            "dropped": self._dropped,
+        }
+
+
+# Глобальный экземпляр (подключается к сессии в bot.py)
+outbound_scheduler = OutboundScheduler(
+    global_rate=TG_GLOBAL_RATE,
+    chat_rate=TG_CHAT_RATE,
+    chat_burst=TG_CHAT_BURST,
+    retry_attempts=TG_RETRY_ATTEMPTS,
+)
+
+REGISTRY.register_stats(
+    "telegram_outbound",
+    outbound_scheduler.stats,
+    counters=("requests", "delayed", "wait_time_total", "retry_after", "global_pauses", "dropped"),
+)
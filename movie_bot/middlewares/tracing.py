@@ -0,0 +1,124 @@
+"""
+Middleware трассировки обновлений (см. utils/tracing.py).
+
+- UpdateTracingMiddleware — outer-middleware на update: открывает трейс
+  с trace id, пользователем и callback data; по завершении пишет дерево
+  спанов в slow-лог, если обновление медленное или попало в выборку;
+- HandlerTracingMiddleware — inner-middleware на события: спан "handler"
+  на тело обработчика;
+- TelegramApiTracingMiddleware — middleware сессии: спан "telegram"
+  на каждый вызов Bot API.
+
+Запросы к БД оформляются спанами в @timed_query (utils/metrics.py).
+"""
+
+import random
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.types import TelegramObject, Update
+
+from movie_bot.config import TRACE_ENABLED, TRACE_SAMPLE_RATE, TRACE_SLOW_THRESHOLD_MS
+from movie_bot.middlewares.metrics import handler_label
+from movie_bot.utils.logger import get_logger
+from movie_bot.utils.tracing import Trace, finish_trace, span, start_trace, write_trace
+
+logger = get_logger(__name__)
+
+
+def _describe(event: Update) -> Dict[str, Any]:
+    """Атрибуты трейса: тип события, пользователь, callback data или текст команды."""
+    attrs: Dict[str, Any] = {"update_id": event.update_id, "event_type": event.event_type}
+    inner = event.event
+    user = getattr(inner, "from_user", None)
+    if user is not None:
+        attrs["user_id"] = user.id
+    if event.callback_query is not None:
+        attrs["callback_data"] = event.callback_query.data
+    elif event.message is not None and event.message.text and event.message.text.startswith("/"):
+        attrs["command"] = event.message.text.split(maxsplit=1)[0]
+    return attrs
+
+
+class UpdateTracingMiddleware(BaseMiddleware):
+    """Трейс на всё время обработки обновления."""
+
+    def __init__(self, threshold_ms: float = TRACE_SLOW_THRESHOLD_MS, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        trace = Trace(event.event_type, sampled=sampled, **_describe(event))
+        data["trace_id"] = trace.trace_id
+        tokens = start_trace(trace)
+        error: Optional[str] = None
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            finish_trace(trace, tokens, error)
+            slow = trace.root.duration >= self.threshold
+            if slow or sampled:
+                try:
+                    write_trace(trace, slow=slow)
+                except Exception as e:
+                    # Трассировка не должна ломать обработку
+                    logger.warning(f"Не удалось записать трейс {trace.trace_id}: {e}")
+
+
+class HandlerTracingMiddleware(BaseMiddleware):
+    """Спан на тело обработчика."""
+
+    def __init__(self):
+        self._names: Dict[Callable, str] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        if handler_object is None:
+            return await handler(event, data)
+
+        callback = handler_object.callback
+        name = self._names.get(callback)
+        if name is None:
+            name = self._names[callback] = handler_label(callback)
+        with span("handler", name):
+            return await handler(event, data)
+
+
+class TelegramApiTracingMiddleware(BaseRequestMiddleware):
+    """Спан на запрос к Bot API (вне обработки обновления — без затрат)."""
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot, method):
+        with span("telegram", method.__api_method__):
+            return await make_request(bot, method)
+
+
+def setup_tracing(dp: Dispatcher):
+    """
+    Подключает трассировку обновлений и обработчиков.
+    Вызывать до setup_metrics(), чтобы трейс охватывал и сбор метрик.
+    """
+    if not TRACE_ENABLED:
+        return
+    dp.update.outer_middleware(UpdateTracingMiddleware())
+    handler_tracing = HandlerTracingMiddleware()
+    for event_name, observer in dp.observers.items():
+        if event_name not in ("update", "error"):
+            observer.middleware(handler_tracing)
+    logger.info(
+        f"Трассировка включена: порог {TRACE_SLOW_THRESHOLD_MS:.0f} мс, выборка {TRACE_SAMPLE_RATE:.2%}"
+    )
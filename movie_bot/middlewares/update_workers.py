@@ -0,0 +1,195 @@
+"""
+Упорядоченная обработка обновлений по пользователям.
+
+Outer-middleware на update распределяет обновления по фиксированному набору
+воркеров: номер воркера = user_id % UPDATE_WORKERS. Каждый воркер
+обрабатывает свою очередь строго по одному обновлению, поэтому обновления
+одного пользователя (двойное нажатие «Просмотрено») не гоняются друг
+с другом, а разные пользователи обрабатываются параллельно.
+
+Очереди ограничены UPDATE_QUEUE_SIZE: когда очередь воркера заполнена,
+приём ждёт — в режиме polling не запрашиваются новые обновления,
+в режиме webhook HTTP-запрос не получает ответа, и Telegram придерживает
+следующие. Для этого polling запускается с handle_as_tasks=False:
+middleware возвращается сразу после постановки в очередь.
+
+FSMContextMiddleware aiogram стоит раньше и читает состояние при постановке
+в очередь. Воркер перечитывает его перед обработкой: иначе сообщение,
+пришедшее сразу после нажатия «Добавить», маршрутизировалось бы по
+состоянию до того, как нажатие его сменило.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from movie_bot.config import UPDATE_QUEUE_SIZE, UPDATE_WORKERS
+from movie_bot.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+# (цепочка обработки, обновление, data, future для результата или None, время постановки)
+_Job = Tuple[Handler, Update, Dict[str, Any], Optional[asyncio.Future], float]
+
+
+class _Worker:
+    """Очередь и метрики одного воркера."""
+
+    __slots__ = ("index", "queue", "task", "processed", "failed", "busy_time", "wait_time", "started_at")
+
+    def __init__(self, index: int, queue_size: int):
+        self.index = index
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+        self.processed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self.started_at: Optional[float] = None
+
+    def stats(self, now: float) -> Dict[str, float]:
+        uptime = now - self.started_at if self.started_at is not None else 0.0
+        return {
+            "queue_depth": self.queue.qsize(),
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": self.busy_time,
+            "queue_wait_seconds": self.wait_time,
+            "utilization": self.busy_time / uptime if uptime > 0 else 0.0,
+        }
+
+
+class UpdateScheduler(BaseMiddleware):
+    """
+    Распределяет обновления по воркерам по user_id.
+
+    :param workers: Число воркеров (и очередей)
+    :param queue_size: Максимальная длина очереди одного воркера
+    :param wait_result: Ждать результат обработки (нужно для webhook:
+                        ответ отдаётся Telegram, ошибки уходят в обработчики ошибок aiogram).
+                        Без ожидания middleware возвращается после постановки в очередь.
+    """
+
+    def __init__(self, workers: int = 8, queue_size: int = 100, wait_result: bool = True):
+        self.wait_result = wait_result
+        self._workers: List[_Worker] = [_Worker(i, queue_size) for i in range(max(1, workers))]
+
+    async def __call__(self, handler: Handler, event: Update, data: Dict[str, Any]) -> Any:
+        worker = self._workers[self._key(event, data) % len(self._workers)]
+        self._start()
+        future = asyncio.get_running_loop().create_future() if self.wait_result else None
+        await worker.queue.put((handler, event, data, future, time.monotonic()))
+        if future is None:
+            return None
+        return await future
+
+    @staticmethod
+    def _key(event: Update, data: Dict[str, Any]) -> int:
+        """Ключ упорядочивания: пользователь, иначе чат, иначе само обновление."""
+        user = data.get("event_from_user")
+        if user is not None:
+            return user.id
+        chat = data.get("event_chat")
+        if chat is not None:
+            return chat.id
+        return event.update_id
+
+    # === Воркеры ===
+
+    def _start(self):
+        for worker in self._workers:
+            if worker.task is None or worker.task.done():
+                worker.started_at = time.monotonic()
+                worker.task = asyncio.create_task(self._run(worker), name=f"update-worker-{worker.index}")
+
+    async def _run(self, worker: _Worker):
+        while True:
+            handler, event, data, future, enqueued = await worker.queue.get()
+            started = time.monotonic()
+            worker.wait_time += started - enqueued
+            try:
+                state = data.get("state")
+                if state is not None:
+                    # Предыдущие обновления пользователя могли сменить состояние, пока это ждало в очереди
+                    data["raw_state"] = await state.get_state()
+                result = await handler(event, data)
+            except Exception as e:
+                worker.failed += 1
+                if future is not None:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    logger.error(f"[worker {worker.index}] Ошибка обработки update {event.update_id}: {e}", exc_info=True)
+            else:
+                if future is not None and not future.done():
+                    future.set_result(result)
+            finally:
+                worker.processed += 1
+                worker.busy_time += time.monotonic() - started
+                worker.queue.task_done()
+
+    async def stop(self, timeout: float):
+        """
+        Дорабатывает поставленные в очередь обновления (не дольше timeout) и останавливает воркеров.
+        :return: True, если все очереди обработаны
+        """
+        running = [w for w in self._workers if w.task is not None and not w.task.done()]
+        drained = True
+        if running:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(w.queue.join() for w in running)), timeout)
+            except asyncio.TimeoutError:
+                pending = sum(w.queue.qsize() for w in running)
+                logger.warning(f"Не дождались обработки {pending} обновлений за {timeout} с")
+                drained = False
+        for worker in running:
+            worker.task.cancel()
+        await asyncio.gather(*(w.task for w in running), return_exceptions=True)
+        for worker in self._workers:
+            worker.task = None
+            while not worker.queue.empty():
+                *_, future, _ = worker.queue.get_nowait()
+                if future is not None:
+                    future.cancel()
+        return drained
+
+    # === Метрики ===
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Метрики по воркерам: {номер воркера: stats}."""
+        now = time.monotonic()
+        return {str(w.index): w.stats(now) for w in self._workers}
+
+
+_scheduler: Optional[UpdateScheduler] = None
+
+
+def setup_update_workers(dp: Dispatcher, wait_result: bool) -> UpdateScheduler:
+    """
+    Подключает распределение по воркерам. Вызывать до трассировки и метрик
+    (но после склейки нажатий), чтобы трейсы и метрики обновления считались внутри воркера.
+    """
+    global _scheduler
+    _scheduler = UpdateScheduler(workers=UPDATE_WORKERS, queue_size=UPDATE_QUEUE_SIZE, wait_result=wait_result)
+    dp.update.outer_middleware(_scheduler)
+    return _scheduler
+
+
+def get_update_worker_stats() -> Dict[str, Dict[str, float]]:
+    """Метрики воркеров (пустой словарь до setup_update_workers)."""
+    if _scheduler is None:
+        return {}
+    return _scheduler.stats()
+
+
+REGISTRY.register_labeled_stats(
+    "bot_update_worker",
+    "worker",
+    get_update_worker_stats,
+    counters=("processed", "failed", "busy_seconds", "queue_wait_seconds"),
+)
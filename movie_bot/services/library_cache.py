@@ -0,0 +1,216 @@
+"""
+In-process LRU-кэш библиотек пользователей.
+
+Хранит компактный снимок строк пользователя (без описаний и постеров),
+чтобы повторные обращения за сессию не ходили в SQLite.
+Кэш обновляется только через MovieService — изменяющие методы
+сервиса патчат снимок на месте или сбрасывают его.
+
+Рядом со снимком лениво строится FuzzyIndex названий — он обновляется
+теми же патчами и вытесняется вместе со снимком.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from movie_bot.config import LIBRARY_CACHE_MAX_USERS
+from movie_bot.utils.fuzzy_index import FuzzyIndex
+from movie_bot.utils.metrics import REGISTRY
+
+
+@dataclass(slots=True)
+class MovieSummary:
+    """
+    Компактная строка библиотеки.
+    Поддерживает доступ по ключу (movie["title"]), как aiosqlite.Row.
+    """
+    id: int
+    title: str
+    genre: str
+    watched: int
+    added_at: Optional[str]
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    @classmethod
+    def from_row(cls, row) -> "MovieSummary":
+        return cls(
+            id=row["id"],
+            title=row["title"],
+            genre=row["genre"],
+            watched=row["watched"],
+            added_at=row["added_at"],
+        )
+
+
+class LibraryCache:
+    """
+    LRU-кэш снимков библиотек по user_id с ограничением на число пользователей.
+
+    Загрузка снимка оформляется через begin_load()/put(): если во время чтения
+    из БД пользователь изменил библиотеку, прочитанный снимок не кэшируется
+    и не перезапишет более свежее состояние.
+    """
+
+    def __init__(self, max_users: int = 500):
+        self.max_users = max_users
+        self._entries: "OrderedDict[int, Dict[int, MovieSummary]]" = OrderedDict()
+        self._fuzzy: Dict[int, FuzzyIndex] = {}
+        # user_id -> [число загрузок в процессе, были ли изменения во время загрузки]
+        self._loading: Dict[int, list] = {}
+
+        # Метрики
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: int) -> Optional[Dict[int, MovieSummary]]:
+        """Возвращает снимок пользователя (id -> MovieSummary) или None."""
+        snapshot = self._entries.get(user_id)
+        if snapshot is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return snapshot
+
+    def begin_load(self, user_id: int):
+        """Отмечает начало чтения снимка из БД. Парный вызов — put()."""
+        state = self._loading.setdefault(user_id, [0, False])
+        state[0] += 1
+
+    def put(self, user_id: int, rows: Iterable) -> Dict[int, MovieSummary]:
+        """
+        Завершает загрузку: сохраняет снимок, если за время чтения
+        библиотека не менялась. Возвращает собранный снимок в любом случае.
+        """
+        snapshot = {row["id"]: MovieSummary.from_row(row) for row in rows}
+
+        state = self._loading.get(user_id)
+        stale = bool(state and state[1])
+        if state:
+            state[0] -= 1
+            if state[0] <= 0:
+                del self._loading[user_id]
+        if stale:
+            return snapshot
+
+        self._entries[user_id] = snapshot
+        self._entries.move_to_end(user_id)
+        self._fuzzy.pop(user_id, None)
+        while len(self._entries) > self.max_users:
+            evicted, _ = self._entries.popitem(last=False)
+            self._fuzzy.pop(evicted, None)
+            self.evictions += 1
+        return snapshot
+
+    def abort_load(self, user_id: int):
+        """Снимает отметку загрузки, если чтение из БД завершилось ошибкой."""
+        state = self._loading.get(user_id)
+        if state:
+            state[0] -= 1
+            if state[0] <= 0:
+                del self._loading[user_id]
+
+    def fuzzy_index(self, user_id: int, snapshot: Dict[int, MovieSummary]) -> FuzzyIndex:
+        """
+        Индекс названий для снимка пользователя. Строится при первом обращении;
+        для снимка, который не попал в кэш, возвращается одноразовый индекс.
+        """
+        index = self._fuzzy.get(user_id)
+        if index is None:
+            index = FuzzyIndex((movie.id, movie.title) for movie in snapshot.values())
+            if self._entries.get(user_id) is snapshot:
+                self._fuzzy[user_id] = index
+        return index
+
+    # === Изменения ===
+
+    def _bump(self, user_id: int):
+        state = self._loading.get(user_id)
+        if state:
+            state[1] = True
+
+    def invalidate(self, user_id: int):
+        """Сбрасывает снимок пользователя."""
+        self._bump(user_id)
+        self._entries.pop(user_id, None)
+        self._fuzzy.pop(user_id, None)
+
+    def upsert(self, user_id: int, row):
+        """Добавляет или заменяет строку в снимке (если пользователь в кэше)."""
+        self._bump(user_id)
+        snapshot = self._entries.get(user_id)
+        if snapshot is not None:
+            snapshot[row["id"]] = MovieSummary.from_row(row)
+            index = self._fuzzy.get(user_id)
+            if index is not None:
+                index.add(row["id"], row["title"])
+
+    def patch(self, user_id: int, movie_id: int, **fields):
+        """Обновляет поля строки в снимке. Неизвестные поля игнорируются."""
+        self._bump(user_id)
+        snapshot = self._entries.get(user_id)
+        if snapshot is None:
+            return
+        summary = snapshot.get(movie_id)
+        if summary is None:
+            # Строки нет в снимке — данные разошлись, перечитаем при следующем обращении
+            self._entries.pop(user_id, None)
+            self._fuzzy.pop(user_id, None)
+            return
+        for key, value in fields.items():
+            if key in MovieSummary.__slots__:
+                setattr(summary, key, value)
+        index = self._fuzzy.get(user_id)
+        if index is not None and "title" in fields:
+            index.rename(movie_id, summary.title)
+
+    def remove(self, user_id: int, movie_id: int):
+        """Удаляет строку из снимка."""
+        self._bump(user_id)
+        snapshot = self._entries.get(user_id)
+        if snapshot is not None:
+            snapshot.pop(movie_id, None)
+        index = self._fuzzy.get(user_id)
+        if index is not None:
+            index.remove(movie_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._fuzzy.clear()
+        self._loading.clear()
+
+    # === Метрики ===
+
+    def stats(self) -> Dict[str, float]:
+        """Счётчики попаданий, промахов и вытеснений."""
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "fuzzy_indexes": len(self._fuzzy),
+            "max_users": self.max_users,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def sort_library(snapshot: Dict[int, MovieSummary], watched: Optional[bool] = None) -> List[MovieSummary]:
+    """
+    Возвращает строки снимка в порядке «сначала новые» (как get_all_movies),
+    с необязательным фильтром по статусу.
+    """
+    items = snapshot.values()
+    if watched is not None:
+        items = [m for m in items if bool(m.watched) == watched]
+    return sorted(items, key=lambda m: (m.added_at or "", m.id), reverse=True)
+
+
+# Глобальный экземпляр
+library_cache = LibraryCache(max_users=LIBRARY_CACHE_MAX_USERS)
+
+REGISTRY.register_stats("library_cache", library_cache.stats, counters=("hits", "misses", "evictions"))
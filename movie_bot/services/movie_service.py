@@ -1,22 +1,34 @@
 """
 Сервис для управления фильмами.
 Изолирует бизнес-логику от обработчиков.
+
+Держит read-through кэш библиотек пользователей (library_cache):
+чтения обслуживаются из памяти, а каждый изменяющий метод
+патчит или сбрасывает снимок пользователя.
 """
 
-from typing import List, Optional, Dict
+from typing import AsyncIterator, Dict, List, Optional, Sequence
 import aiosqlite
 
 from movie_bot.database.queries import (
-    get_all_movies,
     get_movie_by_id,
+    get_movie_summaries,
+    iter_movies,
     add_movie,
-    mark_movie_watched,
-    delete_movie,
+    add_movies_bulk,
     is_movie_exists,
+    mark_movie_watched,
+    delete_movie_returning,
+    toggle_watched_returning,
     update_movie,
     get_movies_by_genre,
+    search_movie_ids,
 )
-from movie_bot.utils.helpers import get_similar_movies as fuzzy_match
+from movie_bot.services.library_cache import MovieSummary, library_cache, sort_library
+from movie_bot.utils.cpu_pool import run_cpu
+from movie_bot.utils.fuzzy_index import normalize_for_match, score_titles
+from movie_bot.utils.importers import ImportRow
+from movie_bot.utils.text_utils import normalize_title
 
 
 class MovieService:
@@ -26,11 +38,36 @@ class MovieService:
     """
 
     @staticmethod
-    async def get_all(user_id: int, watched: Optional[bool] = None) -> List[aiosqlite.Row]:
+    async def _library(user_id: int) -> Dict[int, MovieSummary]:
         """
-        Получить все фильмы пользователя.
+        Снимок библиотеки пользователя: из кэша или из БД (с сохранением в кэш).
         """
-        return await get_all_movies(user_id=user_id, watched=watched)
+        snapshot = library_cache.get(user_id)
+        if snapshot is not None:
+            return snapshot
+
+        library_cache.begin_load(user_id)
+        try:
+            rows = await get_movie_summaries(user_id)
+        except Exception:
+            library_cache.abort_load(user_id)
+            raise
+        return library_cache.put(user_id, rows)
+
+    @staticmethod
+    async def get_all(user_id: int, watched: Optional[bool] = None) -> List[MovieSummary]:
+        """
+        Получить все фильмы пользователя (компактные строки, сначала новые).
+        """
+        return sort_library(await MovieService._library(user_id), watched)
+
+    @staticmethod
+    def iter_all(user_id: int, batch_size: int = 500) -> AsyncIterator[aiosqlite.Row]:
+        """
+        Все фильмы пользователя потоком (полные карточки, в порядке добавления).
+        Читается из БД пачками, мимо кэша — для выгрузки.
+        """
+        return iter_movies(user_id, batch_size)
 
     @staticmethod
     async def get_by_id(user_id: int, movie_id: int) -> Optional[Dict]:
@@ -46,17 +83,37 @@ class MovieService:
         genre: str,
         description: Optional[str] = None,
         poster_id: Optional[str] = None
-    ) -> None:
+    ) -> bool:
         """
         Добавить новый фильм.
+        Возвращает False, если фильм с таким названием уже есть.
         """
-        await add_movie(
+        movie = await add_movie(
             user_id=user_id,
             title=title,
             genre=genre,
             description=description,
             poster_id=poster_id
         )
+        if movie:
+            # Строка добавляется в снимок и в индекс похожих названий — без перечитывания библиотеки
+            library_cache.upsert(user_id, movie)
+        return movie is not None
+
+    @staticmethod
+    async def create_many(user_id: int, movies: Sequence[ImportRow]) -> int:
+        """
+        Добавить пачку фильмов (импорт). Дубликаты пропускаются.
+        Возвращает, сколько фильмов добавлено.
+        """
+        added = await add_movies_bulk(
+            user_id,
+            [(movie.title, movie.genre, movie.description, movie.watched) for movie in movies]
+        )
+        if added:
+            # id добавленных строк executemany не возвращает — снимок перечитается целиком
+            library_cache.invalidate(user_id)
+        return added
 
     @staticmethod
     async def mark_watched(movie_id: int, user_id: int, watched: bool) -> None:
@@ -64,18 +121,41 @@ class MovieService:
         Пометить как просмотренный/непросмотренный.
         """
         await mark_movie_watched(movie_id, user_id, watched)
+        library_cache.patch(user_id, movie_id, watched=1 if watched else 0)
+
+    @staticmethod
+    async def toggle_watched(movie_id: int, user_id: int) -> Optional[Dict]:
+        """
+        Переключить статус «просмотрено». Возвращает обновлённую карточку или None.
+        """
+        movie = await toggle_watched_returning(movie_id, user_id)
+        if movie:
+            library_cache.upsert(user_id, movie)
+        return movie
 
     @staticmethod
     async def remove(movie_id: int, user_id: int) -> Optional[str]:
         """
         Удалить фильм. Возвращает название или None.
         """
-        return await delete_movie(movie_id, user_id)
+        deleted = await MovieService.remove_returning(movie_id, user_id)
+        return deleted["title"] if deleted else None
+
+    @staticmethod
+    async def remove_returning(movie_id: int, user_id: int) -> Optional[Dict]:
+        """
+        Удалить фильм. Возвращает удалённую строку или None.
+        """
+        deleted = await delete_movie_returning(movie_id, user_id)
+        if deleted:
+            library_cache.remove(user_id, movie_id)
+        return deleted
 
     @staticmethod
     async def exists(user_id: int, title: str) -> bool:
         """
-        Проверить, есть ли фильм с таким названием у пользователя.
+        Проверить, есть ли фильм с таким названием у пользователя
+        (по нормализованному названию, через уникальный индекс).
         """
         return await is_movie_exists(user_id, title)
 
@@ -85,6 +165,7 @@ class MovieService:
         Обновить поля фильма.
         """
         await update_movie(user_id, movie_id, **fields)
+        library_cache.patch(user_id, movie_id, **fields)
 
     @staticmethod
     async def get_recommendations(user_id: int, genre: str) -> List[aiosqlite.Row]:
@@ -95,11 +176,39 @@ class MovieService:
         return await get_movies_by_genre(genre=genre, user_id=user_id)
 
     @staticmethod
-    async def find_similar(user_id: int, title: str, threshold: int = 75) -> List[str]:
+    async def search_ids(user_id: int, query: str, limit: int = 50) -> List[int]:
+        """
+        Найти фильмы по подстроке в названии или жанре; возвращает id.
+        Обычно — по полнотекстовому индексу, а короткие запросы (и сборки
+        без FTS5) — по кэшированному снимку, в порядке «сначала новые».
+        """
+        movie_ids = await search_movie_ids(user_id, query, limit)
+        if movie_ids is not None:
+            return movie_ids
+
+        query = normalize_title(query)
+        return [
+            movie.id for movie in await MovieService.get_all(user_id)
+            if query in normalize_title(movie.title) or query in movie.genre.casefold()
+        ][:limit]
+
+    @staticmethod
+    async def find_similar(user_id: int, title: str, threshold: int = 75, limit: int = 5) -> List[str]:
         """
         Найти похожие по названию (по fuzzy-сравнению).
-        Возвращает список похожих названий.
+        Возвращает до `limit` названий, самые похожие — первыми.
+        """
+        library = await MovieService._library(user_id)
+        index = library_cache.fuzzy_index(user_id, library)
+        query = normalize_for_match(title)
+        ids, titles = index.candidate_titles(query, threshold)
+        # Большие пачки считаются в пуле, чтобы не останавливать event loop
+        scored = await run_cpu("fuzzy_score", score_titles, query, titles, threshold, size=len(titles))
+        return [match for match, _ in index.best(ids, scored, limit)]
+
+    @staticmethod
+    def cache_stats() -> Dict[str, float]:
+        """
+        Метрики кэша библиотек: hits, misses, evictions, hit_ratio.
         """
-        movies = await get_all_movies(user_id=user_id, watched=None)
-        # Приводим к списку словарей или Row — get_similar_movies поддерживает
-        return fuzzy_match(movies, title, threshold)
\ No newline at end of file
+        return library_cache.stats()
@@ -15,7 +15,7 @@ class UserService:
     @staticmethod
     async def get_stats(user_id: int) -> Dict[str, int]:
         """
-        Получить статистику пользователя через SQL COUNT.
+        Получить статистику пользователя из агрегата user_stats.
 
         :param user_id: ID пользователя
         :return: Словарь с ключами: total, watched
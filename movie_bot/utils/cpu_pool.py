@@ -0,0 +1,96 @@
+"""
+Пул для CPU-тяжёлой работы (нечёткое сравнение названий и т.п.).
+
+Синхронный подсчёт в event loop останавливает всех пользователей, поэтому
+большие пачки уходят в пул:
+- CPU_POOL_MODE=process (по умолчанию) — ProcessPoolExecutor: работа идёт
+  параллельно, без GIL. Процессы стартуют через spawn: fork процесса
+  с потоками (логирование, сторож event loop) небезопасен;
+- CPU_POOL_MODE=thread — ThreadPoolExecutor (loop отзывчив, но GIL общий);
+- CPU_POOL_MODE=inline — всё считается на месте.
+
+Пачки меньше CPU_OFFLOAD_MIN_BATCH считаются на месте: передача в процесс
+дороже самой работы. Функция и аргументы должны сериализоваться pickle —
+передавайте компактные кортежи строк, а не строки БД.
+Время обоих путей — в bot_cpu_task_duration_seconds{task, path}.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from movie_bot.config import CPU_OFFLOAD_MIN_BATCH, CPU_POOL_MODE, CPU_POOL_WORKERS
+from movie_bot.utils.metrics import CPU_TASK_FALLBACKS, CPU_TASK_LATENCY
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[Executor] = None
+
+
+def _warm_up() -> None:
+    """Пустая задача: процессы пула стартуют заранее, а не на первом запросе."""
+
+
+def _create_executor() -> Optional[Executor]:
+    if CPU_POOL_MODE == "process":
+        return ProcessPoolExecutor(
+            max_workers=CPU_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    if CPU_POOL_MODE == "thread":
+        return ThreadPoolExecutor(max_workers=CPU_POOL_WORKERS, thread_name_prefix="cpu-pool")
+    return None
+
+
+def start_cpu_pool():
+    """Создаёт пул и прогревает процессы (вызывать при старте бота)."""
+    global _executor
+    if _executor is not None:
+        return
+    _executor = _create_executor()
+    if _executor is not None:
+        for _ in range(CPU_POOL_WORKERS):
+            _executor.submit(_warm_up)
+        logger.info(f"Пул CPU-задач запущен: {CPU_POOL_MODE}, воркеров: {CPU_POOL_WORKERS}")
+
+
+def stop_cpu_pool():
+    """Останавливает пул; незапущенные задачи отменяются."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def run_cpu(task: str, func: Callable[..., Any], *args: Any, size: int) -> Any:
+    """
+    Выполняет func(*args) в пуле, если пачка достаточно большая, иначе — на месте.
+
+    :param task: Имя задачи для метрик
+    :param func: Функция уровня модуля (для process-пула — сериализуемая)
+    :param size: Размер пачки (например, число названий); сравнивается с CPU_OFFLOAD_MIN_BATCH
+    """
+    global _executor
+    if _executor is None or size < CPU_OFFLOAD_MIN_BATCH:
+        with CPU_TASK_LATENCY.labels(task, "inline").time():
+            return func(*args)
+
+    executor = _executor
+    started = time.perf_counter()
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    except BrokenProcessPool as e:
+        # Процесс пула погиб (например, OOM) — пересоздаём пул, эту пачку считаем на месте
+        CPU_TASK_FALLBACKS.labels(task).inc()
+        logger.warning(f"[cpu_pool] {task}: пул сломан ({e}), пересоздаю и считаю на месте")
+        if _executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            _executor = _create_executor()
+        with CPU_TASK_LATENCY.labels(task, "inline").time():
+            return func(*args)
+    CPU_TASK_LATENCY.labels(task, CPU_POOL_MODE).observe(time.perf_counter() - started)
+    return result
@@ -0,0 +1,77 @@
+"""
+Выгрузка библиотеки в файл (/export).
+
+Строки приходят из iter_movies() пачками и сразу пишутся в
+SpooledTemporaryFile: небольшой файл остаётся в памяти, большой уходит
+на диск. SpooledInputFile отдаёт его aiogram кусками при загрузке,
+поэтому память не растёт с размером библиотеки.
+
+Поля совпадают с форматом /import (utils/importers.py): выгруженный
+файл можно загрузить обратно.
+"""
+
+import csv
+import io
+import json
+from typing import IO, Any, AsyncIterator, AsyncGenerator, Mapping
+
+from aiogram.types import InputFile
+
+# Форматы: имя -> расширение файла
+EXPORT_FORMATS = {"csv": "csv", "json": "jsonl"}
+EXPORT_COLUMNS = ("title", "genre", "description", "watched", "added_at", "watched_at")
+
+
+async def write_export(rows: AsyncIterator[Mapping[str, Any]], out: IO[bytes], fmt: str = "csv") -> int:
+    """
+    Пишет строки в бинарный файл: CSV (UTF-8 с BOM — Excel читает кириллицу)
+    или JSON Lines.
+
+    :param rows: Асинхронный поток строк (например, iter_movies)
+    :param out: Файл, открытый на запись в бинарном режиме
+    :param fmt: "csv" или "json"
+    :return: Сколько строк записано
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+
+    text = io.TextIOWrapper(out, encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="")
+    count = 0
+    try:
+        if fmt == "csv":
+            writer = csv.writer(text)
+            writer.writerow(EXPORT_COLUMNS)
+            async for row in rows:
+                writer.writerow([
+                    row["title"], row["genre"], row["description"] or "",
+                    int(bool(row["watched"])), row["added_at"] or "", row["watched_at"] or "",
+                ])
+                count += 1
+        else:
+            async for row in rows:
+                record = {column: row[column] for column in EXPORT_COLUMNS}
+                record["watched"] = bool(record["watched"])
+                text.write(json.dumps(record, ensure_ascii=False))
+                text.write("\n")
+                count += 1
+        text.flush()
+    finally:
+        # Файл остаётся открытым для загрузки
+        text.detach()
+    return count
+
+
+class SpooledInputFile(InputFile):
+    """
+    InputFile поверх открытого бинарного файла (в т.ч. SpooledTemporaryFile).
+    Читается кусками с начала при каждой отправке — повтор после RetryAfter тоже работает.
+    """
+
+    def __init__(self, file: IO[bytes], filename: str, chunk_size: int = 64 * 1024):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot) -> AsyncGenerator[bytes, None]:
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
@@ -0,0 +1,172 @@
+"""
+Индекс для нечёткого поиска названий.
+
+Вместо сравнения запроса с каждым названием библиотеки кандидаты
+отбираются по общим биграммам и границам длины, а fuzz.ratio считается
+только для них — и только один раз. Отбор точный: название, которое
+прошло бы порог при полном переборе, не будет отброшено.
+"""
+
+import heapq
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from thefuzz import fuzz
+
+
+def normalize_for_match(title: str) -> str:
+    """Приводит название к виду, в котором оно сравнивается."""
+    return str(title).lower().strip()
+
+
+def score_titles(query: str, titles: Sequence[str], threshold: int) -> List[Tuple[int, int]]:
+    """
+    Считает fuzz.ratio запроса с каждым названием (уже нормализованными).
+    Функция уровня модуля — выполняется и в процессе пула (utils/cpu_pool.py).
+
+    :return: Пары (позиция в titles, оценка) для оценок не ниже порога
+    """
+    ratio = fuzz.ratio
+    scored = []
+    for position, title in enumerate(titles):
+        score = ratio(query, title)
+        if score >= threshold:
+            scored.append((position, score))
+    return scored
+
+
+def _bigrams(text: str) -> Counter:
+    return Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+
+class FuzzyIndex:
+    """
+    Индекс названий одного пользователя с инкрементальным обновлением.
+
+    Оценка fuzz.ratio = 100 * (1 - d / (la + lb)), где d — число вставок/удалений,
+    поэтому порог даёт верхнюю границу d. Из неё следуют:
+    - границы длины кандидата (d >= |la - lb|);
+    - минимум общих биграмм: у общей подпоследовательности длины m
+      не меньше m - 1 - d соседних пар, совпадающих в обеих строках.
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, str]] = ()):
+        self._titles: Dict[int, str] = {}
+        self._normalized: Dict[int, str] = {}
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._by_length: Dict[int, Set[int]] = defaultdict(set)
+        for movie_id, title in items:
+            self.add(movie_id, title)
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    # === Обновление ===
+
+    def add(self, movie_id: int, title: str):
+        """Добавляет название (или заменяет, если id уже есть)."""
+        if movie_id in self._titles:
+            self.remove(movie_id)
+
+        normalized = normalize_for_match(title)
+        self._titles[movie_id] = title
+        self._normalized[movie_id] = normalized
+        self._by_length[len(normalized)].add(movie_id)
+        for gram, count in _bigrams(normalized).items():
+            self._postings[gram][movie_id] = count
+
+    def remove(self, movie_id: int):
+        """Удаляет название из индекса."""
+        normalized = self._normalized.pop(movie_id, None)
+        if normalized is None:
+            return
+        del self._titles[movie_id]
+
+        bucket = self._by_length[len(normalized)]
+        bucket.discard(movie_id)
+        if not bucket:
+            del self._by_length[len(normalized)]
+
+        for gram in _bigrams(normalized):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.pop(movie_id, None)
+                if not postings:
+                    del self._postings[gram]
+
+    def rename(self, movie_id: int, title: str):
+        """Обновляет название существующей записи."""
+        self.add(movie_id, title)
+
+    # === Поиск ===
+
+    @staticmethod
+    def _max_distance(total_length: int, threshold: int) -> int:
+        # round(score) >= threshold  <=>  score >= threshold - 0.5
+        return math.floor((1 - (threshold - 0.5) / 100) * total_length + 1e-9)
+
+    @classmethod
+    def _min_shared_bigrams(cls, la: int, lb: int, threshold: int) -> int:
+        d = cls._max_distance(la + lb, threshold)
+        lcs = math.ceil((la + lb - d) / 2)
+        return lcs - 1 - d
+
+    def candidates(self, query: str, threshold: int) -> Set[int]:
+        """
+        Возвращает id названий, которые могут набрать `threshold` с запросом.
+        """
+        la = len(query)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram, q_count in _bigrams(query).items():
+            for movie_id, count in self._postings.get(gram, {}).items():
+                shared[movie_id] += min(q_count, count)
+
+        result: Set[int] = set()
+        for lb, ids in self._by_length.items():
+            if self._max_distance(la + lb, threshold) < abs(la - lb):
+                continue
+            min_shared = self._min_shared_bigrams(la, lb, threshold)
+            if min_shared <= 0:
+                # Короткие строки: общих биграмм может не быть вовсе
+                result.update(ids)
+            else:
+                result.update(movie_id for movie_id in ids if shared.get(movie_id, 0) >= min_shared)
+        return result
+
+    def candidate_titles(self, query: str, threshold: int) -> Tuple[Tuple[int, ...], Tuple[str, ...]]:
+        """
+        Кандидаты для подсчёта оценок: id и нормализованные названия в том же порядке.
+        Компактные кортежи можно передать в процесс пула.
+
+        :param query: Нормализованный запрос (normalize_for_match)
+        """
+        ids = tuple(self.candidates(query, threshold))
+        return ids, tuple(self._normalized[movie_id] for movie_id in ids)
+
+    def best(self, ids: Sequence[int], scored: Iterable[Tuple[int, int]], k: int) -> List[Tuple[str, int]]:
+        """
+        Отбирает k лучших по результату score_titles.
+        Названия, удалённые из индекса, пока считались оценки, пропускаются.
+        """
+        ranked = []
+        for position, score in scored:
+            movie_id = ids[position]
+            title = self._titles.get(movie_id)
+            if title is not None:
+                ranked.append((score, -movie_id, title))
+        return [(title, score) for score, _, title in heapq.nlargest(k, ranked)]
+
+    def top_k(self, query: str, k: int = 5, threshold: int = 75) -> List[Tuple[str, int]]:
+        """
+        Возвращает до k самых похожих названий с оценкой не ниже порога.
+        Считает на месте; для больших библиотек см. MovieService.find_similar.
+
+        :param query: Запрос пользователя
+        :param k: Сколько результатов вернуть
+        :param threshold: Порог схожести (0–100)
+        :return: Список (оригинальное название, оценка) по убыванию оценки
+        """
+        query = normalize_for_match(query)
+        ids, titles = self.candidate_titles(query, threshold)
+        return self.best(ids, score_titles(query, titles, threshold), k)
@@ -1,6 +1,7 @@
 """
 Простейший HTTP-сервер для health-check на Render.
-Запускается в отдельном потоке, отвечает на /health с кодом 200.
+Запускается в отдельном потоке, отвечает на /health с кодом 200
+и отдаёт метрики Prometheus на /metrics.
 """
 
 import os
@@ -10,6 +11,8 @@ from http.server import BaseHTTPRequestHandler, HTTPServer
 from threading import Thread
 from typing import Optional
 
+from movie_bot.utils.metrics import CONTENT_TYPE, render_metrics
+
 
 # Настройка логирования
 logger = logging.getLogger("healthcheck")
@@ -26,10 +29,13 @@ if not logger.handlers:
 class HealthCheckHandler(BaseHTTPRequestHandler):
     """
     Обработчик HTTP-запросов для health-check.
-    Отвечает только на GET /health.
+    Отвечает на GET /health и GET /metrics.
     """
 
     def do_GET(self):
+        if self.path == "/metrics":
+            self._send_metrics()
+            return
         if self.path != "/health":
             self.send_error(404, "Not Found")
             return
@@ -43,6 +49,14 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(b"OK")
 
+    def _send_metrics(self):
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def log_message(self, format, *args):
         """Подавляем стандартный лог `http.server`"""
         pass  # Используем наш логгер
@@ -1,81 +1,90 @@
+import asyncio
 from typing import List, Union, Optional
 from aiogram import Bot
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InputMediaPhoto
 from aiogram.exceptions import (
     TelegramForbiddenError,
-    TelegramBadRequest  # ← Единственное исключение, которое нужно
+    TelegramBadRequest,
+    TelegramRetryAfter,
 )
-from thefuzz import fuzz
 import logging
 
+from movie_bot.config import RENDER_MODE
+from movie_bot.utils.fuzzy_index import normalize_for_match, score_titles
+from movie_bot.utils.metrics import RENDER_API_CALLS, RENDER_TOTAL
+
 logger = logging.getLogger(__name__)
 
+# Способ отрисовки -> (счётчик смен экрана, счётчик запросов к Bot API)
+_RENDER_SERIES = {
+    strategy: (RENDER_TOTAL.labels(strategy), RENDER_API_CALLS.labels(strategy))
+    for strategy in ("edit_text", "edit_markup", "edit_media", "not_modified", "edit_failed", "resend")
+}
+
+
+def _record_render(strategy: str, api_calls: int):
+    total, calls = _RENDER_SERIES[strategy]
+    total.inc()
+    calls.inc(api_calls)
+
 
 async def clear_and_send(
     event: Union[Message, CallbackQuery, Bot],
     text: str,
     reply_markup=None,
-    parse_mode: Optional[str] = None
-):
+    parse_mode: Optional[str] = None,
+    photo: Optional[str] = None,
+) -> Optional[Message]:
     """
-    Универсально удаляет предыдущее сообщение и отправляет новое.
+    Универсально показывает новый экран вместо предыдущего сообщения.
+
+    В режиме RENDER_MODE=edit сообщение бота редактируется на месте
+    (editMessageText / editMessageReplyMarkup / editMessageMedia) — один запрос.
+    Если редактирование невозможно (сообщение пользователя, текст <-> фото,
+    старое сообщение), старое удаляется параллельно с отправкой нового.
+
+    :param photo: file_id постера — экран отправляется как фото с подписью `text`
+    :return: Показанное сообщение или None при ошибке
+
     Обрабатывает:
     - Сообщение уже удалено
-    - Flood limit (Too Many Requests)
+    - Flood limit (Too Many Requests): повторы делает планировщик
+      в middlewares/rate_limit.py, сюда доходит только исчерпание попыток
     - Пользователь заблокировал бота
     """
     bot: Optional[Bot] = None
     chat_id: Optional[int] = None
-    message_to_delete: Optional[Message] = None
 
     try:
         if isinstance(event, CallbackQuery):
-            message_to_delete = event.message
-            bot = message_to_delete.bot
-            chat_id = message_to_delete.chat.id
+            message = event.message
         elif isinstance(event, Message):
-            message_to_delete = event
-            bot = event.bot
-            chat_id = event.chat.id
+            message = event
         elif isinstance(event, Bot):
             # Режим: просто отправить (например, из health-check)
             logger.warning("clear_and_send получил Bot — удаление невозможно")
-            return
+            return None
         else:
-            return
-
-        # Попытка удалить сообщение
-        if message_to_delete:
-            try:
-                await message_to_delete.delete()
-            except TelegramBadRequest as e:
-                error_msg = str(e).lower()
-                if "message to delete not found" in error_msg:
-                    pass  # Нормально — сообщение уже удалено
-                elif "message can't be deleted" in error_msg:
-                    pass  # Бот не может удалить (например, старое сообщение)
-                else:
-                    logger.debug(f"[clear_and_send] Неизвестная ошибка удаления: {e}")
-
-        # Отправка нового сообщения
-        await bot.send_message(
-            chat_id=chat_id,
-            text=text,
-            reply_markup=reply_markup,
-            parse_mode=parse_mode
-        )
+            return None
+        bot = message.bot
+        chat_id = message.chat.id
+
+        if RENDER_MODE == "edit" and _can_edit(message, reply_markup):
+            edited = await _edit_in_place(message, text, reply_markup, parse_mode, photo)
+            if edited is not None:
+                return edited
+
+        return await _delete_and_send(message, text, reply_markup, parse_mode, photo)
 
     except TelegramForbiddenError:
         # Пользователь заблокировал бота
-        logger.debug(f"Бот заблокирован пользователем {chat_id}")
-        pass
+        logger.debug("Бот заблокирован пользователем %s", chat_id)
+    except TelegramRetryAfter as e:
+        # Планировщик уже повторял запрос с паузами — дальше ждать нет смысла
+        logger.warning(f"Flood limit для чата {chat_id}: повторы исчерпаны — {e}")
     except TelegramBadRequest as e:
         error_msg = str(e).lower()
-        if "retry after" in error_msg:
-            # Flood control: Too Many Requests
-            logger.warning(f"Flood limit: попробуйте позже — {e}")
-            # В продакшене можно поставить sleep, но здесь — просто игнор
-        elif "message is too long" in error_msg:
+        if "message is too long" in error_msg or "caption is too long" in error_msg:
             logger.error("Сообщение слишком длинное")
         else:
             logger.error(f"TelegramBadRequest при отправке: {e}")
@@ -87,8 +96,102 @@ async def clear_and_send(
                 await bot.send_message(chat_id, "🔄 Повторная попытка...")
         except:
             pass
+    return None
 
 
+def _can_edit(message: Message, reply_markup) -> bool:
+    """Редактировать можно только свои сообщения и только с inline-клавиатурой."""
+    own = message.from_user is not None and message.from_user.is_bot
+    return own and (reply_markup is None or isinstance(reply_markup, InlineKeyboardMarkup))
+
+
+async def _edit_in_place(
+    message: Message,
+    text: str,
+    reply_markup,
+    parse_mode: Optional[str],
+    photo: Optional[str],
+) -> Optional[Message]:
+    """
+    Редактирует сообщение под новый экран.
+    Возвращает None, если нужен фолбэк на удаление + отправку.
+    """
+    try:
+        if photo:
+            # Текст нельзя превратить в фото — только фото в фото
+            if not message.photo:
+                return None
+            strategy = "edit_media"
+            result = await message.edit_media(
+                InputMediaPhoto(media=photo, caption=text, parse_mode=parse_mode),
+                reply_markup=reply_markup,
+            )
+        else:
+            if message.text is None:
+                return None  # фото/медиа -> текст: только пересылкой
+            current = message.html_text if parse_mode == "HTML" else message.text
+            if current == text:
+                strategy = "edit_markup"
+                result = await message.edit_reply_markup(reply_markup=reply_markup)
+            else:
+                strategy = "edit_text"
+                result = await message.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e).lower():
+            # Экран уже такой (например, двойное нажатие) — ничего делать не нужно
+            _record_render("not_modified", 1)
+            return message
+        # Старое сообщение, удалено и т.п. — запрос потрачен, идём в фолбэк
+        logger.debug("[clear_and_send] Редактирование не удалось, отправляю заново: %s", e)
+        _record_render("edit_failed", 1)
+        return None
+
+    _record_render(strategy, 1)
+    return result if isinstance(result, Message) else message
+
+
+async def _delete_and_send(
+    message: Message,
+    text: str,
+    reply_markup,
+    parse_mode: Optional[str],
+    photo: Optional[str],
+) -> Message:
+    """Удаляет старое сообщение параллельно с отправкой нового."""
+
+    async def delete():
+        try:
+            await message.delete()
+        except TelegramBadRequest as e:
+            error_msg = str(e).lower()
+            if "message to delete not found" in error_msg:
+                pass  # Нормально — сообщение уже удалено
+            elif "message can't be deleted" in error_msg:
+                pass  # Бот не может удалить (например, старое сообщение)
+            else:
+                logger.debug("[clear_and_send] Неизвестная ошибка удаления: %s", e)
+        except TelegramForbiddenError:
+            pass  # Отправка ниже сообщит о блокировке
+
+    if photo:
+        send = message.bot.send_photo(
+            chat_id=message.chat.id,
+            photo=photo,
+            caption=text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode,
+        )
+    else:
+        send = message.bot.send_message(
+            chat_id=message.chat.id,
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode,
+        )
+    _, sent = await asyncio.gather(delete(), send)
+    _record_render("resend", 2)
+    return sent
+
 
 def get_similar_movies(movies, query: str, threshold: int = 75) -> List[str]:
     """
@@ -99,14 +202,9 @@ def get_similar_movies(movies, query: str, threshold: int = 75) -> List[str]:
     :param threshold: Порог схожести (0–100)
     :return: Список названий, отсортированных по релевантности
     """
-    query = query.lower().strip()
-    matches = []
-
-    for movie in movies:
-        title = str(movie["title"]).lower().strip()
-        similarity = fuzz.ratio(query, title)
-        if similarity >= threshold:
-            matches.append(movie["title"])  # Сохраняем оригинальное название
-
-    # Сортируем по убыванию схожести
-    return sorted(matches, key=lambda x: -fuzz.ratio(query, x.lower()))
\ No newline at end of file
+    titles = [movie["title"] for movie in movies]
+    query = normalize_for_match(query)
+    scored = score_titles(query, [normalize_for_match(title) for title in titles], threshold)
+    # Сортируем по убыванию схожести (оценка уже посчитана)
+    scored.sort(key=lambda match: -match[1])
+    return [titles[position] for position, _ in scored]
@@ -0,0 +1,258 @@
+"""
+Разбор файлов для импорта библиотеки (/import).
+
+Поддерживаются:
+- CSV с заголовком: свои столбцы (title/название, genre/жанр, description/описание,
+  watched/просмотрено), экспорт Letterboxd (Name, Year; watched.csv и diary.csv —
+  просмотренное) и IMDb (Title, Title Type, Year; ratings.csv — просмотренное);
+- CSV без заголовка: название в первом столбце, жанр — во втором;
+- TXT: одно название в строке;
+- JSON-массив строк или объектов и JSON Lines (одна запись в строке).
+
+Файл читается потоком: парсеры — генераторы, в памяти только текущая
+строка (для JSON — текущий элемент и буфер чтения). Кодировка — UTF-8,
+а если начало файла в ней не читается — cp1251 (CSV из Excel).
+"""
+
+import codecs
+import csv
+import json
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, Optional
+
+from movie_bot.keyboards.genre import GENRES
+
+# Жанр, если в файле его нет или он не распознан
+DEFAULT_GENRE = GENRES[0]
+# Максимальная длина названия; длиннее — обрезается
+MAX_TITLE_LENGTH = 200
+
+_READ_CHUNK = 64 * 1024
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Названия столбцов (и ключей JSON) в нижнем регистре
+_TITLE_KEYS = ("title", "name", "название", "original title")
+_GENRE_KEYS = ("genre", "жанр", "title type", "type")
+_DESCRIPTION_KEYS = ("description", "описание")
+_WATCHED_KEYS = ("watched", "просмотрено", "watched date")
+_YEAR_KEYS = ("year", "год")
+
+# Экспорты, в которых всё уже просмотрено
+_WATCHED_FILES = ("watched", "diary", "ratings", "reviews")
+
+_GENRE_ALIASES = {
+    "фильм": "Фильм", "movie": "Фильм", "film": "Фильм", "feature": "Фильм", "tvmovie": "Фильм",
+    "сериал": "Сериал", "series": "Сериал", "tvseries": "Сериал", "tvminiseries": "Сериал",
+    "show": "Сериал", "tv": "Сериал",
+    "аниме": "Аниме", "anime": "Аниме",
+    "мультфильм": "Мультфильм", "animation": "Мультфильм", "cartoon": "Мультфильм",
+}
+
+_FALSE_VALUES = {"", "0", "false", "no", "нет", "-"}
+
+
+class ImportFormatError(ValueError):
+    """Файл не удаётся разобрать как список фильмов."""
+
+
+@dataclass(slots=True)
+class ImportRow:
+    """Фильм из файла импорта (название уже очищено clean_title)."""
+    title: str
+    genre: str
+    description: Optional[str]
+    watched: int
+
+
+def clean_title(value: Any) -> str:
+    """Название без лишних пробелов и управляющих символов, не длиннее MAX_TITLE_LENGTH."""
+    title = _WHITESPACE_RE.sub(" ", str(value)).strip()
+    return title[:MAX_TITLE_LENGTH].rstrip()
+
+
+def _map_genre(value: Any) -> str:
+    key = re.sub(r"[\s_-]+", "", str(value or "")).casefold()
+    return _GENRE_ALIASES.get(key, DEFAULT_GENRE)
+
+
+def _is_watched(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    # Непустая дата («Watched Date») — тоже просмотрено
+    return str(value if value is not None else "").strip().casefold() not in _FALSE_VALUES
+
+
+def _make_row(fields: Dict[str, Any], watched_default: bool) -> Optional[ImportRow]:
+    """Строка импорта из словаря «ключ в нижнем регистре → значение» (None — без названия)."""
+    def first(keys):
+        for key in keys:
+            value = fields.get(key)
+            if value not in (None, ""):
+                return value
+        return None
+
+    title = clean_title(first(_TITLE_KEYS) or "")
+    if not title:
+        return None
+    description = first(_DESCRIPTION_KEYS)
+    if description is None:
+        year = first(_YEAR_KEYS)
+        description = f"Год: {year}" if year is not None else None
+    watched = first(_WATCHED_KEYS)
+    return ImportRow(
+        title=title,
+        genre=_map_genre(first(_GENRE_KEYS)),
+        description=str(description).strip() if description is not None else None,
+        watched=int(_is_watched(watched) if watched is not None else watched_default),
+    )
+
+
+# === CSV ===
+
+def _iter_csv(stream: IO[str], watched_default: bool) -> Iterator[Optional[ImportRow]]:
+    sample = stream.read(_READ_CHUNK)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    stream.seek(0)
+    reader = csv.reader(stream, dialect)
+
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [cell.strip().casefold() for cell in header]
+    if any(column in _TITLE_KEYS for column in columns):
+        for cells in reader:
+            if any(cells):
+                yield _make_row(dict(zip(columns, cells)), watched_default)
+        return
+
+    # Без заголовка: первая строка — тоже данные
+    for cells in chain([header], reader):
+        if not any(cells):
+            continue
+        fields = {"title": cells[0]}
+        if len(cells) > 1:
+            fields["genre"] = cells[1]
+        yield _make_row(fields, watched_default)
+
+
+def _iter_lines(stream: IO[str], watched_default: bool) -> Iterator[Optional[ImportRow]]:
+    """Простой текст: строка — название целиком (запятые в названиях не делят его на столбцы)."""
+    for line in stream:
+        if line.strip():
+            yield _make_row({"title": line}, watched_default)
+
+
+# === JSON ===
+
+def _item_row(item: Any, watched_default: bool) -> Optional[ImportRow]:
+    if isinstance(item, str):
+        return _make_row({"title": item}, watched_default)
+    if isinstance(item, dict):
+        return _make_row({str(k).strip().casefold(): v for k, v in item.items()}, watched_default)
+    return None
+
+
+def _iter_json_array(stream: IO[str], watched_default: bool) -> Iterator[Optional[ImportRow]]:
+    """Элементы JSON-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(_READ_CHUNK).lstrip()
+    if not buffer.startswith("["):
+        raise ImportFormatError("ожидался JSON-массив")
+    pos = 1
+    eof = False
+    while True:
+        # Пропускаем пробелы и запятые между элементами, подчитывая файл
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = stream.read(_READ_CHUNK), 0
+            eof = not buffer
+        if pos >= len(buffer):
+            raise ImportFormatError("JSON-массив не закрыт")
+        if buffer[pos] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Элемент не поместился в буфер — дочитываем
+            more = stream.read(_READ_CHUNK)
+            if not more:
+                raise ImportFormatError("повреждённый JSON")
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        yield _item_row(item, watched_default)
+        pos = end
+        if pos > _READ_CHUNK:
+            buffer, pos = buffer[pos:], 0
+
+
+def _iter_json_lines(stream: IO[str], watched_default: bool) -> Iterator[Optional[ImportRow]]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        yield _item_row(item, watched_default)
+
+
+# === Открытие файла ===
+
+def _detect_encoding(path: Path) -> str:
+    with open(path, "rb") as raw:
+        head = raw.read(_READ_CHUNK)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        # final=False: многобайтный символ на границе образца — не ошибка
+        decoder.decode(head, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+
+def _first_char(stream: IO[str]) -> str:
+    while True:
+        char = stream.read(1)
+        if not char or not char.isspace():
+            return char
+
+
+@contextmanager
+def open_import(path: Path, file_name: str = "") -> Iterator[Iterator[Optional[ImportRow]]]:
+    """
+    Открывает файл импорта и возвращает поток строк.
+    None в потоке — запись, которую не удалось разобрать (нет названия и т.п.).
+
+    :param path: Путь к скачанному файлу
+    :param file_name: Исходное имя файла: расширение и подсказка «просмотрено» (watched.csv)
+    :raises ImportFormatError: Файл не похож на поддерживаемый формат
+    """
+    name = Path(file_name or path.name)
+    watched_default = name.stem.casefold() in _WATCHED_FILES
+    with open(path, "r", encoding=_detect_encoding(path), errors="replace", newline="") as stream:
+        first = _first_char(stream)
+        stream.seek(0)
+        if name.suffix.casefold() in (".json", ".jsonl", ".ndjson") or first in ("[", "{"):
+            if first == "[":
+                yield _iter_json_array(stream, watched_default)
+            elif first == "{":
+                yield _iter_json_lines(stream, watched_default)
+            else:
+                raise ImportFormatError("ожидался JSON-массив или JSON Lines")
+        elif name.suffix.casefold() == ".txt":
+            yield _iter_lines(stream, watched_default)
+        else:
+            yield _iter_csv(stream, watched_default)
@@ -1,64 +1,207 @@
 """
 Настройка логирования.
+
+Вызов logger.info() в обработчике не должен писать на диск в потоке event loop.
+Поэтому у логгера пакета movie_bot один обработчик — QueueHandler: запись
+кладётся в ограниченную очередь, а форматирование, запись в файл (с ротацией)
+и в консоль делает QueueListener в фоновом потоке. Slow-лог трейсов
+(movie_bot.slow_updates) идёт через ту же очередь в свой файл SLOW_LOG_FILE.
+Если очередь переполнена,
+запись отбрасывается и учитывается в счётчике (log_pipeline_dropped_total).
+
+Формат: LOG_FORMAT=text (по умолчанию) или json — JSON Lines с trace_id
+обрабатываемого обновления (см. utils/tracing.py).
+Замер задержек event loop до и после: scripts/bench_logging.py.
 """
 
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from movie_bot.config import LOGS_DIR
+from typing import Dict, List, Optional
+
+from movie_bot.config import LOGS_DIR, LOG_FORMAT, LOG_QUEUE_SIZE, SLOW_LOG_FILE
+from movie_bot.utils.metrics import REGISTRY
+from movie_bot.utils.tracing import SLOW_LOGGER, current_trace_id
 
 
 # Уровень логирования
 LOG_LEVEL = logging.DEBUG if os.getenv("DEBUG") else logging.INFO
 
+# Логгер пакета: дочерние (movie_bot.handlers.* и т.п.) передают ему записи
+PACKAGE_LOGGER = "movie_bot"
 
-def setup_logger(name: str = "movie_bot", log_file: Path = None) -> logging.Logger:
-    """
-    Настраивает и возвращает отдельный логгер.
+_DATEFMT = "%Y-%m-%d %H:%M:%S"
 
-    :param name: Имя логгера (обычно __name__)
-    :param log_file: Путь к файлу лога. Если None — используется LOGS_DIR / "bot.log"
-    :return: Настроенный логгер
-    """
-    logger = logging.getLogger(name)
-    
-    # Избегаем дублирования хэндлеров
-    if logger.handlers:
-        return logger
 
-    logger.setLevel(LOG_LEVEL)
-    logger.propagate = False  # Не передавать родительским
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, _DATEFMT),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": record.funcName,
+            "msg": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            payload["trace_id"] = trace_id
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
 
-    # Формат
-    formatter = logging.Formatter(
+def _make_formatter(fmt: str) -> logging.Formatter:
+    if fmt == "json":
+        return JsonFormatter()
+    return logging.Formatter(
         fmt="%(asctime)s | %(name)s | %(levelname)s | %(funcName)s | %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
+        datefmt=_DATEFMT
+    )
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в вызывающем потоке и без блокировок:
+    при заполненной очереди запись отбрасывается.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Подстановка аргументов и форматирование — в потоке QueueListener.
+        # Здесь только то, что зависит от контекста вызова
+        record.trace_id = current_trace_id()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+def _is_slow_record(record: logging.LogRecord) -> bool:
+    return record.name == SLOW_LOGGER
+
+
+def _rotating_file(path: Path) -> RotatingFileHandler:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return RotatingFileHandler(
+        path,
+        maxBytes=5 * 1024 * 1024,  # 5 MB
+        backupCount=3,
+        encoding="utf-8"  # ✅ Поддержка кириллицы
     )
 
-    # Убедимся, что папка существует
-    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-
-    # Файл лога
-    log_file = log_file or (LOGS_DIR / "bot.log")
-    try:
-        file_handler = RotatingFileHandler(
-            log_file,
-            maxBytes=5 * 1024 * 1024,  # 5 MB
-            backupCount=3,
-            encoding="utf-8"  # ✅ Поддержка кириллицы
+
+class LogPipeline:
+    """
+    Очередь + фоновый поток с файловым и консольным обработчиками.
+    Если задан slow_log_file, записи slow-лога пишутся только в него (строка JSON как есть).
+    """
+
+    def __init__(self, log_file: Path, fmt: str = "text", maxsize: int = 10000, slow_log_file: Optional[Path] = None):
+        self.log_file = log_file
+        self.handler = BoundedQueueHandler(maxsize)
+        formatter = _make_formatter(fmt)
+
+        handlers: List[logging.Handler] = []
+        try:
+            file_handler = _rotating_file(log_file)
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+        except Exception as e:
+            print(f"❌ Не удалось создать файл лога {log_file}: {e}")
+
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+        if slow_log_file is not None:
+            for handler in handlers:
+                handler.addFilter(lambda record: not _is_slow_record(record))
+            try:
+                slow_handler = _rotating_file(slow_log_file)
+                slow_handler.setFormatter(logging.Formatter("%(message)s"))
+                slow_handler.addFilter(_is_slow_record)
+                handlers.append(slow_handler)
+            except Exception as e:
+                print(f"❌ Не удалось создать файл лога {slow_log_file}: {e}")
+
+        self.listener = QueueListener(self.handler.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        self._running = True
+
+    def stop(self):
+        """Дописывает очередь и останавливает поток (повторный вызов безопасен)."""
+        if self._running:
+            self._running = False
+            self.listener.stop()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self.handler.queue.qsize(),
+            "enqueued": self.handler.enqueued,
+            "dropped": self.handler.dropped,
+        }
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def get_pipeline(log_file: Path = None) -> LogPipeline:
+    """Возвращает конвейер логирования, запуская его при первом обращении."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline(
+            log_file or (LOGS_DIR / "bot.log"),
+            fmt=LOG_FORMAT,
+            maxsize=LOG_QUEUE_SIZE,
+            slow_log_file=SLOW_LOG_FILE,
         )
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    except Exception as e:
-        print(f"❌ Не удалось создать файл лога {log_file}: {e}")
+        atexit.register(_pipeline.stop)
+    return _pipeline
 
-    # Консоль
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
-    return logger
+def shutdown_logging():
+    """Дописывает накопленные записи. Вызывать при остановке бота."""
+    if _pipeline is not None:
+        _pipeline.stop()
+
+
+def setup_logger(name: str = PACKAGE_LOGGER, log_file: Path = None) -> logging.Logger:
+    """
+    Настраивает и возвращает логгер.
+
+    Обработчик очереди ставится на логгер пакета movie_bot (и на логгеры вне пакета,
+    например __main__); дочерние логгеры передают записи ему.
+
+    :param name: Имя логгера (обычно __name__)
+    :param log_file: Путь к файлу лога. Если None — используется LOGS_DIR / "bot.log".
+                     Учитывается только при первом вызове: конвейер один на процесс
+    :return: Настроенный логгер
+    """
+    pipeline = get_pipeline(log_file)
+
+    in_package = name == PACKAGE_LOGGER or name.startswith(PACKAGE_LOGGER + ".")
+    target = logging.getLogger(PACKAGE_LOGGER if in_package else name)
+    # Избегаем дублирования хэндлеров
+    if pipeline.handler not in target.handlers:
+        target.setLevel(LOG_LEVEL)
+        target.propagate = False  # Не передавать родительским
+        target.addHandler(pipeline.handler)
+
+    return logging.getLogger(name)
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -66,4 +209,14 @@ def get_logger(name: str) -> logging.Logger:
     Возвращает настроенный логгер по имени.
     Автоматически вызывает setup_logger при первом обращении.
     """
-    return setup_logger(name)
\ No newline at end of file
+    return setup_logger(name)
+
+
+def get_log_stats() -> Dict[str, float]:
+    """Метрики конвейера логирования (пустой словарь, если он не запускался)."""
+    if _pipeline is None:
+        return {}
+    return _pipeline.stats()
+
+
+REGISTRY.register_stats("log_pipeline", get_log_stats, counters=("enqueued", "dropped"))
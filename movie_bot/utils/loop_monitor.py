@@ -0,0 +1,156 @@
+"""
+Мониторинг задержек event loop.
+
+Бот — один процесс asyncio: синхронная работа в обработчике (нечёткий поиск,
+большой fetchall(), запись на диск) останавливает всех пользователей сразу.
+
+- Задача в event loop «тикает» каждые LOOP_MONITOR_INTERVAL_MS и пишет,
+  насколько опоздал тик, в гистограмму bot_event_loop_lag_seconds.
+- Сторожевой поток следит за последним тиком. Если loop не отвечает дольше
+  LOOP_BLOCK_THRESHOLD_MS, он снимает стек потока event loop прямо во время
+  блокировки и пишет его в лог (WARNING) — видно, какой обработчик или
+  функция держит loop. Один стек на одну блокировку.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional
+
+from movie_bot.config import LOOP_BLOCK_THRESHOLD_MS, LOOP_MONITOR_ENABLED, LOOP_MONITOR_INTERVAL_MS
+from movie_bot.utils.metrics import LOOP_LAG, LOOP_STALLS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Кадров стека в записи о блокировке (самые глубокие)
+STACK_LIMIT = 30
+
+
+class LoopMonitor:
+    """
+    Замер задержек event loop и захват стека при блокировке.
+
+    :param interval: Период тиков, сек
+    :param threshold: Сколько loop может не отвечать, прежде чем снять стек, сек
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25):
+        self.interval = interval
+        self.threshold = threshold
+
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        # Момент, к которому ожидается следующий тик (time.monotonic)
+        self._expected = 0.0
+        # Блокировка, для которой стек уже снят (значение _expected)
+        self._captured_for: Optional[float] = None
+
+        # Метрики
+        self._lag_max = 0.0
+
+    def start(self):
+        """Запускает тики в текущем event loop и сторожевой поток."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._expected = time.monotonic() + self.interval
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._tick(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    # === Тики (в event loop) ===
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - self._expected)
+            self._expected = now + self.interval
+            LOOP_LAG.observe(lag)
+            if lag > self._lag_max:
+                self._lag_max = lag
+            if lag >= self.threshold:
+                logger.warning("Event loop был заблокирован %.0f мс", lag * 1000)
+
+    # === Сторожевой поток ===
+
+    def _watch(self):
+        period = min(self.interval, self.threshold) / 2
+        while not self._stopped.wait(period):
+            expected = self._expected
+            if expected == self._captured_for:
+                continue
+            blocked = time.monotonic() - expected
+            if blocked >= self.threshold:
+                self._captured_for = expected
+                LOOP_STALLS.inc()
+                stack = self._loop_stack()
+                logger.warning(
+                    "Event loop не отвечает %.0f мс, стек потока event loop:\n%s", blocked * 1000, stack
+                )
+
+    def _loop_stack(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return "<стек недоступен>"
+        return "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+
+    # === Метрики ===
+
+    def stats(self) -> Dict[str, float]:
+        """Снимок метрик монитора."""
+        return {
+            "lag_max_seconds": self._lag_max,
+            "current_block_seconds": max(0.0, time.monotonic() - self._expected) if self._task else 0.0,
+        }
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def start_loop_monitor() -> Optional[LoopMonitor]:
+    """Запускает мониторинг в текущем event loop (None — выключен в конфиге)."""
+    global _monitor
+    if not LOOP_MONITOR_ENABLED:
+        return None
+    if _monitor is None:
+        _monitor = LoopMonitor(
+            interval=LOOP_MONITOR_INTERVAL_MS / 1000,
+            threshold=LOOP_BLOCK_THRESHOLD_MS / 1000,
+        )
+    _monitor.start()
+    return _monitor
+
+
+async def stop_loop_monitor():
+    if _monitor is not None:
+        await _monitor.stop()
+
+
+def get_loop_monitor_stats() -> Dict[str, float]:
+    """Метрики монитора (пустой словарь, если он не запускался)."""
+    if _monitor is None:
+        return {}
+    return _monitor.stats()
+
+
+REGISTRY.register_stats("bot_event_loop", get_loop_monitor_stats)
@@ -0,0 +1,383 @@
+"""
+Метрики в формате Prometheus (text exposition 0.0.4) без внешних зависимостей.
+
+Рассчитано на постоянную работу в проде:
+- дочерние серии (набор значений меток) создаются один раз и кэшируются,
+  горячий путь держит ссылку на готовую серию;
+- гистограмма — заранее выделенный список счётчиков по корзинам,
+  наблюдение = bisect + два сложения, без аллокаций;
+- «снимочные» метрики (пул БД, кэш, конвейер записи) не обновляются
+  на каждом вызове, а читаются из их stats() при запросе /metrics.
+"""
+
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from movie_bot.utils.tracing import traced
+
+# Корзины задержек, сек: от 1 мс до 10 с
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Общая часть: имя, описание, метки и кэш дочерних серий."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """
+        Возвращает серию для значений меток (создаёт при первом обращении).
+        На горячем пути серию стоит получить один раз и сохранить.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}, получено {values}")
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Монотонный счётчик."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        """Увеличивает счётчик без меток."""
+        self._children[()].inc(amount)
+
+    def _render_child(self, values, child: _CounterChild) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * len(bounds)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        # Первая корзина с границей >= value (семантика le); последняя граница — +Inf
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> "_Timer":
+        """Контекстный менеджер, замеряющий длительность блока."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+        return False
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными корзинами."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self._bounds = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self._bounds)
+
+    def observe(self, value: float):
+        """Наблюдение для гистограммы без меток."""
+        self._children[()].observe(value)
+
+    def _render_child(self, values, child: _HistogramChild) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self._bounds, list(child._counts)):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _StatsCollector:
+    """
+    Метрики из словаря stats(): значения читаются при каждом запросе /metrics.
+    Ключи из `counters` отдаются как counter (с суффиксом _total), остальные — как gauge.
+    """
+
+    def __init__(self, prefix: str, source: Callable[[], Dict[str, float]], counters: Iterable[str] = ()):
+        self.prefix = prefix
+        self.source = source
+        self.counters = frozenset(counters)
+
+    def render(self) -> List[str]:
+        try:
+            stats = self.source()
+        except Exception:
+            return []
+        lines = []
+        for key, value in stats.items():
+            if not isinstance(value, (int, float)):
+                continue
+            if key in self.counters:
+                name = f"{self.prefix}_{key}" if key.endswith("_total") else f"{self.prefix}_{key}_total"
+                kind = "counter"
+            else:
+                name, kind = f"{self.prefix}_{key}", "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_format_value(float(value))}")
+        return lines
+
+
+class _LabeledStatsCollector:
+    """
+    Как _StatsCollector, но источник отдаёт {значение метки: stats()} —
+    например, метрики каждого воркера с меткой worker="0".
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        labelname: str,
+        source: Callable[[], Dict[str, Dict[str, float]]],
+        counters: Iterable[str] = (),
+    ):
+        self.prefix = prefix
+        self.labelname = labelname
+        self.source = source
+        self.counters = frozenset(counters)
+
+    def render(self) -> List[str]:
+        try:
+            groups = self.source()
+        except Exception:
+            return []
+        series: Dict[str, List[str]] = {}
+        kinds: Dict[str, str] = {}
+        for label, stats in groups.items():
+            labels = _format_labels((self.labelname,), (label,))
+            for key, value in stats.items():
+                if not isinstance(value, (int, float)):
+                    continue
+                if key in self.counters:
+                    name = f"{self.prefix}_{key}" if key.endswith("_total") else f"{self.prefix}_{key}_total"
+                    kinds[name] = "counter"
+                else:
+                    name = f"{self.prefix}_{key}"
+                    kinds[name] = "gauge"
+                series.setdefault(name, []).append(f"{name}{labels} {_format_value(float(value))}")
+        lines = []
+        for name, samples in series.items():
+            lines.append(f"# TYPE {name} {kinds[name]}")
+            lines.extend(samples)
+        return lines
+
+
+class Registry:
+    """Набор метрик, отдаваемых одним /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика уже зарегистрирована: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_stats(self, prefix: str, source: Callable[[], Dict[str, float]], counters: Iterable[str] = ()):
+        """Подключает словарь stats() компонента (пул БД, кэш и т.п.)."""
+        collector = _StatsCollector(prefix, source, counters)
+        self._metrics[f"stats:{prefix}"] = collector
+        return collector
+
+    def register_labeled_stats(
+        self,
+        prefix: str,
+        labelname: str,
+        source: Callable[[], Dict[str, Dict[str, float]]],
+        counters: Iterable[str] = (),
+    ):
+        """Подключает stats() набора однотипных компонентов (воркеры и т.п.) с меткой `labelname`."""
+        collector = _LabeledStatsCollector(prefix, labelname, source, counters)
+        self._metrics[f"stats:{prefix}"] = collector
+        return collector
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный реестр
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# === Общие метрики ===
+
+UPDATE_LATENCY = REGISTRY.histogram(
+    "bot_update_duration_seconds", "Полное время обработки обновления", ("event_type",)
+)
+UPDATES_UNHANDLED = REGISTRY.counter(
+    "bot_updates_unhandled_total", "Обновления, для которых не нашлось обработчика", ("event_type",)
+)
+HANDLER_LATENCY = REGISTRY.histogram(
+    "bot_handler_duration_seconds", "Время работы обработчика aiogram", ("handler",)
+)
+HANDLER_ERRORS = REGISTRY.counter(
+    "bot_handler_errors_total", "Исключения в обработчиках aiogram", ("handler",)
+)
+QUERY_LATENCY = REGISTRY.histogram(
+    "db_query_duration_seconds", "Время выполнения функций database/queries.py", ("query",)
+)
+QUERY_ERRORS = REGISTRY.counter(
+    "db_query_errors_total", "Исключения в функциях database/queries.py", ("query",)
+)
+TELEGRAM_API_LATENCY = REGISTRY.histogram(
+    "telegram_api_duration_seconds", "Время запросов к Bot API", ("method",)
+)
+TELEGRAM_API_ERRORS = REGISTRY.counter(
+    "telegram_api_errors_total", "Ошибки запросов к Bot API", ("method", "error")
+)
+LOOP_LAG = REGISTRY.histogram(
+    "bot_event_loop_lag_seconds", "Опоздание тиков event loop (время, на которое loop был занят)"
+)
+LOOP_STALLS = REGISTRY.counter(
+    "bot_event_loop_stalls_total", "Блокировки event loop дольше LOOP_BLOCK_THRESHOLD_MS (со снятым стеком)"
+)
+CPU_TASK_LATENCY = REGISTRY.histogram(
+    "bot_cpu_task_duration_seconds", "Время CPU-задач (нечёткий поиск и т.п.): на месте или в пуле", ("task", "path")
+)
+CPU_TASK_FALLBACKS = REGISTRY.counter(
+    "bot_cpu_task_fallbacks_total", "CPU-задачи, посчитанные на месте из-за сломанного пула", ("task",)
+)
+RENDER_TOTAL = REGISTRY.counter(
+    "bot_render_total", "Смены экрана через clear_and_send по способу отрисовки", ("strategy",)
+)
+RENDER_API_CALLS = REGISTRY.counter(
+    "bot_render_api_calls_total", "Запросы к Bot API, сделанные clear_and_send, по способу отрисовки", ("strategy",)
+)
+
+
+def render_metrics() -> str:
+    """Текст для ответа /metrics."""
+    return REGISTRY.render()
+
+
+def timed(histogram: Histogram, errors: Optional[Counter], *labels: str):
+    """
+    Декоратор для async-функций: длительность в `histogram`, исключения — в `errors`.
+    Серии выбираются один раз при декорировании.
+    """
+    latency = histogram.labels(*labels)
+    failures = errors.labels(*labels) if errors is not None else None
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                if failures is not None:
+                    failures.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def timed_query(func):
+    """
+    Декоратор для функций database/queries.py (метка query = имя функции).
+    Вызов внутри обработки обновления попадает и в трейс (спан "db").
+    """
+    return timed(QUERY_LATENCY, QUERY_ERRORS, func.__name__)(traced("db", func.__name__)(func))
@@ -5,6 +5,7 @@
 
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
+from movie_bot.database import get_movies_by_ids
 from movie_bot.utils.helpers import clear_and_send
 from movie_bot.config import ITEMS_PER_PAGE
 from movie_bot.utils.text_builder import TextBuilder
@@ -12,7 +13,7 @@ from movie_bot.utils.text_builder import TextBuilder
 
 async def send_movie_page(
     callback,
-    movies: list,
+    page_data: dict,
     page: int,
     view: str,
     items_per_page: int = None
@@ -21,19 +22,18 @@ async def send_movie_page(
     Показывает страницу фильмов с пагинацией.
 
     :param callback: CallbackQuery
-    :param movies: Список фильмов
-    :param page: Номер страницы (0..N)
+    :param page_data: Результат get_movies_page (items, total, next_cursor, prev_cursor)
+    :param page: Номер страницы (0..N) — только для отображения
     :param view: 'watched', 'unwatched'
     :param items_per_page: Количество элементов на странице (по умолчанию из config)
     """
     if items_per_page is None:
         items_per_page = ITEMS_PER_PAGE
 
-    total = len(movies)
-    total_pages = (total + items_per_page - 1) // items_per_page
-    start = page * items_per_page
-    end = start + items_per_page
-    page_items = movies[start:end]
+    total = page_data["total"]
+    total_pages = max((total + items_per_page - 1) // items_per_page, 1)
+    page = min(max(page, 0), total_pages - 1)
+    page_items = page_data["items"]
 
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
 
@@ -46,17 +46,17 @@ async def send_movie_page(
             )
         ])
 
-    # Навигация
+    # Навигация: курсор соседней страницы зашит в callback_data
     nav_row = []
-    if page > 0:
+    if page_data["prev_cursor"]:
         nav_row.append(InlineKeyboardButton(
             text="◀️ Назад",
-            callback_data=f"prev:{view}:{page}"
+            callback_data=f"prev:{view}:{page}:{page_data['prev_cursor']}"
         ))
-    if page < total_pages - 1:
+    if page_data["next_cursor"]:
         nav_row.append(InlineKeyboardButton(
             text="Вперёд ▶️",
-            callback_data=f"next:{view}:{page}"
+            callback_data=f"next:{view}:{page}:{page_data['next_cursor']}"
         ))
     if nav_row:
         keyboard.inline_keyboard.append(nav_row)
@@ -87,28 +87,29 @@ async def send_movie_page(
 
 async def send_search_page(
     message,
-    results: list,
+    movie_ids: list,
     page: int,
     state: FSMContext,
     items_per_page: int = None
 ):
     """
     Показывает страницу результатов поиска с пагинацией.
+    Из базы читаются только строки текущей страницы.
 
     :param message: Message (для ответа)
-    :param results: Список найденных фильмов
+    :param movie_ids: id найденных фильмов (из FSM, в порядке релевантности)
     :param page: Номер страницы
-    :param state: FSMContext (для получения запроса)
+    :param state: FSMContext (для получения запроса и пользователя)
     :param items_per_page: Элементов на странице
     """
     if items_per_page is None:
         items_per_page = ITEMS_PER_PAGE
 
-    total = len(results)
+    total = len(movie_ids)
     total_pages = (total + items_per_page - 1) // items_per_page
     start = page * items_per_page
     end = start + items_per_page
-    page_items = results[start:end]
+    page_items = await get_movies_by_ids(state.key.user_id, movie_ids[start:end])
 
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
 
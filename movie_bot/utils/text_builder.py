@@ -129,6 +129,8 @@ class TextBuilder:
 🎬 /add — Добавить контент
 🎯 /recommend — Получить рекомендацию  
 📂 /my_movies — Мой контент  
+📥 /import — Импорт списка из файла (Letterboxd, IMDb, CSV, JSON)
+📤 /export — Выгрузить список в файл (CSV; /export json — JSON Lines)
 🔄 /restart — Перезапустить   
 ℹ️ /help — Показать это сообщение
 
@@ -239,6 +241,10 @@ class TextBuilder:
     def confirm_duplicate(title: str) -> str:
         return f"⚠️ Контент <i>«{title}»</i> уже есть в библиотеке.\n\nДобавить повторно?"
 
+    @staticmethod
+    def err_duplicate_title(title: str) -> str:
+        return f"⚠️ Контент <i>«{title}»</i> уже есть в библиотеке."
+
     @staticmethod
     def err_title_empty() -> str:
         return "❌ Название не может быть пустым."
@@ -336,6 +342,73 @@ class TextBuilder:
             f"{description}"
         )
 
+    # 📥 Импорт
+    @staticmethod
+    def import_prompt(max_mb: int) -> str:
+        return (
+            "📥 <b>Импорт списка</b>\n\n"
+            "Отправьте файл со списком фильмов:\n"
+            "• CSV — экспорт Letterboxd (watchlist.csv, watched.csv) или IMDb, "
+            "либо своя таблица со столбцами <code>title</code>, <code>genre</code>, "
+            "<code>description</code>, <code>watched</code>;\n"
+            "• TXT — одно название в строке;\n"
+            "• JSON — массив названий или объектов с теми же полями.\n\n"
+            f"Размер файла — до {max_mb} МБ. Фильмы, которые уже есть в списке, пропускаются."
+        )
+
+    @staticmethod
+    def import_progress(processed: int, added: int) -> str:
+        return (
+            f"⏳ Импорт… Обработано: <b>{processed}</b> "
+            f"{pluralize(processed, ('строка', 'строки', 'строк'))}, добавлено: <b>{added}</b>."
+        )
+
+    @staticmethod
+    def import_done(added: int, duplicates: int, invalid: int, truncated_at: Optional[int] = None) -> str:
+        lines = [
+            "✅ <b>Импорт завершён</b>\n",
+            f"➕ Добавлено: <b>{added}</b>",
+            f"🔁 Уже были в списке: <b>{duplicates}</b>",
+        ]
+        if invalid:
+            lines.append(f"⚠️ Пропущено (нет названия или ошибка формата): <b>{invalid}</b>")
+        if truncated_at:
+            lines.append(f"✂️ Файл обработан не полностью: лимит — {truncated_at} строк.")
+        return "\n".join(lines)
+
+    @staticmethod
+    def err_import_not_document() -> str:
+        return "❌ Отправьте файл (CSV, TXT или JSON) как документ."
+
+    @staticmethod
+    def err_import_too_large(max_mb: int) -> str:
+        return f"❌ Файл слишком большой. Максимум — {max_mb} МБ."
+
+    @staticmethod
+    def err_import_running() -> str:
+        return "⏳ Предыдущий импорт ещё идёт. Дождитесь его завершения."
+
+    @staticmethod
+    def err_import_format(details: str) -> str:
+        return f"❌ Не удалось разобрать файл: {details}."
+
+    @staticmethod
+    def err_import_failed(added: int) -> str:
+        return f"❌ Импорт прерван из-за ошибки. Успели добавить: {added}."
+
+    # 📤 Выгрузка
+    @staticmethod
+    def export_done(count: int) -> str:
+        return f"📤 Ваш список: <b>{count}</b> {pluralize(count, ('позиция', 'позиции', 'позиций'))}."
+
+    @staticmethod
+    def err_export_format() -> str:
+        return "❌ Формат не поддерживается. Используйте <code>/export</code> (CSV) или <code>/export json</code>."
+
+    @staticmethod
+    def err_export_failed() -> str:
+        return "❌ Не удалось выгрузить список. Попробуйте позже."
+
     # 🔄 Перезапуск
     @staticmethod
     def restart_successful() -> str:
@@ -1,3 +1,9 @@
+import re
+
+# Всё, что не буква и не цифра (пунктуация, пробелы, подчёркивания)
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
 def pluralize(value: int, forms: tuple) -> str:
     """
     Склонение существительных по числам.
@@ -13,4 +19,32 @@ def pluralize(value: int, forms: tuple) -> str:
         return forms[0]
     if value in (2, 3, 4):
         return forms[1]
-    return forms[2]
\ No newline at end of file
+    return forms[2]
+
+
+def normalize_title(title: str) -> str:
+    """
+    Нормализованное название для сравнения и уникальности.
+
+    Unicode casefold, «ё» → «е», пунктуация и пробелы схлопываются в один пробел.
+    Пример: normalize_title("  Ёлки-2! ") → "елки 2"
+    """
+    folded = str(title).casefold().replace("ё", "е")
+    normalized = _NON_WORD_RE.sub(" ", folded).strip()
+    # Название из одних знаков препинания не должно схлопнуться в пустую строку
+    return normalized or folded.strip()
+
+
+# Метка дубликата в title_norm: «матрица #ID12». normalize_title делает casefold,
+# поэтому заглавных латинских букв в его результате не бывает (даже у названий
+# из одной пунктуации вроде «#1»), и метка не совпадает с настоящими названиями
+DUPLICATE_MARK = " #ID"
+
+
+def duplicate_title_norm(normalized: str, movie_id: int) -> str:
+    """
+    title_norm для старой строки, совпавшей после нормализации с другой строкой
+    того же пользователя: уникален (по id) и находится поиском по подстроке.
+    Пример: duplicate_title_norm("матрица", 12) → "матрица #ID12"
+    """
+    return f"{normalized}{DUPLICATE_MARK}{movie_id}"
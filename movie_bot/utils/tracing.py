@@ -0,0 +1,201 @@
+"""
+Трассировка обработки обновлений.
+
+Каждое обновление получает trace id и дерево спанов: обработчик,
+запросы к БД, вызовы Bot API. Текущий трейс и спан хранятся
+в contextvars, поэтому вложенность собирается сама — без передачи
+контекста через аргументы.
+
+Трейс записывается в отдельный slow-лог (JSON Lines), если обновление
+обрабатывалось дольше TRACE_SLOW_THRESHOLD_MS, либо если оно попало
+в выборку TRACE_SAMPLE_RATE.
+"""
+
+import json
+import logging
+import secrets
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """Отрезок работы внутри трейса."""
+
+    __slots__ = ("kind", "name", "started", "finished", "children", "error")
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.children: List["Span"] = []
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "kind": self.kind,
+            "name": self.name,
+            "start_ms": round((self.started - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class Trace:
+    """Трейс одного обновления: корневой спан и атрибуты."""
+
+    __slots__ = ("trace_id", "root", "attrs", "sampled")
+
+    def __init__(self, name: str, sampled: bool = False, **attrs):
+        self.trace_id = secrets.token_hex(8)
+        self.root = Span("update", name)
+        self.attrs = attrs
+        self.sampled = sampled
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **self.attrs,
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "sampled": self.sampled,
+            "spans": self.root.to_dict(self.root.started),
+        }
+
+
+class _SpanContext:
+    """Контекстный менеджер спана (sync и async)."""
+
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, kind: str, name: str):
+        parent = _current_span.get()
+        self._span = Span(kind, name)
+        parent.children.append(self._span)
+        self._token = _current_span.set(self._span)
+
+    def __enter__(self) -> Span:
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        self._span.finished = time.perf_counter()
+        if exc_type is not None:
+            self._span.error = exc_type.__name__
+        _current_span.reset(self._token)
+        return False
+
+    async def __aenter__(self) -> Span:
+        return self._span
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class _NoopSpan:
+    """Заглушка вне трейса: ничего не записывает."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(kind: str, name: str):
+    """
+    Открывает дочерний спан текущего трейса.
+    Вне обработки обновления возвращает заглушку без затрат.
+
+    Пример:
+        with span("db", "get_user_stats"):
+            ...
+    """
+    if _current_span.get() is None:
+        return _NOOP
+    return _SpanContext(kind, name)
+
+
+def traced(kind: str, name: Optional[str] = None):
+    """Декоратор для async-функций: вызов оформляется спаном."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await func(*args, **kwargs)
+            with _SpanContext(kind, span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace_id() -> Optional[str]:
+    """trace id обрабатываемого обновления (None вне обработки)."""
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def start_trace(trace: Trace):
+    """Делает трейс текущим. Возвращает токены для finish_trace()."""
+    return _current_trace.set(trace), _current_span.set(trace.root)
+
+
+def finish_trace(trace: Trace, tokens, error: Optional[str] = None):
+    """Закрывает корневой спан и восстанавливает контекст."""
+    trace.root.finished = time.perf_counter()
+    if error:
+        trace.root.error = error
+    trace_token, span_token = tokens
+    _current_span.reset(span_token)
+    _current_trace.reset(trace_token)
+
+
+# === Slow-лог ===
+
+# Логгер slow-лога. Обработчика у него нет: записи уходят в очередь логгера
+# пакета, а в отдельный файл их пишет поток конвейера (см. utils/logger.py)
+SLOW_LOGGER = "movie_bot.slow_updates"
+
+_slow_logger: Optional[logging.Logger] = None
+
+
+def _get_slow_logger() -> logging.Logger:
+    global _slow_logger
+    if _slow_logger is None:
+        slow_logger = logging.getLogger(SLOW_LOGGER)
+        slow_logger.setLevel(logging.INFO)
+        _slow_logger = slow_logger
+    return _slow_logger
+
+
+def write_trace(trace: Trace, slow: bool):
+    """Записывает трейс одной строкой JSON в slow-лог."""
+    record = trace.to_dict()
+    record["slow"] = slow
+    _get_slow_logger().info(json.dumps(record, ensure_ascii=False))
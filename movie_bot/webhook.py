@@ -0,0 +1,172 @@
+"""
+Режим webhook: aiohttp-сервер вместо long polling.
+
+Один сервер обслуживает:
+- POST WEBHOOK_PATH — обновления от Telegram (с проверкой секретного токена)
+- GET /health — health-check (503 во время остановки, чтобы балансировщик снял инстанс)
+- GET /metrics — метрики в формате Prometheus
+
+Число одновременно обрабатываемых обновлений ограничено WEBHOOK_MAX_CONCURRENCY.
+Обработка идёт до ответа Telegram (handle_in_background=False): пока обновление
+не обработано, Telegram не считает его доставленным, а при остановке
+инстанс сначала дорабатывает принятые обновления.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from movie_bot.config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_MAX_CONCURRENCY,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_DRAIN_TIMEOUT,
+)
+from movie_bot.utils.metrics import CONTENT_TYPE, REGISTRY, render_metrics
+
+logger = logging.getLogger(__name__)
+
+_handler: Optional["DrainingRequestHandler"] = None
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик webhook с ограничением параллелизма и плавной остановкой.
+
+    Секретный токен проверяется до захвата слота, поэтому чужие запросы
+    не занимают места. После начала остановки новые обновления получают 503 —
+    Telegram доставит их повторно (другому инстансу или после рестарта).
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_concurrency: int = 32, **kwargs):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=False, **kwargs)
+        self.max_concurrency = max_concurrency
+        self.draining = False
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        # Метрики
+        self._handled = 0
+        self._rejected = 0
+
+    async def _handle_request(self, bot: Bot, request: web.Request) -> web.Response:
+        if self.draining:
+            self._rejected += 1
+            return web.Response(status=503, text="Shutting down")
+
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            async with self._semaphore:
+                response = await super()._handle_request(bot=bot, request=request)
+            self._handled += 1
+            return response
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Перестаёт принимать обновления и ждёт завершения принятых.
+        :return: True, если все обновления обработаны за timeout
+        """
+        self.draining = True
+        if self._in_flight:
+            logger.info(f"Дорабатываю принятые обновления: {self._in_flight}")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не дождались {self._in_flight} обновлений за {timeout} с")
+            return False
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        """Снимок метрик обработчика webhook."""
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "handled": self._handled,
+            "rejected": self._rejected,
+            "draining": int(self.draining),
+        }
+
+
+def get_webhook_stats() -> Dict[str, float]:
+    """Метрики webhook-обработчика (пустой словарь в режиме polling)."""
+    if _handler is None:
+        return {}
+    return _handler.stats()
+
+
+REGISTRY.register_stats("webhook", get_webhook_stats, counters=("handled", "rejected"))
+
+
+def create_app(bot: Bot, dp: Dispatcher, handler: DrainingRequestHandler) -> web.Application:
+    """Собирает aiohttp-приложение с webhook, /health и /metrics."""
+    app = web.Application()
+
+    async def health(request: web.Request) -> web.Response:
+        if handler.draining:
+            return web.Response(status=503, text="Shutting down")
+        return web.Response(text="OK", headers={"Cache-Control": "no-cache, no-store, must-revalidate"})
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(body=render_metrics().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    handler.register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, stop_event: asyncio.Event):
+    """
+    Запускает webhook-сервер и работает до stop_event.
+    Остановка: 503 на новые обновления и /health → ожидание принятых → закрытие сервера.
+    """
+    global _handler
+    handler = _handler = DrainingRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+        secret_token=WEBHOOK_SECRET,
+    )
+    app = create_app(bot, dp, handler)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook-сервер слушает {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    if not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET не задан — запросы к webhook не проверяются")
+
+    try:
+        if WEBHOOK_URL:
+            await bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+            logger.info("Webhook зарегистрирован в Telegram")
+
+        await stop_event.wait()
+    finally:
+        # Webhook не удаляется: за балансировщиком его продолжают обслуживать другие инстансы
+        drained = await handler.drain(WEBHOOK_DRAIN_TIMEOUT)
+        await runner.cleanup()
+        logger.info("Webhook-сервер остановлен" + ("" if drained else " (часть обновлений не доработана)"))
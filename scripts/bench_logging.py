@@ -0,0 +1,124 @@
+"""
+Замер задержек event loop при логировании.
+
+Пока корутина пишет N записей в лог (как обработчики под нагрузкой),
+фоновая задача «тикает» каждые --tick мс и считает, насколько
+опоздал каждый тик. Сравниваются две схемы:
+- direct — RotatingFileHandler и StreamHandler прямо на логгере
+  (форматирование и запись на диск в потоке event loop, как было раньше);
+- queue — конвейер utils/logger.py (QueueHandler + QueueListener).
+
+Запуск из корня репозитория (как модуль — чтобы импортировался movie_bot):
+    python -m scripts.bench_logging --records 20000 --batch 50
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from movie_bot.utils.logger import LogPipeline, _make_formatter
+
+
+async def _ticker(interval: float, lags: List[float], stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    expected = loop.time() + interval
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = loop.time()
+        lags.append(max(0.0, now - expected))
+        expected = now + interval
+
+
+async def _run(logger: logging.Logger, args: argparse.Namespace) -> Dict[str, float]:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(args.tick / 1000, lags, stop))
+    await asyncio.sleep(args.tick / 1000)
+
+    started = time.perf_counter()
+    for i in range(args.records):
+        logger.info("Запись %d: пользователь %s открыл страницу %d", i, i % 1000, i % 50)
+        if i % args.batch == 0:
+            # Точка переключения, как await между запросами в обработчике
+            await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    return {
+        "elapsed_ms": elapsed * 1000,
+        "lag_max_ms": max(lags, default=0.0) * 1000,
+        "lag_total_ms": sum(lags) * 1000,
+        "ticks": len(lags),
+    }
+
+
+def _direct_logger(log_file: Path, fmt: str) -> logging.Logger:
+    logger = logging.getLogger("bench.direct")
+    formatter = _make_formatter(fmt)
+    file_handler = RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+    console_handler = logging.StreamHandler(open(os.devnull, "w"))
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
+
+
+def _queue_logger(log_file: Path, fmt: str, maxsize: int) -> Tuple[logging.Logger, LogPipeline]:
+    pipeline = LogPipeline(log_file, fmt=fmt, maxsize=maxsize)
+    # Консоль — в /dev/null, чтобы не сравнивать скорость терминала
+    for handler in pipeline.listener.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setStream(open(os.devnull, "w"))
+    logger = logging.getLogger("bench.queue")
+    logger.addHandler(pipeline.handler)
+    return logger, pipeline
+
+
+def _configure(logger: logging.Logger):
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержки event loop при логировании: direct vs queue")
+    parser.add_argument("--records", type=int, default=20000, help="сколько записей писать")
+    parser.add_argument("--batch", type=int, default=50, help="записей между await")
+    parser.add_argument("--tick", type=float, default=5.0, help="период тикера, мс")
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    parser.add_argument("--queue-size", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        direct = _direct_logger(Path(tmp) / "direct.log", args.format)
+        _configure(direct)
+        results = {"direct": asyncio.run(_run(direct, args))}
+
+        queued, pipeline = _queue_logger(Path(tmp) / "queue.log", args.format, args.queue_size)
+        _configure(queued)
+        results["queue"] = asyncio.run(_run(queued, args))
+        flush_started = time.perf_counter()
+        pipeline.stop()
+        results["queue"]["drain_ms"] = (time.perf_counter() - flush_started) * 1000
+        results["queue"]["dropped"] = pipeline.handler.dropped
+
+    print(f"{args.records} записей, формат {args.format}, тик {args.tick} мс")
+    print(f"{'схема':<8} {'время, мс':>10} {'макс. лаг, мс':>14} {'сумм. лаг, мс':>14} {'тиков':>6}")
+    for name, r in results.items():
+        print(
+            f"{name:<8} {r['elapsed_ms']:>10.1f} {r['lag_max_ms']:>14.1f} "
+            f"{r['lag_total_ms']:>14.1f} {r['ticks']:>6}"
+        )
+    queue = results["queue"]
+    print(f"queue: дозапись после остановки {queue['drain_ms']:.1f} мс, отброшено {queue['dropped']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
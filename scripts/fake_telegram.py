@@ -0,0 +1,175 @@
+"""
+Фейковый Telegram для локальной проверки режима webhook.
+
+Скрипт делает две вещи:
+- поднимает заглушку Bot API: любой метод отвечает {"ok": true, ...},
+  а send*/edit* возвращают правдоподобное сообщение;
+- отправляет в webhook бота синтетические обновления (как Telegram)
+  и печатает коды ответов, задержки и вызовы Bot API со стороны бота.
+
+Пример:
+    # 1. Бот в режиме webhook, Bot API — на заглушку
+    BOT_TOKEN=123456:FAKE TELEGRAM_API_URL=http://127.0.0.1:8081 WEBHOOK_SECRET=s3cret \\
+        python -m movie_bot.main --mode webhook
+
+    # 2. Заглушка + 500 обновлений от 50 пользователей, 20 запросов одновременно
+    python scripts/fake_telegram.py --secret s3cret --updates 500 --users 50 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession, web
+
+_message_ids = itertools.count(1)
+_update_ids = itertools.count(1)
+_api_calls: Counter = Counter()
+
+# Методы, которые возвращают Message
+_MESSAGE_METHODS = {
+    "sendmessage", "sendphoto", "senddocument",
+    "editmessagetext", "editmessagecaption", "editmessagemedia", "editmessagereplymarkup",
+}
+
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+
+def _chat(chat_id: int) -> Dict[str, Any]:
+    return {"id": chat_id, "type": "private"}
+
+
+# === Заглушка Bot API ===
+
+async def _handle_api(request: web.Request) -> web.Response:
+    method = request.match_info["method"]
+    _api_calls[method] += 1
+    form = await request.post()
+
+    if method.lower() in _MESSAGE_METHODS:
+        chat_id = int(form.get("chat_id", 0) or 0)
+        result: Any = {
+            "message_id": int(form.get("message_id", 0) or 0) or next(_message_ids),
+            "date": int(time.time()),
+            "chat": _chat(chat_id),
+            "text": form.get("text") or form.get("caption") or "",
+        }
+    elif method.lower() == "getme":
+        result = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+    else:
+        result = True
+
+    return web.json_response({"ok": True, "result": result})
+
+
+async def start_fake_api(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", _handle_api)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
+
+
+# === Отправка обновлений ===
+
+def make_message_update(user_id: int, text: str) -> Dict[str, Any]:
+    update_id = next(_update_ids)
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": next(_message_ids),
+            "date": int(time.time()),
+            "chat": _chat(user_id),
+            "from": _user(user_id),
+            "text": text,
+            **({"entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]}
+               if text.startswith("/") else {}),
+        },
+    }
+
+
+def _percentile(values: List[float], share: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+async def send_updates(args: argparse.Namespace):
+    statuses: Counter = Counter()
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+
+    async with ClientSession() as session:
+        async def post(update: Dict[str, Any]):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    async with session.post(args.webhook, json=update, headers=headers) as response:
+                        await response.read()
+                        statuses[response.status] += 1
+                except Exception as e:
+                    statuses[type(e).__name__] += 1
+                    return
+                latencies.append(time.perf_counter() - started)
+
+        updates = [
+            make_message_update(random.randint(1, args.users), random.choice(args.text))
+            for _ in range(args.updates)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*(post(update) for update in updates))
+        elapsed = time.perf_counter() - started
+
+    print(f"Обновлений: {args.updates} за {elapsed:.2f} с ({args.updates / elapsed:.1f}/с)")
+    print(f"Ответы webhook: {dict(statuses)}")
+    print(
+        "Задержка, мс: "
+        f"p50={_percentile(latencies, 0.5) * 1000:.1f} "
+        f"p95={_percentile(latencies, 0.95) * 1000:.1f} "
+        f"p99={_percentile(latencies, 0.99) * 1000:.1f} "
+        f"max={max(latencies, default=0) * 1000:.1f}"
+    )
+    print(f"Вызовы Bot API от бота: {dict(_api_calls)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Фейковый Telegram для проверки webhook")
+    parser.add_argument("--webhook", default="http://127.0.0.1:8000/webhook", help="адрес webhook бота")
+    parser.add_argument("--secret", default="", help="X-Telegram-Bot-Api-Secret-Token")
+    parser.add_argument("--api-host", default="127.0.0.1")
+    parser.add_argument("--api-port", type=int, default=8081, help="порт заглушки Bot API (TELEGRAM_API_URL)")
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--text", action="append", help="текст сообщений (можно несколько раз)")
+    parser.add_argument("--serve", action="store_true", help="только заглушка Bot API, без отправки обновлений")
+    args = parser.parse_args()
+    args.text = args.text or ["/start", "/help", "/my_movies"]
+
+    runner = await start_fake_api(args.api_host, args.api_port)
+    print(f"Заглушка Bot API: http://{args.api_host}:{args.api_port}")
+    try:
+        if args.serve:
+            await asyncio.Event().wait()
+        else:
+            await send_updates(args)
+            # Бот мог ещё не закончить ответы, отправленные после ответа webhook
+            await asyncio.sleep(0.5)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
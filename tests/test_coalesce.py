@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime
+
+from aiogram.types import Update, User
+
+from movie_bot.middlewares.coalesce import CallbackCoalescer
+
+USER = {"id": 1, "is_bot": False, "first_name": "Test"}
+CHAT = {"id": 1, "type": "private"}
+
+
+def _callback(update_id: int, data: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": USER,
+            "chat_instance": "1",
+            "data": data,
+            "message": {"message_id": 1, "date": datetime.now(), "chat": CHAT, "text": "menu"},
+        },
+    })
+
+
+async def _press(presses: list, gap: float = 0.01) -> list:
+    """Прогоняет нажатия через склейку; возвращает (callback_data, page_steps) выпущенных."""
+    dispatched = []
+
+    async def handler(event: Update, data: dict):
+        dispatched.append((event.callback_query.data, data.get("page_steps", 1)))
+
+    coalescer = CallbackCoalescer(window=0.05, max_delay=1.0)
+    for update_id, callback_data in enumerate(presses, 1):
+        data = {"event_from_user": User.model_validate(USER)}
+        await coalescer(handler, _callback(update_id, callback_data), data)
+        await asyncio.sleep(gap)
+    await asyncio.sleep(0.1)
+    await coalescer.flush_all()
+    return dispatched
+
+
+def test_single_press_is_dispatched_without_delay():
+    async def scenario():
+        dispatched = []
+
+        async def handler(event: Update, data: dict):
+            dispatched.append(event.callback_query.data)
+
+        coalescer = CallbackCoalescer(window=10, max_delay=10)
+        data = {"event_from_user": User.model_validate(USER)}
+        await coalescer(handler, _callback(1, "next_search:0"), data)
+        result = list(dispatched)
+        await coalescer.flush_all()
+        return result
+
+    assert asyncio.run(scenario()) == ["next_search:0"]
+
+
+def test_burst_is_merged_into_one_trailing_step():
+    # Клавиатура уже перерисована: первое нажатие — страница 1, остальные — со страницы 1
+    presses = ["next_search:0", "next_search:1", "next_search:1", "next_search:1"]
+    assert asyncio.run(_press(presses)) == [("next_search:0", 1), ("next_search:1", 3)]
+
+
+def test_presses_from_stale_keyboard_count_the_first_step():
+    presses = ["next_search:0", "next_search:0", "next_search:0"]
+    assert asyncio.run(_press(presses)) == [("next_search:0", 1), ("next_search:0", 3)]
+
+
+def test_even_toggle_series_is_restored():
+    presses = ["toggle_watched:7:list"] * 4
+    # Первое переключение выполнено сразу, итоговое — возвращает статус
+    assert asyncio.run(_press(presses)) == [("toggle_watched:7:list", 1), ("toggle_watched:7:list", 1)]
+
+
+def test_odd_toggle_series_is_dispatched_once():
+    presses = ["toggle_watched:7:list"] * 3
+    assert asyncio.run(_press(presses)) == [("toggle_watched:7:list", 1)]
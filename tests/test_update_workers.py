@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Message, Update
+
+from movie_bot.middlewares.update_workers import UpdateScheduler
+
+USER = {"id": 1, "is_bot": False, "first_name": "Test"}
+CHAT = {"id": 1, "type": "private"}
+
+
+class Adding(StatesGroup):
+    title = State()
+
+
+def _message(update_id: int, text: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {"message_id": update_id, "date": datetime.now(), "chat": CHAT, "from": USER, "text": text},
+    })
+
+
+def _callback(update_id: int, data: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": USER,
+            "chat_instance": "1",
+            "data": data,
+            "message": {"message_id": 1, "date": datetime.now(), "chat": CHAT, "text": "menu"},
+        },
+    })
+
+
+async def _route_after_state_change() -> list:
+    reached = []
+    router = Router()
+
+    @router.callback_query(F.data == "add_movie")
+    async def start_adding(callback: CallbackQuery, state: FSMContext):
+        # Обработчик занят, пока следующее обновление ждёт в очереди воркера
+        await asyncio.sleep(0.05)
+        await state.set_state(Adding.title)
+        reached.append("callback")
+
+    @router.message(StateFilter(Adding.title))
+    async def title_entered(message: Message, state: FSMContext):
+        await state.clear()
+        reached.append("title")
+
+    @router.message()
+    async def no_state(message: Message):
+        reached.append("no_state")
+
+    dp = Dispatcher(storage=MemoryStorage())
+    scheduler = UpdateScheduler(workers=2, queue_size=10, wait_result=False)
+    dp.update.outer_middleware(scheduler)
+    dp.include_router(router)
+
+    bot = Bot("42:TEST")
+    try:
+        await dp.feed_update(bot, _callback(1, "add_movie"))
+        await dp.feed_update(bot, _message(2, "Матрица"))
+        assert await scheduler.stop(timeout=5)
+    finally:
+        await bot.session.close()
+    return reached
+
+
+def test_message_is_routed_on_state_set_by_queued_callback():
+    assert asyncio.run(_route_after_state_change()) == ["callback", "title"]